@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark del blocco URL via CDP (Network.setBlockedURLs) per lo spider Google.
+
+Serve in locale fixtures/google_maps_place.html, una scheda Maps finta con le
+stesse famiglie di sotto-risorse della pagina reale (CSS, font, bundle JS,
+tile vettoriali, foto, analytics, telemetria), e la carica con Chrome headless
+avviato con gli stessi SELENIUM_DRIVER_ARGUMENTS dello spider in tre scenari:
+
+- none:          nessun blocco (comportamento precedente)
+- default:      DEFAULT_BLOCKED_URLS (SELENIUM_BLOCKED_URLS = None)
+- default+css:  anche i fogli di stile (SELENIUM_BLOCK_STYLESHEETS = True)
+
+Per ogni caricamento si misurano:
+- byte e richieste servite dal server locale, per famiglia di risorse
+- ready: secondi fino a document.readyState == "complete"
+- data:  secondi fino a rating leggibile con place_snapshot (come lo spider)
+
+La cache HTTP è disattivata via CDP: ogni caricamento è a freddo, come per
+una scheda mai vista. Serve Chrome installato; ChromeDriver viene risolto con
+ChromeDriverResolver come nello spider.
+
+Uso:
+    python src/benchmarks/google_blocking_benchmark.py --loads 10 --latency-ms 40
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BENCH_DIR))
+SCRAPY_PROJECT = os.path.join(PROJECT_ROOT, "src", "scrapers", "google_reviews")
+FIXTURE = os.path.join(BENCH_DIR, "fixtures", "google_maps_place.html")
+sys.path.insert(0, SCRAPY_PROJECT)
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+from google_reviews import settings as google_settings
+from google_reviews.chromedriver_resolver import ChromeDriverResolver
+from google_reviews.place_snapshot import place_snapshot
+from google_reviews.url_blocking import DEFAULT_BLOCKED_URLS, STYLESHEET_PATTERNS, apply_url_blocking
+from google_reviews.waits import document_ready, wait_until
+
+
+SCENARIOS = [
+    ("none", []),
+    ("default", DEFAULT_BLOCKED_URLS),
+    ("default+css", DEFAULT_BLOCKED_URLS + STYLESHEET_PATTERNS),
+]
+
+# Famiglia di risorsa -> (prefisso del percorso, dimensione in KB, content type).
+# Le dimensioni sono nell'ordine di quelle osservate su una scheda Maps reale.
+ASSETS = [
+    ("css", "/maps/_/ss/", 160, "text/css"),
+    ("font", "/s/", 70, "font/woff2"),
+    ("analytics", "/gtag/js", 110, "application/javascript"),
+    ("telemetry", "/gen_204", 0, "text/plain"),
+    ("telemetry", "/csi", 0, "image/gif"),
+    ("tile", "/maps/vt", 30, "application/x-protobuf"),
+    ("photo", "/p/", 45, "image/jpeg"),
+]
+APP_BUNDLE_PATH = "/maps/_/js/"
+APP_BUNDLE_KB = 400
+APP_BUNDLE_JS = """
+(function () {
+  var rating = document.querySelector("div.F7nice span[aria-hidden='true']");
+  var reviews = document.querySelector("div.F7nice span[aria-label]");
+  var address = document.querySelector("button[data-item-id='address']");
+  rating.textContent = "4,6";
+  reviews.setAttribute("aria-label", "1.234 recensioni");
+  reviews.textContent = "(1.234)";
+  address.textContent = "Via Roma 1, 20121 Milano MI";
+  address.style.display = "";
+})();
+"""
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+class FixtureStats:
+    """Byte e richieste servite, per famiglia di risorsa"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes = {}
+        self.requests = {}
+
+    def record(self, family, size):
+        with self._lock:
+            self.bytes[family] = self.bytes.get(family, 0) + size
+            self.requests[family] = self.requests.get(family, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.bytes, self.requests = {}, {}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.bytes), dict(self.requests)
+
+
+def make_handler(stats, latency):
+    with open(FIXTURE, "r", encoding="utf-8") as f:
+        template = f.read()
+    bundle = ("/*" + "x" * (APP_BUNDLE_KB * 1024) + "*/" + APP_BUNDLE_JS).encode("utf-8")
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = urllib.parse.urlsplit(self.path).path
+            if path.startswith("/maps/place/"):
+                place = urllib.parse.unquote_plus(path.split("/")[3] or "Fixture")
+                self._send("document", template.replace("{{PLACE}}", place).encode("utf-8"), "text/html; charset=utf-8")
+            elif path.startswith(APP_BUNDLE_PATH):
+                self._send("app_js", bundle, "application/javascript")
+            else:
+                for family, prefix, size_kb, content_type in ASSETS:
+                    if path.startswith(prefix):
+                        self._send(family, b"\0" * (size_kb * 1024), content_type)
+                        break
+                else:
+                    self._send("other", b"", "text/plain", status=404)
+
+        do_POST = do_GET
+
+        def _send(self, family, body, content_type, status=200):
+            time.sleep(latency)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+            stats.record(family, len(body))
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start_fixture_server(latency_ms):
+    """
+    Returns:
+        tuple: (base URL, server, FixtureStats)
+    """
+    stats = FixtureStats()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stats, latency_ms / 1000.0))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="maps-fixture", daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_address[1]}", httpd, stats
+
+
+def launch_chrome(executable_path):
+    options = webdriver.ChromeOptions()
+    for argument in google_settings.SELENIUM_DRIVER_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    driver = webdriver.Chrome(service=Service(executable_path), options=options)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": True})
+    return driver
+
+
+def run_scenario(executable_path, base_url, stats, patterns, loads, timeout):
+    driver = launch_chrome(executable_path)
+    try:
+        apply_url_blocking(driver, patterns)
+        runs = []
+        for i in range(loads):
+            # Attende la coda di richieste del caricamento precedente (beacon, tile)
+            time.sleep(0.5)
+            stats.reset()
+            started = time.perf_counter()
+            driver.get(f"{base_url}/maps/place/Bar+Fixture+{i}/")
+            _ok, ready = wait_until(driver, document_ready, timeout, poll=0.02)
+            ok, _ = wait_until(driver, lambda d: place_snapshot(d).get("rating"), timeout, poll=0.02)
+            data = time.perf_counter() - started
+            time.sleep(0.5)
+            bytes_by_family, requests_by_family = stats.snapshot()
+            runs.append({
+                "ready_s": ready,
+                "data_s": data,
+                "data_ok": ok,
+                "bytes": sum(bytes_by_family.values()),
+                "requests": sum(requests_by_family.values()),
+                "bytes_by_family": bytes_by_family,
+            })
+        return runs
+    finally:
+        driver.quit()
+
+
+def print_report(results, args):
+    print()
+    print(f"Fixture Maps locale, {args.loads} caricamenti per scenario, latenza simulata {args.latency_ms} ms")
+    header = f"{'scenario':<13}{'KB/pag':>9}{'req/pag':>9}{'ready p50':>11}{'ready p95':>11}{'data p50':>10}{'dati ok':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, runs in results.items():
+        ready = [r["ready_s"] for r in runs]
+        data = [r["data_s"] for r in runs]
+        print(
+            f"{name:<13}{statistics.mean(r['bytes'] for r in runs) / 1024:>9.0f}"
+            f"{statistics.mean(r['requests'] for r in runs):>9.1f}"
+            f"{percentile(ready, 50):>11.3f}{percentile(ready, 95):>11.3f}"
+            f"{percentile(data, 50):>10.3f}"
+            f"{sum(r['data_ok'] for r in runs):>6}/{len(runs)}"
+        )
+    if "none" in results and "default" in results:
+        base = statistics.mean(r["bytes"] for r in results["none"])
+        blocked = statistics.mean(r["bytes"] for r in results["default"])
+        if base:
+            print(f"\nByte risparmiati con il blocco predefinito: {100 * (1 - blocked / base):.0f}%")
+        families = {}
+        for run in results["none"]:
+            for family, size in run["bytes_by_family"].items():
+                families[family] = families.get(family, 0) + size
+        print("Byte per famiglia senza blocco (KB/pag): " + ", ".join(
+            f"{family}={size / 1024 / len(results['none']):.0f}" for family, size in sorted(families.items())
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del blocco URL via CDP per lo spider Google")
+    parser.add_argument("--loads", type=int, default=10, help="Caricamenti della fixture per scenario")
+    parser.add_argument("--latency-ms", type=int, default=40, help="Ritardo simulato per risposta")
+    parser.add_argument("--timeout", type=float, default=20, help="Attesa massima per caricamento")
+    parser.add_argument("--chromedriver", help="Percorso di chromedriver (default: ChromeDriverResolver)")
+    parser.add_argument("--json", help="Salva i risultati grezzi in questo file")
+    args = parser.parse_args()
+
+    executable_path = args.chromedriver or ChromeDriverResolver(google_settings.CHROMEDRIVER_CACHE_FILE).resolve()
+    base_url, httpd, stats = start_fixture_server(args.latency_ms)
+    results = {}
+    try:
+        for name, patterns in SCENARIOS:
+            results[name] = run_scenario(executable_path, base_url, stats, patterns, args.loads, args.timeout)
+    finally:
+        httpd.shutdown()
+
+    print_report(results, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end di GoogleMapsSpider contro lo stand-in locale di Maps.
+
+Avvia google_maps_standin.py (Flask, TLS autofirmato) e fa girare il vero
+spider con il vero middleware Selenium sotto Chrome headless: Chrome risolve
+*.google.com sullo stand-in (--host-resolver-rules), quindi URL di ricerca,
+consenso cookie, attese, click e parsing sono quelli della produzione, ma
+deterministici e senza rete.
+
+Il crawl gira in un workspace isolato (PROJECT_ROOT nell'ambiente): input
+sintetico nel formato dello step 2, output, stato, profilo template e log
+restano fuori dal progetto. La cache persistente è disattivata, ogni attività
+apre il browser.
+
+Si misurano:
+- attività al minuto, pagine renderizzate, errori e correttezza dei risultati
+  (rating e recensioni confrontati con il catalogo dello stand-in)
+- p50/p95 per ricerca (google/timing/total)
+- risorse: CPU e PSS di processo + chromedriver + Chrome campionati da /proc,
+  driver avviati e picco PSS misurato dal middleware
+
+Serve Chrome installato; ChromeDriver viene risolto con ChromeDriverResolver
+come nello spider (o passato con --chromedriver).
+
+Uso:
+    python src/benchmarks/google_maps_benchmark.py --items 100 --workers 4 --latency-ms 60 --render-ms 300
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BENCH_DIR))
+SCRAPY_PROJECT = os.path.join(PROJECT_ROOT, "src", "scrapers", "google_reviews")
+sys.path.insert(0, SCRAPY_PROJECT)
+sys.path.insert(0, BENCH_DIR)
+
+import google_maps_standin
+from google_reviews.process_memory import descendants, proc_available, pss_mb
+
+REGION = "standin"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def prepare_workspace(work_dir, category, catalog):
+    """
+    Workspace isolato con l'input dello spider (formato dello step 2).
+
+    Returns:
+        str: Percorso dell'input
+    """
+    # data/ e src/ sono i marker con cui settings e spider riconoscono PROJECT_ROOT
+    os.makedirs(os.path.join(work_dir, "src"), exist_ok=True)
+    input_dir = os.path.join(work_dir, "data", "processed_data", "clean_post_pagine_gialle", REGION, category)
+    os.makedirs(input_dir, exist_ok=True)
+    input_path = os.path.join(input_dir, f"{category}_categorized_{REGION}.json")
+    entries = [
+        {
+            "name_pg": business["name"],
+            "city_pg": business["city"],
+            "address_pg": business["address"],
+            "latitude_pg": business["lat"],
+            "longitude_pg": business["lng"],
+        }
+        for business in catalog
+    ]
+    with open(input_path, "w", encoding="utf-8") as f:
+        json.dump([{"category": category, "entries": entries}], f, ensure_ascii=False)
+    return input_path
+
+
+def _cpu_seconds(pid):
+    """CPU (utente + sistema) consumata da un processo, None se non esiste più"""
+    try:
+        with open(f"/proc/{pid}/stat", "r", encoding="utf-8", errors="replace") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Il nome del processo è tra parentesi e può contenere spazi: si parte dall'ultima ")"
+    fields = stat[stat.rfind(")") + 2:].split()
+    if len(fields) < 13:
+        return None
+    # utime e stime (campi 14 e 15 di /proc/<pid>/stat)
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class ResourceSampler:
+    """
+    CPU e PSS del processo del benchmark e dei suoi discendenti (chromedriver,
+    Chrome, renderer), campionati da /proc ogni `interval` secondi.
+
+    La memoria è la PSS, come nel PssMonitor del middleware: le pagine
+    condivise tra Chrome e i renderer contano una volta sola.
+
+    La CPU dei processi terminati durante il crawl (driver riciclati) resta
+    contata con l'ultimo valore letto.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu = {}
+        self.pss_samples = []
+        self.max_processes = 0
+
+    def start(self):
+        if not proc_available():
+            return self
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            pids = descendants(os.getpid())
+            for pid in pids:
+                cpu = _cpu_seconds(pid)
+                if cpu is not None:
+                    self._cpu[pid] = cpu
+            self.pss_samples.append(sum(pss_mb(pid) for pid in pids))
+            self.max_processes = max(self.max_processes, len(pids))
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def as_dict(self, elapsed):
+        cpu = sum(self._cpu.values())
+        return {
+            "cpu_s": round(cpu, 2),
+            "cpu_cores_avg": round(cpu / elapsed, 2) if elapsed else None,
+            "pss_peak_mb": round(max(self.pss_samples), 1) if self.pss_samples else None,
+            "pss_avg_mb": round(sum(self.pss_samples) / len(self.pss_samples), 1) if self.pss_samples else None,
+            "processes_peak": self.max_processes,
+        }
+
+
+def check_results(raw_path, catalog):
+    """
+    Confronta l'output dello spider con il catalogo dello stand-in.
+
+    Returns:
+        dict: items, correct, wrong, errors, missing
+    """
+    try:
+        with open(raw_path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+    except (OSError, ValueError):
+        items = []
+    digits = lambda value: re.sub(r"\D", "", str(value or ""))
+    report = {"items": len(items), "correct": 0, "wrong": 0, "errors": 0, "missing": 0}
+    seen = set()
+    for item in items:
+        idx = item.get("__index")
+        if idx is None or idx >= len(catalog):
+            continue
+        seen.add(idx)
+        expected = catalog[idx]
+        if item.get("error"):
+            report["errors"] += 1
+        elif expected["outcome"] == "closed":
+            report["correct" if item.get("rating") is None else "wrong"] += 1
+        elif item.get("rating") == expected["rating"] and digits(item.get("review_count")) == digits(expected["review_count"]):
+            report["correct"] += 1
+        else:
+            report["wrong"] += 1
+    report["missing"] = len(catalog) - len(seen)
+    return report
+
+
+def build_settings(args, port, work_dir):
+    from scrapy.utils.project import get_project_settings
+
+    settings = get_project_settings()
+    arguments = settings.getlist("SELENIUM_DRIVER_ARGUMENTS") + google_maps_standin.chrome_arguments(port)
+    overrides = {
+        "SELENIUM_DRIVER_ARGUMENTS": arguments,
+        "CONCURRENT_REQUESTS": args.workers,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": args.workers,
+        "CONCURRENT_REQUESTS_PER_IP": args.workers,
+        "DOWNLOAD_DELAY": 0,
+        "RANDOMIZE_DOWNLOAD_DELAY": False,
+        "AUTOTHROTTLE_ENABLED": False,
+        "GOOGLE_CACHE_ENABLED": False,
+        "GOOGLE_PROFILE_TEMPLATE_ENABLED": not args.no_profile_template,
+        "SELENIUM_TABS_PER_BROWSER": args.tabs_per_browser,
+        "LOG_FILE": os.path.join(work_dir, "logs", "scrapy.log"),
+        "LOG_LEVEL": "INFO",
+        "TELNETCONSOLE_ENABLED": False,
+    }
+    if args.chromedriver:
+        overrides["SELENIUM_DRIVER_EXECUTABLE_PATH"] = args.chromedriver
+    if args.capture_mode:
+        overrides["GOOGLE_CAPTURE_MODE"] = args.capture_mode
+    # Priorità cmdline: vincono anche sui valori impostati da update_settings dello spider
+    settings.setdict(overrides, priority="cmdline")
+    return settings
+
+
+def run_benchmark(args, work_dir):
+    catalog = google_maps_standin.synthetic_businesses(args.items, args.seed, slow_ratio=args.slow_ratio)
+    prepare_workspace(work_dir, args.category, catalog)
+
+    # Settings e spider ricavano da PROJECT_ROOT input, output, stato, profilo e log
+    os.environ["PROJECT_ROOT"] = work_dir
+    os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "google_reviews.settings")
+
+    app = google_maps_standin.create_app(
+        catalog, latency_ms=args.latency_ms, render_ms=args.render_ms, jitter=args.jitter,
+        slow_ms=args.slow_ms, consent=not args.no_consent,
+    )
+    httpd, port = google_maps_standin.serve(app)
+
+    from scrapy.crawler import CrawlerProcess
+    from google_reviews.spiders.google_maps_spider import GoogleMapsSpider
+
+    try:
+        process = CrawlerProcess(build_settings(args, port, work_dir))
+        crawler = process.create_crawler(GoogleMapsSpider)
+        process.crawl(crawler, region=REGION, category=args.category)
+        sampler = ResourceSampler().start()
+        started = time.perf_counter()
+        process.start()
+        elapsed = time.perf_counter() - started
+        sampler.stop()
+    finally:
+        httpd.shutdown()
+
+    stats = crawler.stats.get_stats()
+    raw_path = os.path.join(
+        work_dir, "data", "raw", "raw_post_google_reviews", REGION, args.category,
+        f"{REGION}_{args.category}_raw.json",
+    )
+    items = stats.get("item_scraped_count", 0)
+    return {
+        "items": items,
+        "elapsed_s": round(elapsed, 2),
+        "items_per_min": round(items * 60.0 / elapsed, 2) if elapsed else None,
+        "pages_rendered": stats.get("selenium/pages_rendered", 0),
+        "results": check_results(raw_path, catalog),
+        "lookup_p50_s": stats.get("google/timing/total/p50"),
+        "lookup_p95_s": stats.get("google/timing/total/p95"),
+        "timings": {
+            key[len("google/timing/"):]: value for key, value in stats.items()
+            if key.startswith("google/timing/") and key.endswith(("/p50", "/p95"))
+        },
+        "retry_lane": {
+            key.rsplit("/", 1)[1]: value for key, value in stats.items() if key.startswith("google/retry_lane/")
+        },
+        "resources": dict(
+            sampler.as_dict(elapsed),
+            drivers_created=stats.get("selenium/pool/driver_created", stats.get("selenium/tabs/browsers_created", 0)),
+            browser_pss_peak_mb=stats.get("selenium/memory/pss_peak_mb"),
+        ),
+        "standin": app.config["STANDIN_STATS"].as_dict(),
+        "log_file": os.path.join(work_dir, "logs", "scrapy.log"),
+    }
+
+
+def print_report(result, args):
+    print()
+    print(
+        f"Stand-in Maps: {args.items} attività, {args.workers} worker, latenza {args.latency_ms} ms, "
+        f"rendering {args.render_ms} ms, consenso {'no' if args.no_consent else 'sì'}"
+    )
+    check = result["results"]
+    resources = result["resources"]
+    print(f"Attività:        {result['items']} in {result['elapsed_s']} s → {result['items_per_min']} attività/min")
+    print(f"Pagine:          {result['pages_rendered']} renderizzate, retry {result['retry_lane'] or '-'}")
+    print(
+        f"Correttezza:     {check['correct']} corrette, {check['wrong']} errate, "
+        f"{check['errors']} con errore, {check['missing']} mancanti"
+    )
+    print(f"Per ricerca:     p50 {result['lookup_p50_s']} s, p95 {result['lookup_p95_s']} s")
+    print(
+        f"Risorse:         CPU {resources['cpu_s']} s ({resources['cpu_cores_avg']} core medi), "
+        f"PSS picco {resources['pss_peak_mb']} MB (media {resources['pss_avg_mb']} MB), "
+        f"{resources['processes_peak']} processi, {resources['drivers_created']} driver avviati"
+    )
+    print(f"Stand-in:        {result['standin']}")
+    print(f"Log dello spider: {result['log_file']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end dello spider Google contro lo stand-in di Maps")
+    parser.add_argument("--items", type=int, default=100, help="Attività nell'input sintetico")
+    parser.add_argument("--workers", type=int, default=4, help="Richieste concorrenti (driver nel pool)")
+    parser.add_argument("--tabs-per-browser", type=int, default=1, help="SELENIUM_TABS_PER_BROWSER")
+    parser.add_argument("--category", default="ristoranti", help="Categoria dell'input")
+    parser.add_argument("--seed", type=int, default=0, help="Seed del catalogo")
+    parser.add_argument("--latency-ms", type=int, default=60, help="Ritardo del server per pagina")
+    parser.add_argument("--render-ms", type=int, default=300, help="Ritardo del rendering lato client")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variazione casuale dei ritardi (0.2 = ±20%%)")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="Quota di attività lente")
+    parser.add_argument("--slow-ms", type=int, default=8000, help="Ritardo extra delle attività lente")
+    parser.add_argument("--no-consent", action="store_true", help="Nessun interstiziale del consenso")
+    parser.add_argument("--no-profile-template", action="store_true", help="Ogni driver parte da un profilo vuoto")
+    parser.add_argument("--capture-mode", choices=["network", "dom"], help="GOOGLE_CAPTURE_MODE (default: settings)")
+    parser.add_argument("--chromedriver", help="Percorso di chromedriver (default: ChromeDriverResolver)")
+    parser.add_argument("--work-dir", help="Workspace del crawl (default: cartella temporanea)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Non eliminare il workspace a fine benchmark")
+    parser.add_argument("--json", help="Salva i risultati in questo file")
+    args = parser.parse_args()
+
+    work_dir = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="google_maps_bench_")
+    result = run_benchmark(args, work_dir)
+    print_report(result, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if not args.keep_workdir and not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    else:
+        print(f"Workspace: {work_dir}")
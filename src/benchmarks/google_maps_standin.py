@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Server locale (Flask) che imita le pagine di Google Maps lette da GoogleMapsSpider.
+
+Serve le stesse strutture DOM usate da place_snapshot e dalle attese dello spider:
+
+- /maps/search/<query>[/@lat,lng,zoomz]: lista risultati con schede
+  div[role='article'] > a.hfpxzc[aria-label], rating (span.MW4etd) e recensioni
+  (span.UY7F9), oppure redirect diretto alla scheda del posto
+- /maps/place/<nome>/: scheda con div.F7nice (rating e "N recensioni"),
+  pulsante button[data-item-id='address'] e "Chiuso definitivamente"
+- consent.google.com/ml: interstiziale del consenso cookie (pulsante
+  jsname="tWT92d" "Accetta tutto"), mostrato finché manca il cookie SOCS
+
+Il catalogo delle attività è sintetico e deterministico (synthetic_businesses):
+ogni attività ha un esito fisso (atterraggio diretto, lista con o senza dati
+nella scheda, chiusa, ambigua: trovata solo cercando anche l'indirizzo, come
+fa la corsia di retry). Ritardi configurabili: latenza del server per risposta,
+rendering lato client (schede e pannello del posto inseriti via JS dopo
+`render_ms`, come le risposte asincrone di Maps) e attività lente.
+
+Chrome raggiunge lo stand-in con gli URL reali di Google grazie a
+--host-resolver-rules="MAP * 127.0.0.1:<porta>" e --ignore-certificate-errors
+(certificato autofirmato): lo spider gira senza modifiche.
+
+Uso standalone:
+    python src/benchmarks/google_maps_standin.py --port 8444 --items 200 --latency-ms 60 --render-ms 300
+"""
+import os
+import sys
+import json
+import html
+import time
+import zlib
+import random
+import logging
+import argparse
+import threading
+import urllib.parse
+
+from flask import Flask, Response, redirect, request
+from werkzeug.serving import make_server
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from pagine_gialle_standin import generate_self_signed_cert
+
+logger = logging.getLogger(__name__)
+
+CONSENT_COOKIE = "SOCS"
+CLOSED_TEXT = "Chiuso definitivamente"
+
+# Esiti possibili di una ricerca, con le proporzioni predefinite del catalogo
+OUTCOMES = {
+    "direct": 0.35,      # La ricerca atterra subito sulla scheda del posto
+    "card": 0.35,        # Lista risultati, rating e recensioni già nella scheda
+    "list": 0.15,        # Lista risultati senza dati nella scheda: serve il click
+    "closed": 0.05,      # Scheda del posto chiusa definitivamente
+    "ambiguous": 0.10,   # Nessun risultato corrispondente senza l'indirizzo
+}
+
+_KINDS = ["Trattoria", "Pizzeria", "Bar", "Osteria", "Gelateria", "Pasticceria", "Enoteca", "Ristorante"]
+_NAMES = ["Da Mario", "Il Portico", "La Pergola", "Al Castello", "Del Corso", "Le Logge", "San Marco", "Il Glicine"]
+_CITIES = [("Milano", 45.4642, 9.19), ("Torino", 45.0703, 7.6869), ("Bologna", 44.4949, 11.3426), ("Firenze", 43.7696, 11.2558)]
+_STREETS = ["Via Roma", "Corso Italia", "Via Garibaldi", "Via Mazzini", "Piazza Duomo", "Via Verdi"]
+_DECOYS = ["Ferramenta Zeta", "Autofficina Nord", "Lavanderia Blu", "Farmacia Centrale", "Cartoleria Sole"]
+
+
+def synthetic_businesses(count, seed=0, outcomes=None, slow_ratio=0.0):
+    """
+    Catalogo deterministico di attività: stesso seed, stesse attività ed esiti.
+
+    Args:
+        outcomes (dict): {esito: proporzione}, default OUTCOMES
+        slow_ratio (float): Quota di attività servite con il ritardo extra `slow_ms`
+
+    Returns:
+        list[dict]: name, city, address, lat, lng, rating, review_count, outcome, slow
+    """
+    weights = outcomes or OUTCOMES
+    names, shares = list(weights), list(weights.values())
+    rng = random.Random(seed)
+    businesses = []
+    for i in range(count):
+        city, lat, lng = _CITIES[i % len(_CITIES)]
+        businesses.append({
+            "name": f"{_KINDS[i % len(_KINDS)]} {_NAMES[(i // len(_KINDS)) % len(_NAMES)]} {i}",
+            "city": city,
+            "address": f"{_STREETS[i % len(_STREETS)]} {i % 180 + 1}, {city}",
+            "lat": round(lat + rng.uniform(-0.02, 0.02), 6),
+            "lng": round(lng + rng.uniform(-0.02, 0.02), 6),
+            "rating": f"{rng.randint(30, 50) / 10:.1f}".replace(".", ","),
+            "review_count": f"{rng.randint(3, 4800):,}".replace(",", "."),
+            "outcome": rng.choices(names, shares)[0],
+            "slow": rng.random() < slow_ratio,
+        })
+    return businesses
+
+
+def _normalize(text):
+    return " ".join(text.lower().replace(",", " ").split())
+
+
+def _script_json(value):
+    # JSON dentro <script>: niente "</" che chiuderebbe il tag
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+
+class StandinStats:
+    """Contatori lato server, per pagina servita ed esito"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def inc(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.counts = {}
+
+    def as_dict(self):
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+
+
+RESULTS_PAGE = """<!DOCTYPE html>
+<html lang="it">
+<head><meta charset="utf-8"><title>{title} - Google Maps</title></head>
+<body>
+<div role="feed" id="feed" aria-label="Risultati per {title}"></div>
+<script>
+(function () {{
+  var RESULTS = {results};
+  function el(tag, cls, text) {{
+    var node = document.createElement(tag);
+    if (cls) node.className = cls;
+    if (text) node.textContent = text;
+    return node;
+  }}
+  setTimeout(function () {{
+    var feed = document.getElementById("feed");
+    RESULTS.forEach(function (r) {{
+      var card = el("div");
+      card.setAttribute("role", "article");
+      var link = el("a", "hfpxzc");
+      link.href = r.href;
+      link.setAttribute("aria-label", r.name);
+      card.appendChild(link);
+      card.appendChild(el("div", "qBF1Pd", r.name));
+      if (r.rating) {{
+        var stars = el("span");
+        stars.setAttribute("role", "img");
+        stars.setAttribute("aria-label", r.rating + " stelle " + r.review_count + " recensioni");
+        stars.appendChild(el("span", "MW4etd", r.rating));
+        stars.appendChild(el("span", "UY7F9", "(" + r.review_count + ")"));
+        card.appendChild(stars);
+      }}
+      card.appendChild(el("div", "W4Efsd", r.kind + " · " + r.address));
+      feed.appendChild(card);
+    }});
+  }}, {render_ms});
+}})();
+</script>
+</body>
+</html>
+"""
+
+PLACE_PAGE = """<!DOCTYPE html>
+<html lang="it">
+<head><meta charset="utf-8"><title>{title} - Google Maps</title></head>
+<body>
+<div role="main" aria-label="{title}">
+  <h1 class="DUwDvf">{title}</h1>
+  <div id="panel"></div>
+</div>
+<script>
+(function () {{
+  var PLACE = {place};
+  setTimeout(function () {{
+    var panel = document.getElementById("panel");
+    if (PLACE.closed) {{
+      var closed = document.createElement("span");
+      closed.textContent = "{closed}";
+      panel.appendChild(closed);
+    }} else {{
+      var box = document.createElement("div");
+      box.className = "F7nice";
+      var rating = document.createElement("span");
+      rating.setAttribute("aria-hidden", "true");
+      rating.textContent = PLACE.rating;
+      var reviews = document.createElement("span");
+      reviews.setAttribute("aria-label", PLACE.review_count + " recensioni");
+      reviews.textContent = "(" + PLACE.review_count + ")";
+      box.appendChild(rating);
+      box.appendChild(reviews);
+      panel.appendChild(box);
+    }}
+    var address = document.createElement("button");
+    address.setAttribute("data-item-id", "address");
+    address.textContent = PLACE.address;
+    panel.appendChild(address);
+  }}, {render_ms});
+}})();
+</script>
+</body>
+</html>
+"""
+
+CONSENT_PAGE = """<!DOCTYPE html>
+<html lang="it">
+<head><meta charset="utf-8"><title>Prima di continuare su Google</title></head>
+<body>
+<h1>Prima di continuare su Google</h1>
+<form id="consent" onsubmit="return false">
+  <button type="button" jsname="b3VHJd">Rifiuta tutto</button>
+  <button type="button" jsname="tWT92d" id="accept">Accetta tutto</button>
+</form>
+<script>
+document.getElementById("accept").addEventListener("click", function () {{
+  document.cookie = "{cookie}=standin; domain=.google.com; path=/; max-age=31536000; secure";
+  location.href = {target};
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def create_app(businesses, latency_ms=60, render_ms=300, jitter=0.0, slow_ms=8000, consent=True,
+               decoys=4, stats=None):
+    """
+    App Flask dello stand-in.
+
+    Args:
+        businesses (list[dict]): Catalogo (vedi synthetic_businesses)
+        latency_ms (int): Ritardo del server per ogni pagina
+        render_ms (int): Ritardo del rendering lato client di schede e pannello
+        jitter (float): Variazione casuale dei ritardi (0.2 = ±20%)
+        slow_ms (int): Ritardo extra per le attività con `slow`
+        consent (bool): Interstiziale del consenso finché manca il cookie SOCS
+        decoys (int): Risultati non pertinenti mostrati in ogni lista
+    """
+    app = Flask(__name__)
+    app.config["STANDIN_STATS"] = stats = stats or StandinStats()
+    by_name = {_normalize(b["name"]): b for b in businesses}
+    by_place = {b["name"]: b for b in businesses}
+    max_words = max((len(key.split()) for key in by_name), default=0)
+
+    def delay(extra_ms=0):
+        seconds = (latency_ms + extra_ms) / 1000.0
+        if jitter:
+            seconds *= random.uniform(1 - jitter, 1 + jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def render_delay():
+        return int(render_ms * (random.uniform(1 - jitter, 1 + jitter) if jitter else 1))
+
+    def lookup(query):
+        """Attività cercata e se la query contiene anche l'indirizzo (ricerca della corsia di retry)"""
+        words = _normalize(query).split()
+        for size in range(min(max_words, len(words)), 0, -1):
+            business = by_name.get(" ".join(words[:size]))
+            if business is not None:
+                rest = " ".join(words[size:])
+                street = _normalize(business["address"].split(",")[0])
+                return business, street in rest
+        return None, False
+
+    def html_response(body):
+        return Response(body, mimetype="text/html")
+
+    def place_href(business):
+        return f"/maps/place/{urllib.parse.quote_plus(business['name'])}/@{business['lat']},{business['lng']},17z"
+
+    @app.before_request
+    def require_consent():
+        if request.host.split(":")[0] == "consent.google.com":
+            return None
+        if consent and request.path.startswith("/maps/") and CONSENT_COOKIE not in request.cookies:
+            stats.inc("consent_redirects")
+            target = urllib.parse.quote(request.url, safe="")
+            return redirect(f"https://consent.google.com/ml?continue={target}", code=302)
+        return None
+
+    @app.route("/ml")
+    def consent_page():
+        stats.inc("consent_pages")
+        delay()
+        target = request.args.get("continue") or "https://www.google.com/maps"
+        return html_response(CONSENT_PAGE.format(cookie=CONSENT_COOKIE, target=_script_json(target)))
+
+    @app.route("/maps/search/<path:rest>")
+    def search(rest):
+        query = urllib.parse.unquote_plus(rest.split("/")[0])
+        business, with_address = lookup(query)
+        outcome = business["outcome"] if business else "unknown"
+        stats.inc(f"search/{outcome}")
+        delay(slow_ms if business and business["slow"] else 0)
+
+        if business is not None and (outcome in ("direct", "closed") or (outcome == "ambiguous" and with_address)):
+            return redirect(place_href(business), code=302)
+
+        results = [
+            {
+                "name": f"{_DECOYS[k % len(_DECOYS)]} {k + 1}",
+                "href": f"/maps/place/{urllib.parse.quote_plus(_DECOYS[k % len(_DECOYS)])}+{k + 1}/",
+                "kind": "Negozio",
+                "address": f"Via Lontana {k + 1}",
+                "rating": "4,0",
+                "review_count": "12",
+            }
+            for k in range(decoys)
+        ]
+        if business is not None and outcome != "ambiguous":
+            # Posizione del risultato corretto stabile per attività
+            position = zlib.crc32(business["name"].encode("utf-8")) % (len(results) + 1)
+            results.insert(position, {
+                "name": business["name"],
+                "href": place_href(business),
+                "kind": business["name"].split()[0],
+                "address": business["address"].split(",")[0],
+                "rating": business["rating"] if outcome == "card" else None,
+                "review_count": business["review_count"] if outcome == "card" else None,
+            })
+        return html_response(RESULTS_PAGE.format(
+            title=html.escape(query), results=_script_json(results), render_ms=render_delay(),
+        ))
+
+    @app.route("/maps/place/<path:rest>")
+    def place(rest):
+        name = urllib.parse.unquote_plus(rest.split("/")[0])
+        business = by_place.get(name)
+        stats.inc("place/found" if business else "place/unknown")
+        delay()
+        data = {
+            "rating": business["rating"] if business else "4,0",
+            "review_count": business["review_count"] if business else "12",
+            "address": business["address"] if business else "Via Lontana 1",
+            "closed": bool(business and business["outcome"] == "closed"),
+        }
+        return html_response(PLACE_PAGE.format(
+            title=html.escape(name), place=_script_json(data),
+            closed=CLOSED_TEXT, render_ms=render_delay(),
+        ))
+
+    @app.route("/favicon.ico")
+    def favicon():
+        return Response(status=204)
+
+    return app
+
+
+def serve(app, port=0, host="127.0.0.1", tls=True):
+    """
+    Avvia lo stand-in in un thread (server WSGI multithread di Werkzeug).
+
+    Returns:
+        tuple: (server, porta in ascolto); server.shutdown() lo ferma
+    """
+    ssl_context = generate_self_signed_cert() if tls else None
+    httpd = make_server(host, port, app, threaded=True, ssl_context=ssl_context)
+    threading.Thread(target=httpd.serve_forever, name="maps-standin", daemon=True).start()
+    return httpd, httpd.server_port
+
+
+def chrome_arguments(port):
+    """Argomenti di Chrome che dirigono *.google.com verso lo stand-in"""
+    return [
+        f"--host-resolver-rules=MAP * 127.0.0.1:{port}",
+        "--ignore-certificate-errors",
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server locale che imita le pagine di Google Maps")
+    parser.add_argument("--port", type=int, default=8444, help="Porta HTTPS")
+    parser.add_argument("--items", type=int, default=200, help="Attività nel catalogo sintetico")
+    parser.add_argument("--seed", type=int, default=0, help="Seed del catalogo")
+    parser.add_argument("--latency-ms", type=int, default=60, help="Ritardo del server per pagina")
+    parser.add_argument("--render-ms", type=int, default=300, help="Ritardo del rendering lato client")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variazione casuale dei ritardi (0.2 = ±20%%)")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="Quota di attività lente")
+    parser.add_argument("--slow-ms", type=int, default=8000, help="Ritardo extra delle attività lente")
+    parser.add_argument("--no-consent", action="store_true", help="Nessun interstiziale del consenso")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    catalog = synthetic_businesses(args.items, args.seed, slow_ratio=args.slow_ratio)
+    app = create_app(
+        catalog, latency_ms=args.latency_ms, render_ms=args.render_ms, jitter=args.jitter,
+        slow_ms=args.slow_ms, consent=not args.no_consent,
+    )
+    httpd, port = serve(app, args.port)
+    logger.info(f"Stand-in Google Maps su https://127.0.0.1:{port} ({len(catalog)} attività)")
+    logger.info("Argomenti di Chrome: " + " ".join(f'"{arg}"' for arg in chrome_arguments(port)))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        httpd.shutdown()
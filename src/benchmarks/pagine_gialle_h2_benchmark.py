@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark HTTP/1.1 vs HTTP/2 per lo spider Pagine Gialle.
+
+Avvia lo stand-in locale (pagine_gialle_standin.py) e fa girare il vero
+PagineGialleSpider sullo stesso paese in tre configurazioni:
+
+- http1:        configurazione attuale, una pagina alla volta (1 richiesta per IP)
+- http1-window: stessa finestra di pagine della modalità H2 ma su HTTP/1.1
+                (una connessione TLS per richiesta concorrente)
+- http2:        PAGINE_GIALLE_HTTP2=True, finestra di pagine multiplexata su una connessione
+
+Per isolare il trasporto, throttling e delay sono azzerati in tutti gli scenari
+e i proxy rotanti sono disattivati (lo stand-in è su localhost).
+
+Uso:
+    python src/benchmarks/pagine_gialle_h2_benchmark.py --pages 30 --latency-ms 80
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BENCH_DIR))
+SCRAPY_PROJECT = os.path.join(PROJECT_ROOT, "src", "scrapers", "pagine_gialle_scraper")
+sys.path.insert(0, SCRAPY_PROJECT)
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault("SCRAPY_SETTINGS_MODULE", "pagine_gialle_scraper.settings")
+
+from scrapy.utils.reactor import install_reactor
+
+install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+
+from twisted.internet import defer, reactor
+from scrapy import signals
+from scrapy.crawler import CrawlerRunner
+from scrapy.utils.log import configure_logging
+from scrapy.utils.project import get_project_settings
+
+import pagine_gialle_standin
+from pagine_gialle_scraper.spiders.pagine_gialle import PagineGialleSpider
+
+
+SCENARIOS = [
+    ("http1", {}),
+    ("http1-window", {"PAGINE_GIALLE_HTTP2": False}),
+    ("http2", {"PAGINE_GIALLE_HTTP2": True}),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def build_settings(name, overrides, port, window, work_dir):
+    settings = get_project_settings()
+    # Priorità cmdline: vincono anche sui valori impostati da update_settings dello spider
+    settings.setdict({
+        "PAGINE_GIALLE_BASE_URL": f"https://localhost:{port}/{{url_pattern}}/p-{{page}}.html?output=json",
+        "PAGINE_GIALLE_H2_PAGE_WINDOW": window,
+        "RESUME_LEDGER_PATH": os.path.join(work_dir, f"ledger_{name}.json"),
+        "DOWNLOAD_DELAY": 0,
+        "PAGINE_GIALLE_H2_DOWNLOAD_DELAY": 0,
+        "RANDOMIZE_DOWNLOAD_DELAY": False,
+        "AUTOTHROTTLE_ENABLED": False,
+        "DOWNLOADER_MIDDLEWARES": {
+            "rotating_proxies.middlewares.RotatingProxyMiddleware": None,
+            "rotating_proxies.middlewares.BanDetectionMiddleware": None,
+            "pagine_gialle_scraper.middlewares.PagineGialleDownloaderMiddleware": 543,
+        },
+        "ITEM_PIPELINES": {},
+        "LOG_LEVEL": "WARNING",
+        "TELNETCONSOLE_ENABLED": False,
+    }, priority="cmdline")
+    settings.setdict(overrides, priority="cmdline")
+    if name.startswith("http1-window"):
+        # Stessa finestra della modalità H2, ma senza cambiare protocollo
+        settings.setdict({
+            "PAGINE_GIALLE_PAGE_WINDOW": window,
+            "CONCURRENT_REQUESTS": window,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": window,
+            "CONCURRENT_REQUESTS_PER_IP": window,
+        }, priority="cmdline")
+    return settings
+
+
+@defer.inlineCallbacks
+def run_benchmark(args, results):
+    port, server_stats = pagine_gialle_standin.listen(
+        0, args.pages, args.results_per_page, args.latency_ms, reactor=reactor
+    )
+    work_dir = tempfile.mkdtemp(prefix="pg_h2_bench_")
+
+    for name, overrides in SCENARIOS:
+        for run in range(args.repeat):
+            server_stats.reset()
+            settings = build_settings(f"{name}_{run}", overrides, port, args.window, work_dir)
+            runner = CrawlerRunner(settings)
+            crawler = runner.create_crawler(PagineGialleSpider)
+            latencies = []
+
+            def on_response(response, request, spider):
+                latencies.append(response.meta.get("download_latency", 0.0))
+
+            # Il dispatcher tiene riferimenti deboli: on_response resta vivo finché serve
+            crawler.signals.connect(on_response, signal=signals.response_received)
+
+            started = time.perf_counter()
+            yield runner.crawl(
+                crawler,
+                url_pattern=f"benchtown/{args.category}",
+                region="standin",
+                category=args.category,
+                town="benchtown",
+            )
+            elapsed = time.perf_counter() - started
+
+            stats = crawler.stats.get_stats()
+            pages = len(latencies)
+            results.setdefault(name, []).append({
+                "elapsed_s": elapsed,
+                "pages": pages,
+                "items": stats.get("item_scraped_count", 0),
+                "pages_per_s": pages / elapsed if elapsed else 0.0,
+                "latency_p50_ms": percentile(latencies, 50) * 1000,
+                "latency_p95_ms": percentile(latencies, 95) * 1000,
+                "server": server_stats.as_dict(),
+            })
+
+    reactor.stop()
+
+
+def print_report(results, args):
+    print()
+    print(f"Stand-in: {args.pages} pagine x {args.results_per_page} risultati, latenza simulata {args.latency_ms} ms, finestra {args.window}")
+    header = f"{'scenario':<14}{'tempo s':>10}{'pagine':>8}{'pag/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'conn':>6}  protocolli"
+    print(header)
+    print("-" * len(header))
+    for name, runs in results.items():
+        elapsed = statistics.median(r["elapsed_s"] for r in runs)
+        best = min(runs, key=lambda r: abs(r["elapsed_s"] - elapsed))
+        print(
+            f"{name:<14}{elapsed:>10.2f}{best['pages']:>8}{best['pages_per_s']:>9.1f}"
+            f"{best['latency_p50_ms']:>9.1f}{best['latency_p95_ms']:>9.1f}"
+            f"{best['server']['connections']:>6}  {best['server']['protocols']}"
+        )
+    if "http1" in results and "http2" in results:
+        base = statistics.median(r["elapsed_s"] for r in results["http1"])
+        h2 = statistics.median(r["elapsed_s"] for r in results["http2"])
+        if h2:
+            print(f"\nSpeedup HTTP/2 vs HTTP/1.1 sequenziale: {base / h2:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HTTP/1.1 vs HTTP/2 per lo spider Pagine Gialle")
+    parser.add_argument("--pages", type=int, default=30, help="Pagine con risultati servite dallo stand-in")
+    parser.add_argument("--results-per-page", type=int, default=20, help="Risultati per pagina")
+    parser.add_argument("--latency-ms", type=int, default=80, help="Ritardo simulato per risposta")
+    parser.add_argument("--window", type=int, default=8, help="Pagine in volo (PAGINE_GIALLE_H2_PAGE_WINDOW)")
+    parser.add_argument("--category", default="ristoranti", help="Categoria usata negli URL")
+    parser.add_argument("--repeat", type=int, default=1, help="Ripetizioni per scenario (si riporta la mediana)")
+    parser.add_argument("--json", help="Salva i risultati grezzi in questo file")
+    args = parser.parse_args()
+
+    configure_logging({"LOG_LEVEL": "WARNING"})
+    # Il certificato dello stand-in è autofirmato: gli avvisi di verifica sono attesi
+    logging.getLogger("scrapy.core.downloader.tls").setLevel(logging.ERROR)
+    results = {}
+
+    def start():
+        d = run_benchmark(args, results)
+        d.addErrback(lambda failure: (failure.printTraceback(), reactor.stop()))
+
+    reactor.callWhenRunning(start)
+    reactor.run()
+
+    print_report(results, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Server locale che imita le pagine JSON di paginegialle.it.
+
+Serve /{paese}/{categoria}/p-{n}.html?output=json con la stessa struttura
+data["list"]["out"]["base"]["results"] letta da PagineGialleSpider, su TLS con
+ALPN (h2 e http/1.1), così lo stesso spider può essere misurato in HTTP/1.1 e
+in HTTP/2 senza toccare il sito reale. Ogni risposta viene ritardata di
+`latency_ms` per simulare il round trip verso il server remoto.
+
+Uso standalone:
+    python src/benchmarks/pagine_gialle_standin.py --port 8443 --pages 20 --latency-ms 80
+"""
+import os
+import re
+import json
+import logging
+import argparse
+import datetime
+import tempfile
+
+from twisted.internet import ssl, task
+from twisted.web import resource, server
+
+logger = logging.getLogger(__name__)
+
+PAGE_RE = re.compile(r"^/(?P<town>[^/]+)/(?P<category>[^/]+)/p-(?P<page>\d+)\.html$")
+
+
+def generate_self_signed_cert(directory=None):
+    """
+    Genera certificato e chiave autofirmati per 127.0.0.1/localhost.
+
+    Returns:
+        tuple: (percorso certificato PEM, percorso chiave PEM)
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    directory = directory or tempfile.mkdtemp(prefix="pg_standin_tls_")
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=7))
+        .add_extension(
+            x509.SubjectAlternativeName([
+                x509.DNSName("localhost"),
+                x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+            ]),
+            critical=False,
+        )
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+class StandinStats:
+    """Contatori lato server: richieste, connessioni TLS distinte e protocolli negoziati"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = set()
+        self.protocols = {}
+
+    def record(self, request):
+        self.requests += 1
+        # In HTTP/2 il channel è il singolo stream: la connessione è il suo _conn
+        self.connections.add(id(getattr(request.channel, "_conn", request.channel)))
+        proto = request.clientproto.decode("ascii", "replace")
+        self.protocols[proto] = self.protocols.get(proto, 0) + 1
+
+    def reset(self):
+        self.__init__()
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "connections": len(self.connections),
+            "protocols": dict(self.protocols),
+        }
+
+
+class PagineGialleJSON(resource.Resource):
+    """Risorsa che genera pagine di risultati deterministiche per ogni paese"""
+
+    isLeaf = True
+
+    def __init__(self, pages=20, results_per_page=20, latency_ms=80, stats=None, clock=None):
+        super().__init__()
+        self.pages = pages
+        self.results_per_page = results_per_page
+        self.latency = latency_ms / 1000.0
+        self.stats = stats or StandinStats()
+        self.clock = clock
+
+    def render_GET(self, request):
+        self.stats.record(request)
+        match = PAGE_RE.match(request.path.decode("utf-8", "replace"))
+        if not match:
+            request.setResponseCode(404)
+            return b"not found"
+
+        body = json.dumps(self._page(match.group("town"), match.group("category"), int(match.group("page"))))
+        request.setHeader(b"Content-Type", b"application/json; charset=utf-8")
+
+        def finish():
+            if not request.finished and not getattr(request, "_disconnected", False):
+                request.write(body.encode("utf-8"))
+                request.finish()
+
+        task.deferLater(self.clock, self.latency, finish)
+        return server.NOT_DONE_YET
+
+    def _page(self, town, category, page):
+        results = []
+        if page <= self.pages:
+            for i in range(self.results_per_page):
+                n = (page - 1) * self.results_per_page + i
+                results.append({
+                    "ds_ragsoc": f"{category.title()} {town.title()} {n}",
+                    "addr": f"Via Roma {n + 1}",
+                    "ds_comune_ita": town.title(),
+                    "prov": "XX",
+                    "reg": "Standin",
+                    "ds_cap": "00000",
+                    "ds_ls_telefoni": [f"000 {n:06d}"],
+                    "ds_cat": category,
+                    "nr_lat": 45.0 + n / 10000.0,
+                    "nr_long": 9.0 + n / 10000.0,
+                })
+        return {"list": {"out": {"base": {"results": results}}}}
+
+
+def listen(port=0, pages=20, results_per_page=20, latency_ms=80, reactor=None, interface="127.0.0.1"):
+    """
+    Avvia il server TLS sul reactor indicato.
+
+    Returns:
+        tuple: (porta in ascolto, StandinStats)
+    """
+    if reactor is None:
+        from twisted.internet import reactor
+    stats = StandinStats()
+    root = PagineGialleJSON(pages, results_per_page, latency_ms, stats, clock=reactor)
+    site = server.Site(root)
+    site.noisy = False
+
+    cert_path, key_path = generate_self_signed_cert()
+    with open(cert_path, "rb") as f:
+        cert_pem = f.read()
+    with open(key_path, "rb") as f:
+        key_pem = f.read()
+    certificate = ssl.PrivateCertificate.loadPEM(cert_pem + key_pem)
+    options = ssl.CertificateOptions(
+        privateKey=certificate.privateKey.original,
+        certificate=certificate.original,
+        acceptableProtocols=[b"h2", b"http/1.1"],
+    )
+    listening = reactor.listenSSL(port, site, options, interface=interface)
+    return listening.getHost().port, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server locale che imita le pagine JSON di Pagine Gialle")
+    parser.add_argument("--port", type=int, default=8443, help="Porta HTTPS")
+    parser.add_argument("--pages", type=int, default=20, help="Pagine con risultati per paese")
+    parser.add_argument("--results-per-page", type=int, default=20, help="Risultati per pagina")
+    parser.add_argument("--latency-ms", type=int, default=80, help="Ritardo simulato per risposta")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from twisted.internet import reactor
+    port, _ = listen(args.port, args.pages, args.results_per_page, args.latency_ms, reactor=reactor)
+    logger.info(f"Stand-in Pagine Gialle su https://127.0.0.1:{port}/<paese>/<categoria>/p-<n>.html?output=json")
+    reactor.run()
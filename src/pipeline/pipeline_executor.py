@@ -10,7 +10,7 @@ import time
 from pathlib import Path
 
 class PipelineExecutor:
-    def __init__(self, region=None, category=None, base_path=None, debug=False):
+    def __init__(self, region=None, category=None, base_path=None, debug=False, google_shards=1):
             """
             Inizializza l'esecutore della pipeline
         
@@ -19,6 +19,7 @@ class PipelineExecutor:
                 category (str): Categoria di destinazione (es. 'ristoranti')
                 base_path (str, optional): Percorso base del progetto
                 debug (bool): Attiva modalità debug
+                google_shards (int): Processi Scrapy paralleli per lo step 3 (1 = processo unico)
             """
             # creazione logger
             self.logger = logging.getLogger(f"PipelineExecutor.{region}.{category}")
@@ -34,6 +35,9 @@ class PipelineExecutor:
             self.base_path = base_path or os.path.dirname(os.path.abspath(__file__))
             self.debug = debug
             self._stop_requested = False
+            # Riassunto delle statistiche del crawl Google (step 3) per il report
+            self.google_stats = None
+            self.google_shards = max(1, int(google_shards or 1))
             
             # Salire di una directory se siamo in src/pipeline
             if os.path.basename(os.path.dirname(self.base_path)) == "src" and os.path.basename(self.base_path) == "pipeline":
@@ -574,8 +578,8 @@ class PipelineExecutor:
             self.logger.error("Spider 'pagine_gialle_scraper' non disponibile")
             return False
         
-        # Carica lo stato dello scraping per determinare quali paesi processare
-        scraping_state = self._load_scraping_state()
+        # Ledger di ripresa condiviso con lo spider: decide quali paesi saltare
+        ledger = self._open_resume_ledger()
         
         scrapy_cmd = self._get_scrapy_command()
         all_success = True
@@ -597,7 +601,7 @@ class PipelineExecutor:
             url_pattern = f"{url_base.rstrip('/')}/{self.category}"
             
             # Controlla se questo paese è già stato completamente processato
-            if self._is_paese_completed(nome_paese, scraping_state, existing_data):
+            if self._is_paese_completed(nome_paese, ledger):
                 self.logger.info(f"[{i}/{len(paesi)}] {nome_paese}: già completato, skip")
                 continue
             
@@ -607,7 +611,8 @@ class PipelineExecutor:
             # Sanizza il nome del file temporaneo
             safe_nome_paese = nome_paese.lower().replace(' ', '_').replace('/', '_').replace('\\', '_')
             safe_nome_paese = ''.join(c for c in safe_nome_paese if c.isalnum() or c in ('_', '-'))
-            temp_filename = f"temp_{safe_nome_paese}.json"
+            # JSON Lines: anche un crawl interrotto lascia record leggibili
+            temp_filename = f"temp_{safe_nome_paese}.jsonl"
             temp_output = os.path.join(temp_dir, temp_filename)
             
             # Costruzione del comando come lista per evitare problemi con gli escape
@@ -619,6 +624,7 @@ class PipelineExecutor:
                 "-a", f"url_pattern={url_pattern}",
                 "-a", f"region={self.region}",
                 "-a", f"category={self.category}",
+                "-a", f"town={nome_paese}",
                 "-o", f"{temp_output}"
             ]
             
@@ -635,14 +641,14 @@ class PipelineExecutor:
             if not success:
                 # CAMBIAMENTO IMPORTANTE: Non impostare all_success = False per singoli errori
                 # all_success = False  # Commentato
-                self.logger.warning(f"Fallito per {nome_paese}, continuo…")
-                continue
+                # Le pagine già scaricate sono nel ledger: i loro record vanno comunque salvati,
+                # altrimenti il prossimo run non le riscaricherebbe e andrebbero perse
+                self.logger.warning(f"Fallito per {nome_paese}, salvo i dati parziali e continuo…")
                 
             # Append dati temporanei al file principale
-            if os.path.exists(temp_output) and os.path.getsize(temp_output) > 2:
+            if os.path.exists(temp_output) and os.path.getsize(temp_output) > 0:
                 try:
-                    with open(temp_output, 'r', encoding='utf-8') as tf:
-                        temp_data = json.load(tf)
+                    temp_data = self._read_partial_feed(temp_output)
                     
                     # Leggi i dati attuali, aggiungi i nuovi, riscrivi
                     with open(output_file, 'r', encoding='utf-8') as mf:
@@ -758,19 +764,192 @@ class PipelineExecutor:
             return False
        
         scrapy_cmd = self._get_scrapy_command()
+
+        # Le statistiche finali del crawl (memoria dei browser inclusa) finiscono nel report
+        stats_path = os.path.join(
+            self.base_path, "logs", "pipeline_reports",
+            f"stats_google_{self.region}_{self.category}_{self.timestamp}.json"
+        )
        
+        if self.google_shards > 1:
+            return self._run_google_shards(scrapy_path, stats_path)
+
         cmd = (
             f"{scrapy_cmd} crawl google_reviews "
             f"-a region=\"{self.region}\" "
-            f"-a category=\"{self.category}\""
+            f"-a category=\"{self.category}\" "
+            f"-s STATS_DUMP_FILE=\"{stats_path}\""
         )
-        return self.execute_command(
+        success = self.execute_command(
             cmd,
             cwd=scrapy_path,
             description=f"Raccolta rating e recensioni per {self.region} - {self.category}",
             capture_output=False,
             timeout=600  # Timeout più lungo per le recensioni
         )
+        self.google_stats = self._read_google_stats(stats_path)
+        return success
+
+    def _run_google_shards(self, scrapy_path, stats_path, timeout=600):
+        """
+        Step 3 in più processi: ogni shard elabora un intervallo contiguo di
+        attività con driver pool, stato di ripresa e output propri; a fine
+        esecuzione gli output vengono uniti nel file raw unico.
+
+        Ogni shard riprende indipendentemente dal proprio stato
+        (temp/google_reviews_state_<region>_<category>_shard<i>of<K>.json):
+        per riprendere va rilanciato con lo stesso numero di shard.
+
+        Returns:
+            bool: True se tutti gli shard sono terminati senza errori
+        """
+        shards = self.google_shards
+        python_executable = self.python_cmd.strip('"')
+        stats_base, stats_ext = os.path.splitext(stats_path)
+        logs_dir = os.path.join(self.base_path, "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+
+        self.logger.info(f"Avvio di {shards} shard paralleli per {self.region} - {self.category}")
+        start_time = time.time()
+        processes = []
+        for shard_index in range(shards):
+            suffix = f"_shard{shard_index}of{shards}"
+            cmd_list = [
+                python_executable,
+                "-m", "scrapy",
+                "crawl", "google_reviews",
+                "-a", f"region={self.region}",
+                "-a", f"category={self.category}",
+                "-a", f"shard_index={shard_index}",
+                "-a", f"shard_count={shards}",
+                "-s", f"STATS_DUMP_FILE={stats_base}{suffix}{stats_ext}",
+                "-s", f"LOG_FILE={os.path.join(logs_dir, f'scrapy{suffix}.log')}",
+            ]
+            self.logger.debug(f"Comando shard {shard_index}: {' '.join(cmd_list)}")
+            processes.append(subprocess.Popen(cmd_list, cwd=scrapy_path, env=os.environ.copy()))
+
+        # Attende tutti gli shard; stop o timeout li terminano tutti
+        deadline = start_time + timeout
+        while any(p.poll() is None for p in processes):
+            if self._stop_requested or time.time() > deadline:
+                reason = "stop richiesto" if self._stop_requested else f"timeout ({timeout}s)"
+                self.logger.error(f"Interruzione degli shard: {reason}")
+                for p in processes:
+                    if p.poll() is None:
+                        p.terminate()
+                for p in processes:
+                    try:
+                        p.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        p.kill()
+                break
+            time.sleep(1)
+
+        success = True
+        for shard_index, p in enumerate(processes):
+            if p.returncode != 0:
+                self.logger.error(f"Shard {shard_index} terminato con codice {p.returncode}")
+                success = False
+
+        # Unione deterministica (per __index) anche degli shard falliti: i loro
+        # risultati parziali restano nel file raw e lo shard riprende dal suo stato
+        google_project = os.path.join(self.base_path, "src", "scrapers", "google_reviews")
+        if google_project not in sys.path:
+            sys.path.insert(0, google_project)
+        from google_reviews.sharding import merge_shards
+        from google_reviews.phase_timings import summarize_timings
+
+        raw_path = os.path.join(
+            self.base_path, "data", "raw", "raw_post_google_reviews", self.region, self.category,
+            f"{self.region}_{self.category}_raw.json"
+        )
+        try:
+            merge = merge_shards(raw_path, shards)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Errore nell'unione degli shard: {e}")
+            return False
+        self.logger.info(f"Shard uniti in {raw_path}: {merge['items']} risultati (per shard: {merge['per_shard']})")
+        if merge["missing"]:
+            self.logger.warning(f"Shard senza risultati: {merge['missing']}")
+
+        per_shard = [
+            self._read_google_stats(f"{stats_base}_shard{i}of{shards}{stats_ext}") for i in range(shards)
+        ]
+        available = [summary for summary in per_shard if summary]
+        # Percentili per fase dagli istogrammi sommati (una media dei p95 non è un p95)
+        shard_stats = []
+        for summary in available:
+            with open(summary["stats_file"], "r", encoding="utf-8") as f:
+                shard_stats.append(json.load(f))
+        self.google_stats = {
+            "shards": shards,
+            "items": sum(summary["items"] for summary in available),
+            "pages_rendered": sum(summary["pages_rendered"] for summary in available),
+            "pages_per_minute": round(sum(summary["pages_per_minute"] or 0 for summary in available), 2),
+            "drivers_created": sum(summary["drivers_created"] for summary in available),
+            "sessions_saved": sum(summary["sessions_saved"] for summary in available),
+            "slow_items": sum(summary["slow_items"] for summary in available),
+            "timings": summarize_timings(shard_stats),
+            "merged_items": merge["items"],
+            "per_shard": per_shard,
+        }
+        self.logger.info(f"Shard completati in {time.time() - start_time:.2f} secondi")
+        return success
+
+    def _read_google_stats(self, path):
+        """
+        Riassunto delle statistiche scritte dal crawl Google (estensione StatsDump).
+
+        Returns:
+            dict | None: Memoria dei browser e produttività, None se il file manca
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            self.logger.warning(f"Statistiche del crawl Google non disponibili: {path}")
+            return None
+        summary = {
+            "browser_memory": {
+                "pss_peak_mb": stats.get("selenium/memory/pss_peak_mb"),
+                "pss_avg_mb": stats.get("selenium/memory/pss_avg_mb"),
+                "samples": stats.get("selenium/memory/pss_samples", 0),
+                "recycled_for_memory": stats.get("selenium/memory/pss_recycled", 0),
+                "orphans_killed": stats.get("selenium/orphans_killed", 0),
+                "zombies_killed": stats.get("selenium/zombies_killed", 0),
+            },
+            "drivers_created": stats.get("selenium/pool/driver_created", stats.get("selenium/tabs/browsers_created", 0)),
+            "drivers_recycled": stats.get("selenium/pool/driver_recycled", stats.get("selenium/tabs/browsers_recycled", 0)),
+            "pages_rendered": stats.get("selenium/pages_rendered", 0),
+            "pages_per_minute": stats.get("selenium/pages_per_minute"),
+            "items": stats.get("item_scraped_count", 0),
+            # Attività servite senza aprire un browser
+            "sessions_saved": stats.get("google/sessions_saved", 0),
+            "cache_hits": stats.get("google/cache/hits", 0),
+            "coalesced": stats.get("google/coalesce/followers", 0),
+            # Secondi per fase di ogni ricerca: {fase: {count, p50, p95, p99, max}}
+            "timings": self._google_timings(stats),
+            "slow_items": stats.get("google/timing/slow_items", 0),
+            "finish_reason": stats.get("finish_reason"),
+            "stats_file": path,
+        }
+        memory = summary["browser_memory"]
+        if memory["pss_peak_mb"] is not None:
+            self.logger.info(f"Memoria browser: picco PSS {memory['pss_peak_mb']} MB, media {memory['pss_avg_mb']} MB")
+        total = summary["timings"].get("total")
+        if total:
+            self.logger.info(f"Tempo per ricerca: p50 {total.get('p50')}s, p95 {total.get('p95')}s, p99 {total.get('p99')}s")
+        return summary
+
+    @staticmethod
+    def _google_timings(stats):
+        """Percentili per fase (google/timing/<fase>/<misura>) dalle statistiche di un crawl"""
+        timings = {}
+        for key, value in stats.items():
+            parts = key.split("/")
+            if len(parts) == 4 and parts[:2] == ["google", "timing"] and parts[3] in ("count", "p50", "p95", "p99", "max"):
+                timings.setdefault(parts[2], {})[parts[3]] = value
+        return timings
    
     def step4_normalize_review_data(self):
         """Normalizza i dati con recensioni e rating"""
@@ -853,6 +1032,8 @@ class PipelineExecutor:
             "total_time": f"{total_time:.2f} secondi",
             "steps": results
         }
+        if self.google_stats:
+            report["google_reviews_stats"] = self.google_stats
        
         report_path = os.path.join(
             self.base_path,
@@ -922,59 +1103,53 @@ class PipelineExecutor:
                 self.logger.warning(f"File Scrapy config mancante: {path}")
         
         return True
-    def _load_scraping_state(self):
-        """Carica lo stato dello scraping dal file state dello spider"""
-        state_file = os.path.join(
-            self.base_path, 
-            "src", "scrapers", "pagine_gialle_scraper", "config", "scraping_state.json"
-        )
-        
-        if os.path.exists(state_file):
-            try:
-                with open(state_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    state_data = json.loads(content) if content else {}
-                    
-                # Cerca lo stato per la combinazione corrente
-                state_key = f"{self.region}_{self.category}"
-                return state_data.get(state_key, {})
-            except Exception as e:
-                self.logger.error(f"Errore nel caricare lo stato dello scraping: {e}")
-                return {}
-        
-        return {}
+    def _open_resume_ledger(self):
+        """
+        Apre il ledger di ripresa condiviso con lo spider Pagine Gialle.
+        Il modulo vive nel progetto Scrapy, che viene aggiunto al path se necessario.
+        """
+        scrapy_project = os.path.join(self.base_path, "src", "scrapers", "pagine_gialle_scraper")
+        if scrapy_project not in sys.path:
+            sys.path.insert(0, scrapy_project)
+        from pagine_gialle_scraper.resume_ledger import ResumeLedger, default_ledger_path
 
-    def _is_paese_completed(self, nome_paese, scraping_state, existing_data):
+        ledger_path = default_ledger_path(self.base_path)
+        self.logger.info(f"Ledger di ripresa: {ledger_path}")
+        return ResumeLedger(ledger_path)
+
+    def _is_paese_completed(self, nome_paese, ledger):
         """
         Determina se un paese è già stato completamente processato.
-        Un paese è considerato completato se:
-        1. Ha dati nell'output finale E
-        2. Non è presente nello stato di scraping (significa che lo scraping è terminato normalmente)
+        Un paese è completato quando lo spider ha raggiunto la fine dei risultati
+        e lo ha segnato nel ledger di ripresa.
         """
-        # Controlla se ci sono dati per questo paese nell'output
-        has_data = any(
-            record.get('paese', '').lower() == nome_paese.lower() or 
-            record.get('citta', '').lower() == nome_paese.lower()
-            for record in existing_data
-        )
-        
-        # Se non ci sono dati, sicuramente non è completato
-        if not has_data:
-            return False
-        
-        # Se c'è ancora uno stato di scraping per questo paese, 
-        # significa che lo scraping è stato interrotto
-        has_pending_state = nome_paese in scraping_state
-        
-        # Completato = ha dati E non ha stato pendente
-        is_completed = has_data and not has_pending_state
-        
-        if is_completed:
-            self.logger.debug(f"Paese {nome_paese} considerato completato (ha dati, nessuno stato pendente)")
+        state = ledger.get(self.region, self.category, nome_paese)
+        if state["completed"]:
+            self.logger.debug(f"Paese {nome_paese} considerato completato (ultima pagina {state['last_page']})")
+            return True
+
+        if state["last_page"]:
+            self.logger.debug(f"Paese {nome_paese} interrotto, ripresa dalla pagina {state['last_page'] + 1}")
         else:
-            self.logger.debug(f"Paese {nome_paese} da processare (dati: {has_data}, stato pendente: {has_pending_state})")
-        
-        return is_completed
+            self.logger.debug(f"Paese {nome_paese} mai processato")
+        return False
+
+    def _read_partial_feed(self, path):
+        """
+        Legge un feed JSON Lines prodotto dallo spider.
+        Una riga finale troncata (crawl interrotto a metà scrittura) viene ignorata.
+        """
+        records = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.logger.warning(f"Riga {line_no} non valida in {path}, ignorata")
+        return records
 
     def _filter_duplicates(self, temp_data, main_data):
         """Filtra i record duplicati, gestendo sia i nuovi che i vecchi formati dei campi."""
@@ -1019,6 +1194,7 @@ if __name__ == "__main__":
     parser.add_argument("--base-path", help="Percorso base del progetto")
     parser.add_argument("--step", type=int, choices=[1, 2, 3, 4], help="Esegui solo un passaggio specifico")
     parser.add_argument("--debug", action="store_true", help="Attiva modalità debug")
+    parser.add_argument("--google-shards", type=int, default=1, help="Processi paralleli per la raccolta Google (step 3)")
     
     args = parser.parse_args()
     
@@ -1036,7 +1212,7 @@ if __name__ == "__main__":
         logger.debug("Modalità DEBUG attivata")
     
     # Inizializza l'esecutore della pipeline
-    executor = PipelineExecutor(args.region, args.category, args.base_path)
+    executor = PipelineExecutor(args.region, args.category, args.base_path, google_shards=args.google_shards)
     
     # Esegui il passaggio specifico o l'intera pipeline
     if args.step:
@@ -0,0 +1,161 @@
+# src/scrapers/google_reviews/google_reviews/checkpoint.py
+import os
+import json
+import time
+import bisect
+import tempfile
+
+
+class IndexRanges:
+    """
+    Insieme di indici interi memorizzato come intervalli semiaperti [start, end).
+
+    Le attività completate sono quasi sempre contigue (salvo quelle in volo
+    al momento dell'interruzione): 100.000 indici diventano poche coppie.
+    """
+
+    def __init__(self, ranges=None):
+        self._starts = []
+        self._ends = []
+        for start, end in ranges or []:
+            if int(end) > int(start):
+                self._merge_range(int(start), int(end))
+
+    def _merge_range(self, start, end):
+        # Fonde [start, end) con gli intervalli che tocca
+        i = bisect.bisect_left(self._ends, start)
+        j = bisect.bisect_right(self._starts, end)
+        if i < j:
+            start = min(start, self._starts[i])
+            end = max(end, self._ends[j - 1])
+        self._starts[i:j] = [start]
+        self._ends[i:j] = [end]
+
+    def add(self, idx):
+        """
+        Returns:
+            bool: False se l'indice era già presente
+        """
+        if idx in self:
+            return False
+        self._merge_range(idx, idx + 1)
+        return True
+
+    def __contains__(self, idx):
+        i = bisect.bisect_right(self._starts, idx) - 1
+        return i >= 0 and idx < self._ends[i]
+
+    def __len__(self):
+        return sum(end - start for start, end in zip(self._starts, self._ends))
+
+    def first_missing(self, start=0):
+        """Primo indice >= start non presente (watermark per compatibilità)"""
+        i = bisect.bisect_right(self._starts, start) - 1
+        if i >= 0 and start < self._ends[i]:
+            return self._ends[i]
+        return start
+
+    def to_list(self):
+        return [[start, end] for start, end in zip(self._starts, self._ends)]
+
+
+class Checkpoint:
+    """
+    Stato di ripresa dello spider Google: insieme delle attività completate.
+
+    Al posto di un unico `last_index` (che con il parsing concorrente poteva
+    tornare indietro o saltare attività ancora in volo) si registra ogni indice
+    completato; in ripresa si rielaborano esattamente quelli mancanti.
+
+    Lo stato è scritto a lotti, ogni `flush_every` attività o `flush_interval`
+    secondi, in JSON compatto tramite file temporaneo + os.replace.
+    Prima di ogni scrittura viene chiamato `before_flush` (sync del journal dei
+    risultati): lo stato non dichiara mai completata un'attività il cui
+    risultato non è ancora su disco.
+
+    Formato:
+        {"completed": [[0, 120], [122, 130]], "last_index": 120, ...}
+    `last_index` (primo indice non completato) resta per compatibilità; uno
+    stato precedente con il solo `last_index` viene letto come [[0, last_index]].
+    """
+
+    def __init__(self, state_path, flush_every=50, flush_interval=10.0, before_flush=None, **info):
+        self.state_path = state_path
+        self.flush_every = max(1, int(flush_every))
+        self.flush_interval = float(flush_interval)
+        self.before_flush = before_flush
+        self.info = info
+        self.total_items = 0
+        self.start_index = 0  # Primo indice di competenza (shard)
+        self.completed = IndexRanges()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_settings(cls, settings, state_path, **kwargs):
+        return cls(
+            state_path,
+            flush_every=settings.getint('GOOGLE_CHECKPOINT_FLUSH_EVERY', 50),
+            flush_interval=settings.getfloat('GOOGLE_CHECKPOINT_FLUSH_INTERVAL', 10.0),
+            **kwargs,
+        )
+
+    def load(self):
+        """
+        Legge lo stato salvato, se presente.
+
+        Returns:
+            dict: Stato letto ({} se assente)
+        """
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if "completed" in state:
+            self.completed = IndexRanges(state["completed"])
+        elif state.get("last_index"):
+            self.completed = IndexRanges([[0, int(state["last_index"])]])
+        return state
+
+    def is_done(self, idx):
+        return idx in self.completed
+
+    def mark_done(self, idx):
+        """Registra un'attività completata (scrittura a lotti)"""
+        if not self.completed.add(idx):
+            return
+        self._pending += 1
+        if self._pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Scrive lo stato su disco (atomico)"""
+        if self.before_flush is not None:
+            self.before_flush()
+        done = len(self.completed)
+        state = dict(self.info)
+        state.update({
+            "completed": self.completed.to_list(),
+            "last_index": self.completed.first_missing(self.start_index),
+            "timestamp": time.time(),
+            "items_processed": done,
+            "total_items": self.total_items,
+            "progress_percentage": round(done / self.total_items * 100, 2) if self.total_items else 0,
+        })
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".state_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.state_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        return state
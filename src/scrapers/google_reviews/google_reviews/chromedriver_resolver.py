@@ -0,0 +1,184 @@
+# src/scrapers/google_reviews/google_reviews/chromedriver_resolver.py
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+
+VERSION_RE = re.compile(r"(\d+)\.(\d+)\.(\d+)\.(\d+)")
+
+CHROMEDRIVER_NAME = "chromedriver.exe" if os.name == "nt" else "chromedriver"
+
+# Eseguibili di Chrome/Chromium cercati quando non c'è un registro da leggere
+CHROME_CANDIDATES = {
+    "linux": [
+        "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+    ],
+    "darwin": [
+        "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+        "/Applications/Chromium.app/Contents/MacOS/Chromium",
+    ],
+    "win32": [
+        r"%PROGRAMFILES%\Google\Chrome\Application\chrome.exe",
+        r"%PROGRAMFILES(X86)%\Google\Chrome\Application\chrome.exe",
+        r"%LOCALAPPDATA%\Google\Chrome\Application\chrome.exe",
+    ],
+}
+
+
+def parse_version(text):
+    """Estrae la prima versione a 4 componenti da un testo, None se assente"""
+    match = VERSION_RE.search(text or "")
+    return match.group(0) if match else None
+
+
+def major(version):
+    return version.split(".", 1)[0] if version else None
+
+
+def _run_version(executable):
+    try:
+        out = subprocess.run(
+            [executable, "--version"],
+            capture_output=True, text=True, timeout=10,
+        )
+        return parse_version(out.stdout or out.stderr)
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def detect_chrome_version():
+    """
+    Versione di Chrome installata, senza accesso alla rete.
+
+    Returns:
+        str | None: Es. "120.0.6099.109", None se Chrome non è stato trovato
+    """
+    if sys.platform == "win32":
+        try:
+            import winreg
+            for hive in (winreg.HKEY_CURRENT_USER, winreg.HKEY_LOCAL_MACHINE):
+                try:
+                    with winreg.OpenKey(hive, r"Software\Google\Chrome\BLBeacon") as key:
+                        version = parse_version(winreg.QueryValueEx(key, "version")[0])
+                        if version:
+                            return version
+                except OSError:
+                    continue
+        except ImportError:
+            pass
+
+    platform_key = "win32" if sys.platform == "win32" else ("darwin" if sys.platform == "darwin" else "linux")
+    for candidate in CHROME_CANDIDATES[platform_key]:
+        executable = os.path.expandvars(candidate)
+        if not os.path.isabs(executable):
+            executable = shutil.which(executable)
+        if executable and os.path.isfile(executable):
+            version = _run_version(executable)
+            if version:
+                return version
+    return None
+
+
+def detect_driver_version(path):
+    """Versione di un eseguibile chromedriver, None se non eseguibile"""
+    if not path or not os.path.isfile(path):
+        return None
+    return _run_version(path)
+
+
+class ChromeDriverResolver:
+    """
+    Risolve il percorso di ChromeDriver con una cache su disco.
+
+    Ordine di risoluzione:
+        1. percorso in cache, se esiste ancora e la sua major coincide con quella
+           del Chrome locale (o se Chrome non è rilevabile: worker senza rete)
+        2. chromedriver nel PATH con la major giusta
+        3. webdriver_manager (unico passo che usa la rete), poi aggiorna la cache
+
+    Struttura della cache:
+        {"path": "...", "driver_version": "120.0.6099.109",
+         "chrome_version": "120.0.6099.109", "resolved_at": 1700000000.0}
+    """
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+
+    def resolve(self):
+        """
+        Returns:
+            str: Percorso dell'eseguibile chromedriver
+        """
+        chrome_version = detect_chrome_version()
+        cached = self._read_cache()
+
+        if cached and os.path.isfile(cached.get("path", "")):
+            if chrome_version is None or major(cached.get("driver_version")) == major(chrome_version):
+                print(f"[DEBUG] ChromeDriver dalla cache: {cached['path']} ({cached.get('driver_version')})")
+                return cached["path"]
+            print(f"[DEBUG] ChromeDriver in cache ({cached.get('driver_version')}) non compatibile con Chrome {chrome_version}")
+
+        on_path = shutil.which(CHROMEDRIVER_NAME)
+        if on_path:
+            driver_version = detect_driver_version(on_path)
+            if driver_version and (chrome_version is None or major(driver_version) == major(chrome_version)):
+                print(f"[DEBUG] ChromeDriver dal PATH: {on_path} ({driver_version})")
+                self._write_cache(on_path, driver_version, chrome_version)
+                return on_path
+
+        path = self._install()
+        self._write_cache(path, detect_driver_version(path), chrome_version)
+        return path
+
+    # === INTERNI ===
+
+    def _install(self):
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        try:
+            path = ChromeDriverManager().install()
+        except Exception as e:
+            raise RuntimeError(f"Errore durante l'installazione di ChromeDriver: {e}")
+        print(f"[DEBUG] ChromeDriver installato in: {path}")
+
+        # webdriver_manager a volte restituisce un file accanto all'eseguibile (es. THIRD_PARTY_NOTICES)
+        if os.path.basename(path).lower() != CHROMEDRIVER_NAME:
+            directory = os.path.dirname(path)
+            candidate = os.path.join(directory, CHROMEDRIVER_NAME)
+            if os.path.isfile(candidate):
+                print(f"[DEBUG] Eseguibile trovato: {candidate}")
+                path = candidate
+            else:
+                print(f"[DEBUG] Eseguibile non trovato in: {directory}")
+        return path
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, path, driver_version, chrome_version):
+        directory = os.path.dirname(os.path.abspath(self.cache_file))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".chromedriver_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({
+                    "path": path,
+                    "driver_version": driver_version,
+                    "chrome_version": chrome_version,
+                    "resolved_at": time.time(),
+                }, f, indent=2)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"[DEBUG] Impossibile scrivere la cache di ChromeDriver: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
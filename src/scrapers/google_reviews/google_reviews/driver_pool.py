@@ -0,0 +1,227 @@
+# src/scrapers/google_reviews/google_reviews/driver_pool.py
+import time
+import threading
+
+
+class PooledDriver:
+    """Un driver del pool con i contatori usati per decidere quando riciclarlo"""
+
+    def __init__(self, driver, user_data_dir, overflow=False):
+        self.driver = driver
+        self.user_data_dir = user_data_dir
+        self.overflow = overflow
+        self.pages = 0
+        self.created_at = time.time()
+        self.broken = False
+
+
+class DriverPool:
+    """
+    Pool di driver Chrome già avviati, prestati a una richiesta alla volta.
+
+    L'avvio di Chrome è la parte più costosa dell'elaborazione di un'attività:
+    il pool lo paga una volta per driver invece che una volta per richiesta.
+
+    Ciclo di vita di un driver:
+        acquire()  -> driver libero (verificato) oppure nuovo se il pool non è pieno
+        release()  -> torna libero, oppure viene chiuso se va riciclato
+        shutdown() -> chiude tutti i driver (a fine spider)
+
+    Un driver viene riciclato quando:
+        - ha servito `max_pages` pagine (0 = nessun limite)
+        - l'heap JS della pagina supera `max_memory_mb` (0 = nessun limite)
+        - la memoria (PSS) di Chrome e dei suoi renderer supera la soglia del `pss_monitor`
+        - il controllo di salute fallisce o la richiesta lo ha segnato come rotto
+
+    Note:
+        - Se tutti gli N driver sono in prestito, acquire() attende fino a
+          `timeout` secondi e poi crea un driver extra "overflow", chiuso al rilascio
+        - Con timeout=0 acquire() non attende mai (uso dal thread del reactor)
+        - Tutti i metodi sono thread-safe
+    """
+
+    MEMORY_SCRIPT = (
+        "return (window.performance && performance.memory) "
+        "? performance.memory.usedJSHeapSize : 0;"
+    )
+
+    def __init__(self, create_driver, destroy_driver, size=1, max_pages=0, max_memory_mb=0, pss_monitor=None, stats=None):
+        """
+        Args:
+            create_driver (callable): Restituisce (driver, user_data_dir)
+            destroy_driver (callable): Chiude (driver, user_data_dir) e pulisce il profilo
+            size (int): Numero massimo di driver tenuti caldi
+            max_pages (int): Pagine dopo cui un driver viene riciclato
+            max_memory_mb (int): Heap JS oltre cui un driver viene riciclato
+            pss_monitor (PssMonitor): Memoria (PSS) del browser e dei renderer (opzionale)
+            stats: StatsCollector di Scrapy (opzionale)
+        """
+        self.create_driver = create_driver
+        self.destroy_driver = destroy_driver
+        self.size = max(1, int(size))
+        self.max_pages = int(max_pages or 0)
+        self.max_memory_mb = int(max_memory_mb or 0)
+        self.pss_monitor = pss_monitor
+        self.stats = stats
+
+        self._idle = []
+        self._leased = set()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._closed = False
+        self._stats_lock = threading.Lock()
+
+    # === PRESTITO ===
+
+    def acquire(self, timeout=0):
+        """
+        Presta un driver pronto all'uso.
+
+        Args:
+            timeout (float): Secondi di attesa di un driver libero quando tutti
+                             sono in prestito, prima di crearne uno extra (0 = nessuna attesa)
+
+        Returns:
+            PooledDriver: Il driver in prestito (da restituire con release)
+        """
+        deadline = time.monotonic() + max(0.0, float(timeout or 0))
+        while True:
+            with self._available:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("DriverPool già chiuso")
+                    if self._idle or len(self._leased) < self.size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._available.wait(remaining)
+                lease = self._idle.pop() if self._idle else None
+                if lease is None:
+                    overflow = len(self._leased) >= self.size
+                    # Riserva il posto prima di avviare Chrome fuori dal lock
+                    placeholder = object()
+                    self._leased.add(placeholder)
+                    break
+                self._leased.add(lease)
+
+            if self._is_healthy(lease):
+                self._inc_stat("selenium/pool/driver_reused")
+                return lease
+
+            print("[DEBUG] Driver del pool non risponde, lo sostituisco")
+            self._inc_stat("selenium/pool/driver_unhealthy")
+            self._discard(lease)
+
+        try:
+            driver, user_data_dir = self.create_driver()
+        except Exception:
+            self._discard_slot(placeholder)
+            raise
+        lease = PooledDriver(driver, user_data_dir, overflow=overflow)
+        with self._available:
+            self._leased.discard(placeholder)
+            self._leased.add(lease)
+        self._inc_stat("selenium/pool/driver_created")
+        if overflow:
+            print(f"[DEBUG] Pool pieno ({self.size} driver in uso), creato driver extra")
+            self._inc_stat("selenium/pool/driver_overflow")
+        return lease
+
+    def release(self, lease, broken=False):
+        """
+        Restituisce un driver al pool dopo il parsing.
+
+        Args:
+            lease (PooledDriver): Driver ottenuto da acquire()
+            broken (bool): True se la richiesta ha lasciato il driver in stato non affidabile
+        """
+        with self._lock:
+            if lease not in self._leased:
+                return  # Già restituito
+        lease.pages += 1
+        lease.broken = lease.broken or broken
+
+        reason = self._recycle_reason(lease)
+        if reason is None:
+            with self._lock:
+                if not self._closed:
+                    self._leased.discard(lease)
+                    self._idle.append(lease)
+                    self._available.notify()
+                    return
+            reason = "pool chiuso"
+
+        print(f"[DEBUG] Riciclo driver dopo {lease.pages} pagine ({reason})")
+        if not lease.overflow:
+            self._inc_stat("selenium/pool/driver_recycled")
+        self._discard(lease)
+
+    def shutdown(self):
+        """Chiude tutti i driver, liberi e in prestito"""
+        with self._lock:
+            self._closed = True
+            leases = self._idle + list(self._leased)
+            self._idle = []
+            self._leased = set()
+            self._available.notify_all()
+        leases = [lease for lease in leases if isinstance(lease, PooledDriver)]
+        for lease in leases:
+            self._destroy(lease)
+        print(f"[DEBUG] DriverPool chiuso ({len(leases)} driver)")
+
+    # === INTERNI ===
+
+    def _recycle_reason(self, lease):
+        if lease.broken:
+            return "driver rotto"
+        if lease.overflow:
+            return "driver extra"
+        if self.max_pages and lease.pages >= self.max_pages:
+            return f"limite di {self.max_pages} pagine"
+        if self.max_memory_mb:
+            used_mb = self._js_heap_mb(lease)
+            if used_mb is None:
+                return "memoria non leggibile"
+            if used_mb > self.max_memory_mb:
+                return f"heap JS {used_mb:.0f} MB > {self.max_memory_mb} MB"
+        if self.pss_monitor is not None:
+            return self.pss_monitor.over_limit(lease.driver)
+        return None
+
+    def _js_heap_mb(self, lease):
+        try:
+            used = lease.driver.execute_script(self.MEMORY_SCRIPT) or 0
+            return float(used) / (1024 * 1024)
+        except Exception:
+            # Driver morto o sessione persa: va riciclato
+            return None
+
+    def _is_healthy(self, lease):
+        """Il driver risponde ed è su una finestra valida"""
+        try:
+            lease.driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, lease):
+        self._discard_slot(lease)
+        self._destroy(lease)
+
+    def _discard_slot(self, lease):
+        with self._available:
+            self._leased.discard(lease)
+            self._available.notify()
+
+    def _destroy(self, lease):
+        try:
+            self.destroy_driver(lease.driver, lease.user_data_dir)
+        except Exception as e:
+            print(f"[DEBUG] Errore chiusura driver del pool: {e}")
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            # acquire/release girano nei thread worker
+            with self._stats_lock:
+                self.stats.inc_value(key)
@@ -0,0 +1,176 @@
+# src/scrapers/google_reviews/google_reviews/enrichment_cache.py
+import os
+import re
+import time
+import sqlite3
+import threading
+import unicodedata
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichment (
+    name             TEXT NOT NULL,
+    city             TEXT NOT NULL,
+    geo              TEXT NOT NULL DEFAULT '',
+    rating           TEXT,
+    review_count     TEXT,
+    google_url       TEXT,
+    match_confidence REAL,
+    fetched_at       REAL NOT NULL,
+    PRIMARY KEY (name, city, geo)
+)
+"""
+
+
+def normalize_key(value):
+    """Normalizza nome o città: minuscole, senza accenti, punteggiatura e spazi doppi"""
+    text = unicodedata.normalize("NFKD", str(value or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^\w]+", " ", text)
+    return " ".join(text.split())
+
+
+def lookup_key(nome, citta, coords=None):
+    """
+    Chiave di una ricerca Google: (nome, città) normalizzati e coordinate
+    arrotondate a ~100 m (stringa vuota senza coordinate).
+
+    Returns:
+        tuple | None: (nome, città, geo), None se nome o città mancano
+    """
+    name, city = normalize_key(nome), normalize_key(citta)
+    if not name or not city:
+        return None
+    geo = f"{coords[0]:.3f},{coords[1]:.3f}" if coords else ""
+    return name, city, geo
+
+
+class EnrichmentCache:
+    """
+    Cache persistente (SQLite) dei risultati dello spider Google.
+
+    Chiave: (nome, città) normalizzati e, se GOOGLE_CACHE_USE_COORDS, le
+    coordinate di Pagine Gialle arrotondate a ~100 m: un'attività presente in
+    più categorie o già arricchita in un run precedente non apre un browser.
+    Valori: rating, review_count, google_url e confidenza del match (score
+    nome/città). Le righe più vecchie di `ttl_days` sono ignorate e sovrascritte.
+
+    Statistiche:
+        google/cache/hits, google/cache/misses, google/cache/expired,
+        google/cache/stored, google/cache/hit_rate
+
+    Note:
+        - Si salvano solo risultati senza errori e con confidenza >= `min_confidence`
+        - WAL + busy_timeout: più processi (shard, categorie) condividono lo stesso file
+    """
+
+    def __init__(self, path, ttl_days=14, min_confidence=0.6, use_coords=True, commit_every=50, stats=None):
+        self.path = path
+        self.ttl = float(ttl_days) * 86400
+        self.min_confidence = float(min_confidence)
+        self.use_coords = use_coords
+        self.commit_every = max(1, int(commit_every))
+        self.stats = stats
+        self._lock = threading.Lock()
+        self._pending = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        """None se la cache è disattivata (GOOGLE_CACHE_ENABLED = False)"""
+        if not settings.getbool('GOOGLE_CACHE_ENABLED', True) or not settings.get('GOOGLE_CACHE_PATH'):
+            return None
+        return cls(
+            settings.get('GOOGLE_CACHE_PATH'),
+            ttl_days=settings.getfloat('GOOGLE_CACHE_TTL_DAYS', 14),
+            min_confidence=settings.getfloat('GOOGLE_CACHE_MIN_CONFIDENCE', 0.6),
+            use_coords=settings.getbool('GOOGLE_CACHE_USE_COORDS', True),
+            stats=stats,
+        )
+
+    def key(self, nome, citta, coords=None):
+        """
+        Returns:
+            tuple | None: (nome, città, geo) normalizzati, None se nome o città mancano
+        """
+        return lookup_key(nome, citta, coords if self.use_coords else None)
+
+    def get(self, key):
+        """
+        Returns:
+            dict | None: rating, review_count, google_url, match_confidence, fetched_at
+        """
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rating, review_count, google_url, match_confidence, fetched_at "
+                "FROM enrichment WHERE name = ? AND city = ? AND geo = ?", key
+            ).fetchone()
+        if row is None:
+            self._inc('google/cache/misses')
+            return None
+        if self.ttl and time.time() - row[4] > self.ttl:
+            self._inc('google/cache/expired')
+            self._inc('google/cache/misses')
+            return None
+        self._inc('google/cache/hits')
+        return {
+            "rating": row[0],
+            "review_count": row[1],
+            "google_url": row[2],
+            "match_confidence": row[3],
+            "fetched_at": row[4],
+        }
+
+    def put(self, key, item):
+        """Salva il risultato di un'attività (ignorato se con errore o confidenza bassa)"""
+        if key is None or item.get("error"):
+            return False
+        confidence = item.get("match_confidence")
+        if confidence is None or confidence < self.min_confidence:
+            return False
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO enrichment "
+                "(name, city, geo, rating, review_count, google_url, match_confidence, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (
+                    _as_text(item.get("rating")), _as_text(item.get("review_count")),
+                    item.get("google_url"), float(confidence), time.time(),
+                ),
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._conn.commit()
+                self._pending = 0
+        self._inc('google/cache/stored')
+        return True
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+        if self.stats is not None:
+            hits = self.stats.get_value('google/cache/hits', 0)
+            lookups = hits + self.stats.get_value('google/cache/misses', 0)
+            if lookups:
+                self.stats.set_value('google/cache/hit_rate', round(hits * 100.0 / lookups, 2))
+
+    def _inc(self, key):
+        if self.stats is not None:
+            with self._lock:
+                self.stats.inc_value(key)
+
+
+def _as_text(value):
+    # rating e review_count arrivano come stringhe da Maps ("4,5", "1.234"): si conservano così
+    return None if value is None else str(value)
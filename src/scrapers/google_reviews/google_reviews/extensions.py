@@ -0,0 +1,50 @@
+# src/scrapers/google_reviews/google_reviews/extensions.py
+import os
+import json
+import logging
+import tempfile
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+logger = logging.getLogger(__name__)
+
+
+class StatsDump:
+    """
+    Scrive le statistiche finali del crawl in un file JSON.
+
+    Il crawl Google gira come sottoprocesso della pipeline: il file
+    (STATS_DUMP_FILE, es. passato con -s) è il canale con cui l'esecutore
+    riporta nel proprio report memoria dei browser, pagine e tempi.
+    """
+
+    def __init__(self, path, stats):
+        self.path = path
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get('STATS_DUMP_FILE')
+        if not path:
+            raise NotConfigured
+        extension = cls(path, crawler.stats)
+        # engine_stopped arriva dopo tutti gli handler di spider_closed
+        # (middleware: media PSS, pagine al minuto)
+        crawler.signals.connect(extension.engine_stopped, signal=signals.engine_stopped)
+        return extension
+
+    def engine_stopped(self):
+        stats = dict(self.stats.get_stats())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".stats_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2, default=str, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            logger.info(f"Statistiche del crawl salvate in: {self.path}")
+        except OSError as e:
+            logger.error(f"Errore salvataggio statistiche: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
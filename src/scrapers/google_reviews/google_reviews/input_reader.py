@@ -0,0 +1,217 @@
+# src/scrapers/google_reviews/google_reviews/input_reader.py
+import os
+import re
+import json
+import mmap
+import array
+import tempfile
+
+
+# Chiavi dei gruppi per categoria: step 2 attuale ("entries") e formato storico ("strutture")
+GROUP_KEYS = (b"strutture", b"entries")
+
+# Campi letti dallo spider -> alias nei record di Pagine Gialle normalizzati (step 2)
+FIELD_ALIASES = {
+    "nome": ("name_pg",),
+    "città": ("city_pg",),
+    "indirizzo": ("address_pg",),
+}
+
+_TOKEN = re.compile(rb'[\[\]{}":]')
+_STRING_END = re.compile(rb'(?:[^"\\]|\\.)*"', re.DOTALL)
+_INDEX_MAGIC = b"GRIDX1\n"
+_DECODER = json.JSONDecoder()
+
+
+def _skip_object(buf, at, window=4096, max_window=1 << 20):
+    """
+    Fine (esclusa) dell'oggetto JSON che inizia in `at`, decodificato dal parser C.
+
+    Returns:
+        tuple[int, object] | None: (offset di fine, oggetto), None se l'oggetto
+                                   supera `max_window` byte (scansione a token)
+    """
+    while True:
+        # surrogateescape: un carattere multibyte tagliato a fine finestra non sposta gli offset
+        text = buf[at:at + window].decode("utf-8", "surrogateescape")
+        try:
+            obj, end = _DECODER.raw_decode(text)
+        except ValueError:
+            if window >= max_window or at + window >= len(buf):
+                return None
+            window *= 8
+            continue
+        return at + len(text[:end].encode("utf-8", "surrogateescape")), obj
+
+
+def scan_records(buf):
+    """
+    Posizioni (start, end) in byte di ogni attività in un input JSON, senza decodificarlo.
+
+    Formati riconosciuti:
+        - lista di gruppi: [{"category": ..., "entries": [{...}, ...]}, ...]
+          (anche con "strutture" al posto di "entries")
+        - lista di attività: [{...}, {...}]
+        - JSON Lines: un'attività (o un gruppo) per riga
+
+    Yields:
+        tuple[int, int]: Intervallo [start, end) del record nel buffer
+    """
+    stack = []          # [tipo, start, ruolo, ultima chiave, è un gruppo]
+    last_string = None
+    window = 4096       # Finestra del parser C, adattata alla dimensione delle attività
+    pos = 0
+    while True:
+        match = _TOKEN.search(buf, pos)
+        if match is None:
+            break
+        char = match.group()
+        at = match.start()
+        pos = match.end()
+        if char == b'"':
+            end = _STRING_END.match(buf, pos)
+            if end is None:
+                raise ValueError(f"Stringa non terminata all'offset {at}")
+            # Solo le chiavi brevi interessano (strutture/entries)
+            last_string = buf[pos:end.end() - 1] if end.end() - pos <= 16 else None
+            pos = end.end()
+        elif char == b":":
+            if stack:
+                stack[-1][3] = last_string
+        elif char == b"{":
+            parent = stack[-1] if stack else None
+            if parent is None or (parent[0] == "arr" and parent[2] == "top"):
+                role = "item"
+            elif parent[0] == "arr" and parent[2] == "group":
+                role = "record"
+            else:
+                role = None
+            if role is not None:
+                # Attività (o gruppo piccolo) saltata in un colpo col parser C
+                skipped = _skip_object(buf, at, window)
+                if skipped is not None:
+                    end, obj = skipped
+                    is_group = role == "item" and any(isinstance(obj.get(k.decode()), list) for k in GROUP_KEYS)
+                    if not is_group:
+                        window = max(4096, 2 * (end - at))
+                        yield at, end
+                        pos = end
+                        continue
+            stack.append(["obj", at, role, None, False])
+        elif char == b"[":
+            parent = stack[-1] if stack else None
+            if parent is None:
+                role = "top"
+            elif parent[0] == "obj" and parent[2] == "item" and parent[3] in GROUP_KEYS:
+                role = "group"
+                parent[4] = True
+            else:
+                role = None
+            stack.append(["arr", at, role, None, False])
+        else:  # } o ]
+            if not stack:
+                raise ValueError(f"Parentesi non bilanciata all'offset {at}")
+            kind, start, role, _key, is_group = stack.pop()
+            if kind == "obj" and (role == "record" or (role == "item" and not is_group)):
+                yield start, at + 1
+    if stack:
+        raise ValueError("Input JSON troncato")
+
+
+class InputReader:
+    """
+    Lettura incrementale dell'input dello spider Google.
+
+    Al posto di json.load + lista completa in memoria si costruisce un indice
+    degli offset di ogni attività (16 byte per attività), salvato accanto allo
+    stato e riusato finché l'input non cambia (dimensione e mtime). Il file è
+    letto via mmap: record(i) decodifica solo l'attività i, quindi in memoria
+    restano l'indice e le attività in volo.
+
+    I record sono restituiti con gli alias applicati (nome/città/indirizzo dai
+    campi `_pg` dello step 2) e sono oggetti nuovi, di proprietà del chiamante.
+    """
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path
+        self._file = None
+        self._map = None
+        self._offsets = None
+
+    def open(self):
+        """
+        Returns:
+            int: Numero di attività nell'input
+        """
+        self._file = open(self.path, "rb")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._offsets = array.array("q")
+            return 0
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = self._load_index()
+        if self._offsets is None:
+            self._offsets = array.array("q")
+            for start, end in scan_records(self._map):
+                self._offsets.append(start)
+                self._offsets.append(end)
+            self._save_index()
+        return len(self)
+
+    def __len__(self):
+        return len(self._offsets) // 2 if self._offsets is not None else 0
+
+    def record(self, idx):
+        """Attività idx come dict, con gli alias dei campi applicati"""
+        start, end = self._offsets[2 * idx], self._offsets[2 * idx + 1]
+        item = json.loads(self._map[start:end])
+        for field, aliases in FIELD_ALIASES.items():
+            if item.get(field) in (None, "", "N/A"):
+                for alias in aliases:
+                    if item.get(alias) not in (None, "", "N/A"):
+                        item[field] = item[alias]
+                        break
+        return item
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # === INDICE ===
+
+    def _signature(self):
+        st = os.fstat(self._file.fileno())
+        return f"{st.st_size}:{st.st_mtime_ns}\n".encode()
+
+    def _load_index(self):
+        if not self.index_path:
+            return None
+        try:
+            with open(self.index_path, "rb") as f:
+                if f.readline() != _INDEX_MAGIC or f.readline() != self._signature():
+                    return None
+                offsets = array.array("q")
+                offsets.frombytes(f.read())
+                return offsets
+        except (OSError, ValueError):
+            return None
+
+    def _save_index(self):
+        if not self.index_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".index_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_INDEX_MAGIC)
+                f.write(self._signature())
+                f.write(self._offsets.tobytes())
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
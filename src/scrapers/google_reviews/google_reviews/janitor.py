@@ -0,0 +1,223 @@
+# src/scrapers/google_reviews/google_reviews/janitor.py
+import os
+import sys
+import stat
+import queue
+import shutil
+import tempfile
+import threading
+
+
+WORKSPACE_PREFIX = "gr_ws_"
+# PID del chromedriver del workspace: senza --user-data-dir nella sua riga di
+# comando, un chromedriver rimasto senza Chrome si ritrova solo da qui
+DRIVER_PID_FILE = "chromedriver.pid"
+
+
+def workspace_root(base_dir=None):
+    """Cartella che contiene i workspace dei driver (una sottocartella per driver)"""
+    # Percorso assoluto: la ricerca dei Chrome orfani lo confronta con --user-data-dir
+    root = os.path.abspath(os.path.join(base_dir or tempfile.gettempdir(), "google_reviews_workspaces"))
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def new_workspace(root):
+    """
+    Crea il workspace privato di un driver dentro `root`.
+
+    Il nome contiene il PID del crawl (gr_ws_<pid>_<random>): un workspace
+    rimasto da un crawl terminato si riconosce senza aprire nulla.
+
+    Returns:
+        tuple: (workspace, profilo Chrome, cartella TMP del driver)
+    """
+    workspace = tempfile.mkdtemp(prefix=f"{WORKSPACE_PREFIX}{os.getpid()}_", dir=root)
+    profile_dir = os.path.join(workspace, "profile")
+    tmp_dir = os.path.join(workspace, "tmp")
+    os.makedirs(profile_dir)
+    os.makedirs(tmp_dir)
+    return workspace, profile_dir, tmp_dir
+
+
+def workspace_pid(name):
+    """PID del crawl proprietario di un workspace, None se il nome non è riconosciuto"""
+    if not name.startswith(WORKSPACE_PREFIX):
+        return None
+    pid = name[len(WORKSPACE_PREFIX):].split("_", 1)[0]
+    return int(pid) if pid.isdigit() else None
+
+
+def record_driver_pid(workspace, pid):
+    """Scrive nel workspace il PID del chromedriver che lo usa"""
+    if not workspace or not pid:
+        return
+    try:
+        with open(os.path.join(workspace, DRIVER_PID_FILE), "w", encoding="utf-8") as f:
+            f.write(str(pid))
+    except OSError as e:
+        print(f"[DEBUG] Impossibile registrare il PID di chromedriver: {e}")
+
+
+def recorded_driver_pid(workspace):
+    """PID del chromedriver registrato nel workspace, None se assente o illeggibile"""
+    try:
+        with open(os.path.join(workspace, DRIVER_PID_FILE), "r", encoding="utf-8") as f:
+            pid = f.read().strip()
+    except OSError:
+        return None
+    return int(pid) if pid.isdigit() else None
+
+
+def pid_alive(pid):
+    """True se un processo con questo PID è ancora in esecuzione"""
+    if pid <= 0:
+        return False
+    if sys.platform == "win32":
+        # os.kill su Windows termina il processo: si interroga il kernel via ctypes
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == STILL_ACTIVE
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _on_rm_error(func, path, exc_info):
+    try:
+        os.chmod(path, stat.S_IWRITE)
+        func(path)
+    except Exception:
+        pass
+
+
+class Janitor:
+    """
+    Thread in background che elimina i workspace dei driver chiusi.
+
+    Sul percorso delle richieste si fa solo schedule(path): niente rmtree,
+    niente sleep, nessuna scansione della cartella temporanea. Il thread:
+        - raccoglie le cartelle in lotti (attende `batch_interval` secondi)
+        - gira a priorità minima (nice 19 su Linux)
+        - riprova le cartelle ancora bloccate (file aperti su Windows) nei lotti
+          successivi, fino a `max_attempts` tentativi
+
+    Al primo avvio elimina anche i workspace lasciati da crawl ormai terminati
+    (PID nel nome non più attivo): mai quelli di processi vivi.
+    """
+
+    def __init__(self, base_dir=None, batch_interval=2.0, max_attempts=5, stats=None):
+        self.root = workspace_root(base_dir)
+        self.batch_interval = float(batch_interval)
+        self.max_attempts = int(max_attempts)
+        self.stats = stats
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        return cls(
+            base_dir=settings.get('SELENIUM_WORKSPACE_DIR'),
+            batch_interval=settings.getfloat('SELENIUM_JANITOR_INTERVAL', 2.0),
+            stats=stats,
+        )
+
+    # === API ===
+
+    def new_workspace(self):
+        """Workspace per un nuovo driver, nella cartella sorvegliata dal janitor"""
+        return new_workspace(self.root)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="selenium-janitor", daemon=True)
+            self._thread.start()
+
+    def schedule(self, path):
+        """Accoda una cartella da eliminare (non blocca)"""
+        if path:
+            self._queue.put((path, 0))
+
+    def close(self, timeout=30):
+        """Svuota la coda ed arresta il thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        else:
+            self._drain(final=True)
+
+    # === THREAD ===
+
+    def _run(self):
+        self._lower_priority()
+        self._sweep_stale()
+        while not self._stop.is_set():
+            self._stop.wait(self.batch_interval)
+            self._drain(final=self._stop.is_set())
+
+    def _drain(self, final=False):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for path, attempts in batch:
+            if self._delete(path):
+                continue
+            if attempts + 1 < self.max_attempts and not final:
+                self._queue.put((path, attempts + 1))
+            else:
+                print(f"[DEBUG] Janitor: impossibile rimuovere {path}")
+                self._inc_stat('selenium/janitor/failed')
+
+    def _delete(self, path):
+        if not os.path.exists(path):
+            return True
+        shutil.rmtree(path, onerror=_on_rm_error)
+        if os.path.exists(path):
+            return False
+        self._inc_stat('selenium/janitor/removed')
+        return True
+
+    def _sweep_stale(self):
+        """Accoda i workspace di crawl terminati"""
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            pid = workspace_pid(name)
+            if pid is not None and pid != os.getpid() and not pid_alive(pid):
+                self.schedule(os.path.join(self.root, name))
+                self._inc_stat('selenium/janitor/stale')
+
+    @staticmethod
+    def _lower_priority():
+        try:
+            if sys.platform.startswith("linux"):
+                # Su Linux la priorità è per thread: vale solo per il janitor
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (OSError, AttributeError):
+            pass
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value(key)
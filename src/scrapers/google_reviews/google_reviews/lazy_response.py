@@ -0,0 +1,58 @@
+# src/scrapers/google_reviews/google_reviews/lazy_response.py
+import time
+import threading
+
+from scrapy.http import HtmlResponse
+
+
+class LazyHtmlResponse(HtmlResponse):
+    """
+    HtmlResponse collegata al driver vivo, con il DOM letto solo se serve.
+
+    Lo spider Google lavora direttamente su response.meta["driver"] e quasi
+    mai sul body: serializzare ogni volta il DOM di Maps (diversi MB) con
+    driver.page_source è tempo e memoria sprecati. Qui il DOM viene letto dal
+    driver al primo accesso a `text` (e quindi a selector/xpath/css).
+
+    Note:
+        - `body` resta vuoto: i componenti interni di Scrapy ne leggono la
+          lunghezza per ogni risposta, e non devono forzare la serializzazione.
+          Il contenuto della pagina si legge da `response.text`
+        - Quando il driver torna nel pool la risposta viene staccata (detach):
+          leggere `text` dopo, senza averlo letto prima, solleva RuntimeError
+          invece di restituire la pagina di un'altra richiesta
+    """
+
+    def __init__(self, *args, driver=None, on_materialize=None, **kwargs):
+        kwargs.setdefault("body", b"")
+        kwargs.setdefault("encoding", "utf-8")
+        super().__init__(*args, **kwargs)
+        self._driver = driver
+        self._on_materialize = on_materialize
+        self._lazy_text = None
+        self._lazy_lock = threading.Lock()
+
+    @property
+    def text(self):
+        with self._lazy_lock:
+            if self._lazy_text is None:
+                if self._driver is None:
+                    raise RuntimeError(
+                        "DOM non disponibile: il driver è già tornato nel pool "
+                        "(leggere response.text prima del rilascio)"
+                    )
+                started = time.monotonic()
+                self._lazy_text = self._driver.page_source
+                if self._on_materialize is not None:
+                    self._on_materialize(len(self._lazy_text.encode("utf-8")), time.monotonic() - started)
+        return self._lazy_text
+
+    @property
+    def materialized(self):
+        """True se il DOM è già stato letto dal driver"""
+        return self._lazy_text is not None
+
+    def detach(self):
+        """Scollega il driver (chiamato quando il driver torna nel pool)"""
+        with self._lazy_lock:
+            self._driver = None
@@ -1,17 +1,29 @@
 import tempfile
 import os
 import time
-import shutil
-import glob
-import stat
+import threading
 
+from scrapy import signals
 from scrapy.http import HtmlResponse
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.common.exceptions import WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
 from scrapy_selenium import SeleniumRequest
 
+from google_reviews.driver_pool import DriverPool
+from google_reviews.tab_pool import TabPool
+from google_reviews.waits import EventWaits
+from google_reviews.profile_template import ProfileTemplate
+from google_reviews.chromedriver_resolver import ChromeDriverResolver
+from google_reviews.janitor import Janitor, record_driver_pid
+from google_reviews.lazy_response import LazyHtmlResponse
+from google_reviews.network_capture import NetworkCapture
+from google_reviews.phase_timings import PhaseTimer
+from google_reviews.url_blocking import blocked_url_patterns, apply_url_blocking
+from google_reviews.process_memory import PssMonitor, driver_pid, kill_orphan_browsers, kill_process_tree
+
 
 class CustomSeleniumMiddleware:
     @classmethod
@@ -20,155 +32,352 @@ class CustomSeleniumMiddleware:
         driver_name = settings.get('SELENIUM_DRIVER_NAME', 'chrome')
         executable_path = settings.get('SELENIUM_DRIVER_EXECUTABLE_PATH')
         driver_arguments = settings.getlist('SELENIUM_DRIVER_ARGUMENTS')
-        middleware = cls(driver_name, executable_path, driver_arguments)
+        # Un driver caldo per ogni richiesta concorrente, salvo override esplicito
+        pool_size = settings.getint('SELENIUM_DRIVER_POOL_SIZE') or settings.getint('CONCURRENT_REQUESTS', 1)
+        middleware = cls(
+            driver_name,
+            executable_path,
+            driver_arguments,
+            pool_size=pool_size,
+            max_pages=settings.getint('SELENIUM_DRIVER_MAX_PAGES', 0),
+            max_memory_mb=settings.getint('SELENIUM_DRIVER_MAX_MEMORY_MB', 0),
+            workers=settings.getint('SELENIUM_WORKERS') or pool_size,
+            tabs_per_browser=settings.getint('SELENIUM_TABS_PER_BROWSER', 1),
+            tab_script_timeout=settings.getfloat('SELENIUM_TAB_SCRIPT_TIMEOUT', 10),
+            pool_wait=settings.getfloat('SELENIUM_DRIVER_POOL_WAIT', 30),
+            waits=EventWaits.from_settings(settings, crawler.stats),
+            profile_template=ProfileTemplate.from_settings(settings, crawler.stats),
+            warm_urls=settings.getlist('GOOGLE_PROFILE_WARM_URLS'),
+            driver_cache_file=settings.get('CHROMEDRIVER_CACHE_FILE'),
+            janitor=Janitor.from_settings(settings, crawler.stats),
+            lazy_body=settings.getbool('SELENIUM_LAZY_BODY', True),
+            capture=NetworkCapture.from_settings(settings, crawler.stats),
+            blocked_urls=blocked_url_patterns(settings),
+            pss_monitor=PssMonitor(
+                settings.getint('SELENIUM_DRIVER_MAX_PSS_MB', 0),
+                crawler.stats,
+                check_interval=settings.getfloat('SELENIUM_DRIVER_PSS_CHECK_INTERVAL', 30),
+            ),
+            kill_orphans=settings.getbool('SELENIUM_KILL_ORPHANS', True),
+            stats=crawler.stats,
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
         return middleware
 
-    def __init__(self, driver_name, executable_path, driver_arguments):
+    def __init__(self, driver_name, executable_path, driver_arguments,
+                 pool_size=1, max_pages=0, max_memory_mb=0, workers=None, tabs_per_browser=1, tab_script_timeout=10,
+                 pool_wait=30, waits=None, profile_template=None, warm_urls=None, driver_cache_file=None, janitor=None, lazy_body=True, capture=None, blocked_urls=None, pss_monitor=None, kill_orphans=True, stats=None):
         self.driver_name = driver_name
+        self.driver_cache_file = driver_cache_file or os.path.join(tempfile.gettempdir(), "chromedriver_cache.json")
         self.executable_path = executable_path or self._get_chromedriver_path()
         self.driver_arguments = driver_arguments
+        # Memoria (PSS) di chromedriver + Chrome + renderer, misurata al rilascio
+        # al più ogni SELENIUM_DRIVER_PSS_CHECK_INTERVAL secondi per browser (/proc)
+        self.pss_monitor = pss_monitor or PssMonitor(stats=stats)
+        self.kill_orphans = kill_orphans
+        self.tabs_per_browser = max(1, int(tabs_per_browser or 1))
+        if self.tabs_per_browser > 1:
+            # Più attività in parallelo nello stesso Chrome, una per scheda
+            self.pool = TabPool(
+                self._create_driver,
+                self._destroy_driver,
+                size=pool_size,
+                tabs_per_browser=self.tabs_per_browser,
+                max_pages=max_pages,
+                max_memory_mb=max_memory_mb,
+                script_timeout=tab_script_timeout,
+                prepare_tab=self._prepare_tab,
+                pss_monitor=self.pss_monitor,
+                stats=stats,
+            )
+        else:
+            self.pool = DriverPool(
+                self._create_driver,
+                self._destroy_driver,
+                size=pool_size,
+                max_pages=max_pages,
+                max_memory_mb=max_memory_mb,
+                pss_monitor=self.pss_monitor,
+                stats=stats,
+            )
+        self.pool_wait = pool_wait
+        self.waits = waits or EventWaits(stats=stats)
+        self.profile_template = profile_template
+        self.warm_urls = warm_urls or []
+        # Le cartelle dei driver chiusi vengono eliminate in background
+        self.janitor = janitor or Janitor(stats=stats)
+        self.lazy_body = lazy_body
+        # Modalità network: dati dei posti dalle risposte di Maps (log di performance CDP)
+        self.capture = capture
+        # Tile, font, immagini e analytics bloccati via CDP su ogni driver
+        self.blocked_urls = list(blocked_urls or [])
+        self._stats_lock = threading.Lock()
+        self.stats = stats
+        # Il lavoro del browser gira su thread dedicati, mai sul thread del reactor
+        self.workers = max(1, int(workers or pool_size))
+        self.threadpool = ThreadPool(minthreads=0, maxthreads=self.workers, name="selenium")
+        self.started_at = None
         print(f"[DEBUG] CustomSeleniumMiddleware inizializzato con: {self.executable_path}")
+        print(f"[DEBUG] Pool driver: {pool_size} driver, riciclo dopo {max_pages or '∞'} pagine / {max_memory_mb or '∞'} MB")
+        print(f"[DEBUG] Worker Selenium: {self.workers}")
+        if self.tabs_per_browser > 1:
+            print(f"[DEBUG] Modalità schede: {self.tabs_per_browser} schede per browser, {self.pool.max_browsers} browser")
+        print(f"[DEBUG] Modalità di cattura: {'network' if self.capture else 'dom'}")
+        print(f"[DEBUG] URL bloccati: {len(self.blocked_urls)} pattern")
+
+    def spider_opened(self, spider):
+        if self.kill_orphans:
+            # Chrome/chromedriver di crawl precedenti andati in crash: prima dei
+            # workspace, che altrimenti resterebbero bloccati dai file aperti
+            killed = kill_orphan_browsers(self.janitor.root)
+            if killed:
+                print(f"[DEBUG] Terminati {killed} processi Chrome/chromedriver orfani")
+            if self.stats is not None:
+                self.stats.set_value('selenium/orphans_killed', killed)
+        self.janitor.start()
+        self.threadpool.start()
+        self.started_at = time.monotonic()
+        if self.stats is not None:
+            self.stats.set_value('selenium/workers', self.workers)
+
+    def spider_closed(self, spider):
+        # Attende la fine dei render in corso prima di chiudere i driver
+        self.threadpool.stop()
+        self.pool.shutdown()
+        self.janitor.close()
+        self.pss_monitor.finalize()
+        if self.stats is not None and self.started_at is not None:
+            elapsed = time.monotonic() - self.started_at
+            pages = self.stats.get_value('selenium/pages_rendered', 0)
+            if elapsed > 0:
+                self.stats.set_value('selenium/pages_per_minute', round(pages * 60.0 / elapsed, 2))
 
     def _get_chromedriver_path(self):
-        try:
-            path = ChromeDriverManager().install()
-            print(f"[DEBUG] ChromeDriver installato in: {path}")
-            if not path.lower().endswith("chromedriver.exe"):
-                directory = os.path.dirname(path)
-                candidate = os.path.join(directory, "chromedriver.exe")
-                if os.path.isfile(candidate):
-                    print(f"[DEBUG] Eseguibile trovato: {candidate}")
-                    path = candidate
-                else:
-                    print(f"[DEBUG] Eseguibile non trovato in: {directory}")
-            return path
-        except Exception as e:
-            raise RuntimeError(f"Errore durante l'installazione di ChromeDriver: {e}")
+        # Cache su disco + versione locale di Chrome: la rete serve solo se le versioni non combaciano
+        return ChromeDriverResolver(self.driver_cache_file).resolve()
 
     def _create_driver(self):
+        # Workspace privato del driver: profilo Chrome + cartella TMP, così anche
+        # i file temporanei di Chrome (es. chrome_BITS_*) finiscono al suo interno
+        workspace, user_data_dir, tmp_dir = self.janitor.new_workspace()
+        # Profilo clonato dal template caldo (consenso accettato + cache di Maps) quando disponibile
+        if self.profile_template is not None and self.profile_template.ensure(self._build_profile_template):
+            try:
+                self.profile_template.clone(user_data_dir)
+            except Exception as e:
+                print(f"[DEBUG] Clonazione profilo template fallita, uso un profilo vuoto: {e}")
+        # In modalità schede get() non deve attendere il caricamento: tiene il lock del browser
+        page_load_strategy = "none" if self.tabs_per_browser > 1 else None
+        try:
+            driver = self._launch_driver(user_data_dir, tmp_dir, page_load_strategy)
+        except Exception:
+            self.janitor.schedule(workspace)
+            raise
+        # Se il crawl muore, il prossimo avvio ritrova il chromedriver dal workspace
+        record_driver_pid(workspace, driver_pid(driver))
+        return driver, user_data_dir
+
+    def _launch_driver(self, user_data_dir, tmp_dir=None, page_load_strategy=None):
         options = webdriver.ChromeOptions()
+        if page_load_strategy:
+            options.page_load_strategy = page_load_strategy
         for argument in self.driver_arguments:
             options.add_argument(argument)
         # Disabilita il caricamento delle immagini per velocizzare il caricamento delle pagine
         prefs = {"profile.managed_default_content_settings.images": 2}
         options.add_experimental_option("prefs", prefs)
-        # Creazione di un profilo temporaneo per questo driver
-        user_data_dir = tempfile.mkdtemp()
         options.add_argument(f"--user-data-dir={user_data_dir}")
+        # Cookie cifrati con chiave fissa su Linux: restano leggibili nelle copie del template
+        options.add_argument("--password-store=basic")
+        if self.capture is not None:
+            self.capture.configure(options)
+        env = None
+        if tmp_dir:
+            # Chrome eredita l'ambiente di chromedriver
+            env = dict(os.environ, TMP=tmp_dir, TEMP=tmp_dir, TMPDIR=tmp_dir)
         try:
-            service = Service(self.executable_path)
+            service = Service(self.executable_path, env=env)
             driver = webdriver.Chrome(service=service, options=options)
-            return driver, user_data_dir
         except WebDriverException as e:
-            try:
-                if os.path.exists(user_data_dir):
-                    shutil.rmtree(user_data_dir, ignore_errors=True)
-            except Exception as cleanup_error:
-                print(f"[DEBUG] Cleanup error: {cleanup_error}")
             raise RuntimeError(f"Errore nell'avvio di ChromeDriver: {e}")
+        if apply_url_blocking(driver, self.blocked_urls) and self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value('selenium/url_blocking/drivers')
+        return driver
 
-    @staticmethod
-    def _on_rm_error(func, path, exc_info):
-        try:
-            os.chmod(path, stat.S_IWRITE)
-            func(path)
-        except Exception as e:
-            print(f"[DEBUG] Errore nel cambio dei permessi di {path}: {e}")
+    def _prepare_tab(self, driver):
+        """Nuova scheda di un browser condiviso: il blocco URL vale per target, va riapplicato"""
+        apply_url_blocking(driver, self.blocked_urls)
 
-    def cleanup_chrome_bits(self):
-        temp_dir = tempfile.gettempdir()
-        pattern = os.path.join(temp_dir, "chrome_BITS_*")
-        for folder in glob.glob(pattern):
+    def _build_profile_template(self, user_data_dir):
+        """
+        Apre Chrome sul profilo del template, accetta il consenso e scalda la cache.
+
+        Returns:
+            bool: True se alla fine non siamo sulla pagina di consenso
+        """
+        driver = self._launch_driver(user_data_dir)
+        try:
+            for url in self.warm_urls:
+                driver.get(url)
+                self.waits.page_loaded(driver, name='template_warmup')
+                if "consent.google.com" in driver.current_url:
+                    self._accept_cookies(driver)
+                    driver.get(url)
+                    self.waits.page_loaded(driver, name='template_warmup')
+            return bool(self.warm_urls) and "consent.google.com" not in driver.current_url
+        finally:
             try:
-                time.sleep(1)  # Attende brevemente per garantire che le risorse siano rilasciate
-                shutil.rmtree(folder, onerror=self._on_rm_error)
-                print(f"[DEBUG] Rimosso: {folder}")
+                # quit() chiude Chrome in modo pulito: cookie e cache vengono scritti su disco
+                driver.quit()
             except Exception as e:
-                print(f"[DEBUG] Errore nella rimozione di {folder}: {e}")
+                print(f"[DEBUG] Errore chiusura driver template: {e}")
+
+    def _destroy_driver(self, driver, user_data_dir):
+        """Chiude un driver del pool e affida il suo workspace al janitor"""
+        pid = driver_pid(driver)
+        self.pss_monitor.forget(driver)
+        try:
+            driver.quit()
+            print(f"[DEBUG] Driver chiuso con successo")
+        except Exception as e:
+            print(f"[DEBUG] Errore chiusura driver: {e}")
+            # quit() fallito: chromedriver e Chrome resterebbero vivi
+            killed = kill_process_tree(pid)
+            if killed and self.stats is not None:
+                with self._stats_lock:
+                    self.stats.inc_value('selenium/zombies_killed', killed)
+        if user_data_dir:
+            # Il profilo sta in <workspace>/profile: si elimina l'intero workspace
+            self.janitor.schedule(os.path.dirname(user_data_dir))
 
     def process_request(self, request, spider):
         # Gestisci solo le richieste SeleniumRequest
         if not isinstance(request, SeleniumRequest):
             return None
             
+        from twisted.internet import reactor
+
+        # Restituisce un Deferred: Scrapy continua a schedulare altre richieste
+        # mentre questo browser carica la pagina in un thread del pool
+        started = time.monotonic()
+        # Tempi per fase della ricerca (attesa di un thread libero inclusa in
+        # driver_acquire): il timer prosegue nello spider via meta
+        request.meta['phase_timer'] = PhaseTimer()
+        d = deferToThreadPool(reactor, self.threadpool, self._render, request)
+        d.addCallback(self._record_render, started)
+        return d
+
+    def _record_render(self, response, started):
+        """Statistiche di render, aggiornate sul thread del reactor"""
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value('selenium/pages_rendered')
+                self.stats.inc_value('selenium/render_time', time.monotonic() - started)
+                if isinstance(response, LazyHtmlResponse):
+                    self.stats.inc_value('selenium/body/lazy_responses')
+        return response
+
+    def _record_body(self, size, elapsed):
+        """Costo della serializzazione del DOM (modalità eager, thread worker)"""
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value('selenium/body/serialized')
+                self.stats.inc_value('selenium/body/bytes', size)
+                self.stats.inc_value('selenium/body/time', elapsed)
+
+    def _record_materialize(self, size, elapsed):
+        """Una risposta lazy è stata effettivamente letta da una callback"""
+        self._record_body(size, elapsed)
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value('selenium/body/lazy_materialized')
+
+    def _render(self, request):
+        """Carica la pagina nel browser (eseguito in un thread worker)"""
         print(f"[DEBUG] Elaborazione richiesta Selenium: {request.url}")
-        driver, user_data_dir = self._create_driver()
+        timer = request.meta['phase_timer']
+        lease = self.pool.acquire(timeout=self.pool_wait)
+        timer.lap('driver_acquire')
+        driver = lease.driver
         
         # Ottieni wait_time dal meta
         wait_time = request.meta.get('wait_time', 5)
         
         try:
+            if self.capture is not None:
+                # Il driver arriva dal pool: via gli eventi di rete della pagina precedente
+                self.capture.reset(driver)
             driver.get(request.url)
-            time.sleep(wait_time)  # Attesa dopo caricamento pagina
+            # Attende DOM e contenuto Maps invece di dormire wait_time secondi
+            # page_timeout: limite più lungo per le richieste della corsia di retry
+            saved = self.waits.page_loaded(driver, replaced=wait_time, timeout=request.meta.get('page_timeout'))
+            timer.lap('navigation')
             
             # Verifica se è presente una pagina di consenso cookie
             if "consent.google.com" in driver.current_url:
-                self._accept_cookies(driver)
+                if self.stats is not None:
+                    with self._stats_lock:
+                        self.stats.inc_value('google/profile/consent_seen')
+                saved += self._accept_cookies(driver)
                 driver.refresh()
-                time.sleep(3)  # Attesa extra dopo refresh
-            
-            body = str.encode(driver.page_source)
+                saved += self.waits.page_loaded(driver, replaced=3, name='consent_refresh')
+                timer.lap('consent')
             
-            # Debug
-            print(f"[DEBUG] URL corrente: {driver.current_url}")
-            print(f"[DEBUG] Lunghezza pagina: {len(driver.page_source)}")
-            
-            response = HtmlResponse(
-                driver.current_url, 
-                body=body, 
-                encoding='utf-8', 
-                request=request
-            )
+            current_url = driver.current_url
+            print(f"[DEBUG] URL corrente: {current_url}")
+
+            if self.lazy_body:
+                # Il DOM viene serializzato solo se una callback legge response.text
+                response = LazyHtmlResponse(
+                    current_url,
+                    driver=driver,
+                    on_materialize=self._record_materialize,
+                    request=request,
+                )
+            else:
+                body_started = time.monotonic()
+                body = str.encode(driver.page_source)
+                self._record_body(len(body), time.monotonic() - body_started)
+                timer.lap('page_source')
+                print(f"[DEBUG] Lunghezza pagina: {len(body)}")
+                
+                response = HtmlResponse(
+                    current_url, 
+                    body=body, 
+                    encoding='utf-8', 
+                    request=request
+                )
             
             # Aggiungi il driver alla risposta
             response.meta['driver'] = driver
-            response.meta['user_data_dir'] = user_data_dir
-
-            def close_driver(response):
-                print(f"[DEBUG] Chiusura driver per {request.url}")
-                if driver:
-                    try:
-                        driver.quit()
-                        print(f"[DEBUG] Driver chiuso con successo")
-                    except Exception as e:
-                        print(f"[DEBUG] Errore chiusura driver: {e}")
-                
-                if os.path.exists(user_data_dir):
-                    try:
-                        shutil.rmtree(user_data_dir, ignore_errors=True)
-                        print(f"[DEBUG] Cartella utente rimossa: {user_data_dir}")
-                    except Exception as e:
-                        print(f"[DEBUG] Errore rimozione cartella: {e}")
-                        
-                self.cleanup_chrome_bits()
+            response.meta['user_data_dir'] = lease.user_data_dir
+            response.meta['wait_saved'] = saved
+            response.meta['network_capture'] = self.capture
+
+            def close_driver(response, broken=False):
+                # Il driver non viene chiuso: torna nel pool per la prossima richiesta
+                print(f"[DEBUG] Rilascio driver per {request.url}")
+                if isinstance(response, LazyHtmlResponse):
+                    response.detach()
+                self.pool.release(lease, broken=broken)
                 return response
             
             # Registra la callback
             request.meta['close_driver_callback'] = close_driver
             
-            # Crea una nuova funzione quit con pulizia
-            original_quit = driver.quit
-            def quit_and_cleanup():
-                print(f"[DEBUG] Chiusura driver e pulizia risorse")
-                original_quit()
-                try:
-                    shutil.rmtree(user_data_dir, ignore_errors=True)
-                    self.cleanup_chrome_bits()
-                except Exception as e:
-                    print(f"[DEBUG] Errore durante la pulizia: {e}")
-                    
-            driver.quit = quit_and_cleanup
-            
             return response
         except Exception as e:
             print(f"[DEBUG] Errore durante il processo della richiesta: {e}")
-            if driver:
-                driver.quit()
-            if os.path.exists(user_data_dir):
-                shutil.rmtree(user_data_dir, ignore_errors=True)
+            self.pool.release(lease, broken=isinstance(e, WebDriverException))
             raise
             
     def _accept_cookies(self, driver):
+        """
+        Returns:
+            float: Secondi risparmiati dall'attesa del consenso (0 se nessun pulsante cliccato)
+        """
         print("[DEBUG] Tentativo di accettare i cookie")
         try:
             for xpath in [
@@ -187,11 +396,10 @@ class CustomSeleniumMiddleware:
                     )
                     print(f"[DEBUG] Pulsante cookie trovato: {xpath}")
                     driver.execute_script("arguments[0].click()", btn)
-                    time.sleep(2)  # Breve pausa dopo il click
-                    return True
+                    return self.waits.consent_closed(driver, replaced=2)
                 except Exception as e:
                     print(f"[DEBUG] Pulsante non trovato ({xpath}): {e}")
                     continue
         except Exception as e:
             print(f"[DEBUG] Errore nell'accettazione cookie: {e}")
-        return False
\ No newline at end of file
+        return 0.0
\ No newline at end of file
@@ -0,0 +1,246 @@
+# src/scrapers/google_reviews/google_reviews/network_capture.py
+import re
+import json
+import threading
+
+
+# Risposte di Maps che contengono i dati dei posti:
+#   - il documento della ricerca/scheda (APP_INITIALIZATION_STATE nell'HTML)
+#   - le XHR di ricerca (tbm=map) e di anteprima della scheda (preview/place)
+PAYLOAD_URL_PATTERNS = (
+    "/maps/preview/place",
+    "/search?tbm=map",
+    "/maps/search/",
+    "/maps/place/",
+)
+XSSI_PREFIX = ")]}'"
+APP_STATE_RE = re.compile(r"window\.APP_INITIALIZATION_STATE\s*=\s*(\[.*?\]);\s*window\.", re.S)
+# Testi che Maps usa per i posti chiusi (la lingua dipende dal profilo)
+CLOSED_MARKERS = ("chiuso definitivamente", "permanently closed")
+# Limiti della visita della struttura annidata (i payload possono contenere migliaia di nodi)
+MAX_DEPTH = 12
+MAX_NODES = 200000
+
+
+def enable_performance_log(options):
+    """Abilita nei ChromeOptions il log di performance con gli eventi Network"""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def _load_json(text):
+    """JSON di Maps: toglie il prefisso anti-XSSI e il commento finale /*""*/"""
+    text = (text or "").strip()
+    if text.startswith(XSSI_PREFIX):
+        text = text[len(XSSI_PREFIX):]
+    if text.endswith('/*""*/'):
+        text = text[:-6]
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _decode_payload(body):
+    """Struttura JSON di una risposta Maps (HTML del documento o XHR), None se non riconosciuta"""
+    if not body:
+        return None
+    match = APP_STATE_RE.search(body) if "APP_INITIALIZATION_STATE" in body else None
+    if match:
+        return _load_json(match.group(1))
+    data = _load_json(body)
+    # La ricerca tbm=map a volte incapsula il payload in {"c": 0, "d": ")]}'..."}
+    if isinstance(data, dict) and isinstance(data.get("d"), str):
+        return _load_json(data["d"])
+    return data
+
+
+def _get(node, *path):
+    for key in path:
+        if not isinstance(node, list) or not isinstance(key, int) or len(node) <= key:
+            return None
+        node = node[key]
+    return node
+
+
+def _strings(node, limit=2000):
+    """Stringhe contenute in un nodo annidato (visita limitata)"""
+    out, stack = [], [node]
+    while stack and len(out) < limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+        elif isinstance(item, list):
+            stack.extend(item)
+    return out
+
+
+def _as_place(node):
+    """
+    Riconosce l'array di un posto nel formato interno di Maps.
+
+    Maps non documenta gli indici: si usano quelli stabili da anni
+    ([11] nome, [4][7] rating, [4][8] recensioni, [39]/[2] indirizzo) e si
+    accetta il nodo solo se i tipi tornano.
+
+    Returns:
+        dict | None: {name, rating, review_count, address, closed}
+    """
+    if not isinstance(node, list) or len(node) < 40:
+        return None
+    name = _get(node, 11)
+    if not isinstance(name, str) or not name.strip():
+        return None
+    rating, reviews = _get(node, 4, 7), _get(node, 4, 8)
+    if rating is not None and not (isinstance(rating, (int, float)) and 0 < rating <= 5):
+        return None
+    if reviews is not None and not isinstance(reviews, int):
+        return None
+
+    address = _get(node, 39)
+    if not isinstance(address, str):
+        lines = _get(node, 2)
+        address = ", ".join(x for x in lines if isinstance(x, str)) if isinstance(lines, list) else None
+
+    closed = any(marker in s.lower() for s in _strings(node) for marker in CLOSED_MARKERS)
+    if rating is None and reviews is None and not closed and not address:
+        return None
+    return {
+        "name": name.strip(),
+        "rating": str(rating).replace(".", ",") if rating is not None else None,
+        "review_count": str(reviews) if reviews is not None else None,
+        "address": address or None,
+        "closed": closed,
+    }
+
+
+def extract_places(body):
+    """
+    Posti contenuti nel corpo di una risposta Maps.
+
+    Le stringhe che contengono a loro volta un payload )]}' (come accade
+    dentro APP_INITIALIZATION_STATE) vengono decodificate e visitate.
+
+    Returns:
+        list[dict]: [{name, rating, review_count, address, closed}]
+    """
+    places, seen = [], set()
+    root = _decode_payload(body)
+    if root is None:
+        return places
+    stack, visited = [(root, 0)], 0
+    while stack and visited < MAX_NODES:
+        node, depth = stack.pop()
+        visited += 1
+        if isinstance(node, str):
+            if node.startswith(XSSI_PREFIX) and depth < MAX_DEPTH:
+                inner = _load_json(node)
+                if inner is not None:
+                    stack.append((inner, depth + 1))
+            continue
+        if not isinstance(node, list):
+            continue
+        place = _as_place(node)
+        if place is not None:
+            key = (place["name"], place["address"])
+            if key not in seen:
+                seen.add(key)
+                places.append(place)
+            continue
+        if depth < MAX_DEPTH:
+            stack.extend((child, depth + 1) for child in reversed(node))
+    return places
+
+
+class NetworkCapture:
+    """
+    Dati dei posti letti dalle risposte di rete di Maps via CDP.
+
+    Il driver registra gli eventi Network nel log di performance di
+    ChromeDriver; collect() individua le risposte di Maps con i dati dei posti,
+    ne legge il corpo con Network.getResponseBody e le decodifica. Niente
+    selettori CSS: rating, recensioni, indirizzo e stato arrivano dal JSON.
+
+    Note:
+        - Il log di performance è un buffer per driver: reset() va chiamato
+          prima di ogni navigazione, altrimenti restano eventi della pagina
+          precedente (i driver del pool vengono riutilizzati)
+        - Il corpo di una risposta è disponibile solo finché Chrome lo tiene
+          in memoria: se manca, collect() lo salta e lo spider usa il DOM
+    """
+
+    def __init__(self, url_patterns=PAYLOAD_URL_PATTERNS, max_body_mb=8, stats=None):
+        self.url_patterns = tuple(url_patterns)
+        self.max_body_bytes = int(float(max_body_mb) * 1024 * 1024)
+        self.stats = stats
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        if (settings.get('GOOGLE_CAPTURE_MODE') or 'dom').lower() != 'network':
+            return None
+        return cls(
+            url_patterns=settings.getlist('GOOGLE_CAPTURE_URL_PATTERNS') or PAYLOAD_URL_PATTERNS,
+            max_body_mb=settings.getfloat('GOOGLE_CAPTURE_MAX_BODY_MB', 8),
+            stats=stats,
+        )
+
+    def configure(self, options):
+        enable_performance_log(options)
+
+    def reset(self, driver):
+        """Scarta gli eventi accumulati dal driver (pagine precedenti)"""
+        try:
+            driver.get_log("performance")
+        except Exception as e:
+            print(f"[DEBUG] Log di performance non disponibile: {e}")
+
+    def collect(self, driver):
+        """
+        Posti presenti nelle risposte di Maps arrivate dall'ultimo reset/collect.
+
+        Returns:
+            list[dict]: [{name, rating, review_count, address, closed}]
+        """
+        try:
+            entries = driver.get_log("performance")
+        except Exception as e:
+            print(f"[DEBUG] Log di performance non disponibile: {e}")
+            return []
+
+        responses, finished = {}, set()
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            method, params = message.get("method"), message.get("params") or {}
+            if method == "Network.responseReceived":
+                url = (params.get("response") or {}).get("url", "")
+                if any(pattern in url for pattern in self.url_patterns):
+                    responses[params.get("requestId")] = url
+            elif method == "Network.loadingFinished":
+                if params.get("encodedDataLength", 0) <= self.max_body_bytes:
+                    finished.add(params.get("requestId"))
+
+        places = []
+        for request_id, url in responses.items():
+            if request_id not in finished:
+                continue
+            try:
+                result = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+            except Exception:
+                self._inc_stat("google/network_capture/body_unavailable")
+                continue
+            body = result.get("body") or ""
+            if result.get("base64Encoded"):
+                continue
+            self._inc_stat("google/network_capture/payloads")
+            self._inc_stat("google/network_capture/payload_bytes", len(body))
+            places.extend(extract_places(body))
+        return places
+
+    def _inc_stat(self, key, count=1):
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value(key, count)
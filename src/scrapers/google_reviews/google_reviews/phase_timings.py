@@ -0,0 +1,224 @@
+# src/scrapers/google_reviews/google_reviews/phase_timings.py
+import os
+import json
+import math
+import time
+import threading
+
+
+# Fasi di una ricerca Google, nell'ordine in cui avvengono
+PHASES = (
+    "driver_acquire",    # Driver libero dal pool (o avvio di uno nuovo)
+    "navigation",        # driver.get + attesa della pagina Maps
+    "consent",           # Pagina di consenso cookie (solo se mostrata)
+    "page_source",       # Serializzazione del DOM (solo risposte eager)
+    "handoff",           # Dal middleware al thread di parsing (coda del reactor)
+    "result_list_wait",  # Attesa della lista risultati o della scheda del posto
+    "matching",          # Scelta del risultato (score nome/città)
+    "place_page_wait",   # Click sul risultato e attesa della pagina del posto
+    "extraction",        # Snapshot, payload di rete, rating e recensioni
+    "persistence",       # Journal, cache e stato di ripresa
+)
+TOTAL = "total"
+
+# Bucket logaritmici: dal millisecondo, ogni bucket è il 10% più ampio del
+# precedente (errore sui percentili < 5%, ~150 bucket fino a 10 minuti)
+_BUCKET_MIN = 0.001
+_BUCKET_GROWTH = 1.1
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_of(seconds):
+    """Indice del bucket di una durata (0 per durate sotto il millisecondo)"""
+    if seconds <= _BUCKET_MIN:
+        return 0
+    return int(math.log(seconds / _BUCKET_MIN) / _LOG_GROWTH) + 1
+
+
+def bucket_value(bucket):
+    """Durata rappresentativa di un bucket (media geometrica dei suoi estremi)"""
+    if bucket <= 0:
+        return _BUCKET_MIN
+    return _BUCKET_MIN * _BUCKET_GROWTH ** (bucket - 0.5)
+
+
+def percentile(buckets, q):
+    """
+    Percentile q (0-100) di un istogramma.
+
+    Args:
+        buckets (dict): {indice bucket: conteggio}; le chiavi possono essere
+                        stringhe (istogrammi riletti dal dump JSON delle statistiche)
+
+    Returns:
+        float | None: Secondi, None se l'istogramma è vuoto
+    """
+    counts = sorted((int(bucket), count) for bucket, count in buckets.items())
+    total = sum(count for _bucket, count in counts)
+    if not total:
+        return None
+    rank = max(1, math.ceil(total * q / 100.0))
+    seen = 0
+    for bucket, count in counts:
+        seen += count
+        if seen >= rank:
+            return bucket_value(bucket)
+    return bucket_value(counts[-1][0])
+
+
+def summarize_timings(stats_list):
+    """
+    Percentili per fase dagli istogrammi di uno o più crawl (es. gli shard).
+
+    Gli istogrammi si sommano bucket per bucket: i percentili del totale sono
+    esatti quanto quelli di un crawl unico, a differenza di una media dei p95.
+
+    Args:
+        stats_list (list[dict]): Statistiche Scrapy (o dump JSON) con le chiavi
+                                 google/timing/<fase>/buckets
+
+    Returns:
+        dict: {fase: {"count", "p50", "p95", "p99", "max"}} in secondi
+    """
+    merged, maxima = {}, {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if not key.startswith("google/timing/") or not key.endswith("/buckets"):
+                continue
+            phase = key[len("google/timing/"):-len("/buckets")]
+            buckets = merged.setdefault(phase, {})
+            for bucket, count in value.items():
+                buckets[int(bucket)] = buckets.get(int(bucket), 0) + count
+            phase_max = stats.get(f"google/timing/{phase}/max")
+            if phase_max is not None:
+                maxima[phase] = max(maxima.get(phase, 0), phase_max)
+
+    order = {phase: i for i, phase in enumerate(PHASES + (TOTAL,))}
+    summary = {}
+    for phase in sorted(merged, key=lambda p: order.get(p, len(order))):
+        buckets = merged[phase]
+        phase_max = maxima.get(phase)
+        summary[phase] = {"count": sum(buckets.values())}
+        for q in PERCENTILES:
+            value = percentile(buckets, q)
+            # Il valore del bucket può superare il massimo osservato
+            summary[phase][f"p{q}"] = round(min(value, phase_max) if phase_max is not None else value, 3)
+        summary[phase]["max"] = phase_max
+    return summary
+
+
+class PhaseTimer:
+    """
+    Cronometro a giri dei tempi di una ricerca.
+
+    Ogni lap(fase) attribuisce alla fase il tempo trascorso dal giro
+    precedente: il timer viaggia in request.meta dal middleware al thread di
+    parsing e la somma delle fasi coincide con la durata della ricerca.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._mark = self.started
+        self.phases = {}
+
+    def lap(self, phase):
+        now = time.monotonic()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._mark
+        self._mark = now
+
+    @property
+    def total(self):
+        return self._mark - self.started
+
+
+class PhaseTimings:
+    """
+    Istogrammi dei tempi per fase delle ricerche Google.
+
+    Ogni ricerca (capofila o tentativo della corsia di retry) registra il suo
+    PhaseTimer; a fine crawl p50/p95/p99 di ogni fase finiscono nelle
+    statistiche Scrapy (e quindi nel report della pipeline). Le ricerche più
+    lente di `slow_seconds` vengono scritte, con URL e tempi per fase, nel
+    log JSON Lines `slow_log_path`.
+
+    Statistiche:
+        google/timing/<fase>/{count,p50,p95,p99,max,buckets}, google/timing/slow_items
+    """
+
+    def __init__(self, slow_seconds=30.0, slow_log_path=None, stats=None, **info):
+        self.slow_seconds = float(slow_seconds)
+        self.slow_log_path = slow_log_path
+        self.stats = stats
+        self.info = info
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._max = {}
+        self._slow_file = None
+
+    @classmethod
+    def from_settings(cls, settings, stats=None, **info):
+        return cls(
+            slow_seconds=settings.getfloat('GOOGLE_SLOW_ITEM_SECONDS', 30.0),
+            slow_log_path=settings.get('GOOGLE_SLOW_ITEM_LOG'),
+            stats=stats,
+            **info,
+        )
+
+    def record(self, timer, url, **details):
+        """
+        Aggiunge una ricerca agli istogrammi.
+
+        Returns:
+            bool: True se la ricerca è lenta (scritta nel log delle ricerche lente)
+        """
+        total = timer.total
+        with self._lock:
+            for phase, seconds in list(timer.phases.items()) + [(TOTAL, total)]:
+                buckets = self._buckets.setdefault(phase, {})
+                bucket = bucket_of(seconds)
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+                self._max[phase] = max(self._max.get(phase, 0.0), seconds)
+            if total < self.slow_seconds:
+                return False
+            if self.stats is not None:
+                self.stats.inc_value('google/timing/slow_items')
+            self._write_slow(dict(
+                self.info,
+                url=url,
+                total=round(total, 3),
+                phases={phase: round(seconds, 3) for phase, seconds in timer.phases.items()},
+                timestamp=time.time(),
+                **details,
+            ))
+        return True
+
+    def _write_slow(self, entry):
+        if not self.slow_log_path:
+            return
+        try:
+            if self._slow_file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.slow_log_path)), exist_ok=True)
+                self._slow_file = open(self.slow_log_path, "a", encoding="utf-8")
+            self._slow_file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            self._slow_file.flush()
+        except OSError as e:
+            print(f"[DEBUG] Errore scrittura log ricerche lente: {e}")
+
+    def close(self):
+        """Scrive istogrammi e percentili nelle statistiche"""
+        with self._lock:
+            if self._slow_file is not None:
+                self._slow_file.close()
+                self._slow_file = None
+            if self.stats is None:
+                return
+            for phase, buckets in self._buckets.items():
+                prefix = f"google/timing/{phase}"
+                self.stats.set_value(f"{prefix}/count", sum(buckets.values()))
+                for q in PERCENTILES:
+                    self.stats.set_value(f"{prefix}/p{q}", round(min(percentile(buckets, q), self._max[phase]), 3))
+                self.stats.set_value(f"{prefix}/max", round(self._max[phase], 3))
+                # Istogramma grezzo: gli shard si uniscono sommando i bucket
+                self.stats.set_value(f"{prefix}/buckets", dict(sorted(buckets.items())))
@@ -0,0 +1,121 @@
+# src/scrapers/google_reviews/google_reviews/place_snapshot.py
+
+# Coppie (rating, numero recensioni) provate in ordine: le stesse dei
+# selettori usati in precedenza con find_element
+RATING_SELECTORS = [
+    ("div.F7nice span[aria-hidden='true']", "div.F7nice span[aria-label*='recensioni']"),
+    ("span.fontDisplayLarge", "button[aria-label*='recensioni']"),
+    ("span.ceHGZc", "button.HHrUdb"),
+    ("div.fontBodyMedium.dmRWX span.ceHGZc", "div.fontBodyMedium.dmRWX span[aria-label]"),
+]
+
+RESULT_LINK_SELECTOR = "a.hfpxzc"
+# Scheda del risultato nella lista: rating e recensioni mostrati accanto al nome
+CARD_CONTAINER_SELECTOR = "div[role='article']"
+CARD_RATING_SELECTOR = "span.MW4etd"
+CARD_REVIEWS_SELECTOR = "span.UY7F9"
+ADDRESS_SELECTOR = "button[data-item-id='address']"
+CLOSED_MARKER = "chiuso definitivamente"
+# Pannello della scheda del posto: il solo punto in cui cercare lo stato di chiusura
+PLACE_PANEL_SELECTOR = "div[role='main']"
+
+# Un solo round trip WebDriver: tutto ciò che serve al parsing in un oggetto JSON.
+# Il DOM non viene mai serializzato: escono solo stringhe brevi e booleani.
+SNAPSHOT_JS = """
+const pairs = arguments[0], linkSel = arguments[1], addrSel = arguments[2], closedMarker = arguments[3];
+const cardSel = arguments[4], cardRatingSel = arguments[5], cardReviewsSel = arguments[6];
+const panelSel = arguments[7];
+const text = (el) => el ? (el.innerText || el.textContent || '').trim() : '';
+const card = (a) => {
+    const box = a.closest(cardSel) || a.parentElement;
+    if (!box) return null;
+    let rating = text(box.querySelector(cardRatingSel)) || null;
+    let reviews = text(box.querySelector(cardReviewsSel)).replace(/\\D/g, '') || null;
+    if (!rating || !reviews) {
+        // Fallback: etichetta accessibile "4,5 stelle 1.234 recensioni"
+        const img = box.querySelector("span[role='img'][aria-label]");
+        const m = img ? /([\\d.,]+)\\s*stell\\w*\\s*([\\d.]+)\\s*recension/i.exec(img.getAttribute('aria-label')) : null;
+        if (m) {
+            rating = rating || m[1];
+            reviews = reviews || m[2].replace(/\\D/g, '');
+        }
+    }
+    const boxText = text(box);
+    return {
+        rating: rating,
+        review_count: reviews,
+        text: boxText,
+        closed: boxText.toLowerCase().includes(closedMarker)
+    };
+};
+let rating = null, reviews = null, selector = null;
+for (const [rSel, rvSel] of pairs) {
+    const r = document.querySelector(rSel), rv = document.querySelector(rvSel);
+    if (!r || !rv) continue;
+    const rText = text(r), rvDigits = text(rv).replace(/\\D/g, '');
+    if (rText || rvDigits) {
+        rating = rText || null;
+        reviews = rvDigits || null;
+        selector = rSel;
+        break;
+    }
+}
+const addrEl = document.querySelector(addrSel);
+const panel = document.querySelector(panelSel);
+return {
+    url: location.href,
+    title: document.title,
+    is_place: location.href.includes('maps/place'),
+    closed: panel ? panel.textContent.toLowerCase().includes(closedMarker) : false,
+    rating: rating,
+    review_count: reviews,
+    rating_selector: selector,
+    address: addrEl && addrEl.offsetParent !== null ? text(addrEl) : null,
+    results: Array.from(document.querySelectorAll(linkSel)).map((a, i) => ({
+        index: i,
+        label: a.getAttribute('aria-label') || '',
+        href: a.href || a.getAttribute('href') || '',
+        card: card(a)
+    }))
+};
+"""
+
+# Solo l'indirizzo visibile: usato nel polling mentre il pannello finisce di caricarsi
+ADDRESS_JS = """
+const el = document.querySelector(arguments[0]);
+if (!el || el.offsetParent === null) return null;
+return (el.innerText || el.textContent || '').trim() || null;
+"""
+
+CLICK_RESULT_JS = """
+const links = document.querySelectorAll(arguments[0]);
+const link = links[arguments[1]];
+if (!link) return false;
+link.click();
+return true;
+"""
+
+
+def place_snapshot(driver):
+    """
+    Legge in un'unica chiamata lo stato della pagina Maps corrente.
+
+    Returns:
+        dict: url, title, is_place, closed, rating, review_count, rating_selector,
+              address (None se non visibile),
+              results [{index, label, href, card: {rating, review_count, text, closed}}]
+    """
+    return driver.execute_script(
+        SNAPSHOT_JS, RATING_SELECTORS, RESULT_LINK_SELECTOR, ADDRESS_SELECTOR, CLOSED_MARKER,
+        CARD_CONTAINER_SELECTOR, CARD_RATING_SELECTOR, CARD_REVIEWS_SELECTOR, PLACE_PANEL_SELECTOR,
+    ) or {}
+
+
+def visible_address(driver):
+    """Indirizzo della scheda se già visibile, altrimenti None (un round trip leggero)"""
+    return driver.execute_script(ADDRESS_JS, ADDRESS_SELECTOR) or None
+
+
+def click_result(driver, index):
+    """Apre il risultato `index` della lista (un round trip)"""
+    return bool(driver.execute_script(CLICK_RESULT_JS, RESULT_LINK_SELECTOR, index))
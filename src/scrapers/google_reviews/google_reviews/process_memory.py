@@ -0,0 +1,298 @@
+# src/scrapers/google_reviews/google_reviews/process_memory.py
+import os
+import sys
+import time
+import signal
+import threading
+
+from google_reviews.janitor import WORKSPACE_PREFIX, workspace_pid, pid_alive, recorded_driver_pid
+
+
+PROC = "/proc"
+BROWSER_NAMES = ("chrome", "chromium", "chromedriver", "google-chrome", "headless_shell")
+
+
+def proc_available():
+    """La misura della memoria usa /proc: solo Linux"""
+    return sys.platform.startswith("linux") and os.path.isdir(PROC)
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def _parent_map():
+    """{pid: ppid} di tutti i processi visibili"""
+    parents = {}
+    for name in os.listdir(PROC):
+        if not name.isdigit():
+            continue
+        stat = _read(os.path.join(PROC, name, "stat")).decode("utf-8", "replace")
+        # Il nome del processo è tra parentesi e può contenere spazi: si parte dall'ultima ")"
+        fields = stat[stat.rfind(")") + 2:].split()
+        if len(fields) > 1 and fields[1].isdigit():
+            parents[int(name)] = int(fields[1])
+    return parents
+
+
+def _children(pid):
+    """
+    Figli diretti di un processo da /proc/<pid>/task/<tid>/children.
+
+    Returns:
+        list | None: PID dei figli, None se il kernel non espone i file children
+    """
+    task_dir = os.path.join(PROC, str(pid), "task")
+    try:
+        tids = os.listdir(task_dir)
+    except OSError:
+        return []  # Processo terminato
+    children = []
+    for tid in tids:
+        path = os.path.join(task_dir, tid, "children")
+        if not os.path.exists(path):
+            return None
+        children.extend(int(child) for child in _read(path).split())
+    return children
+
+
+def descendants(pid, parents=None):
+    """
+    PID del processo e di tutti i suoi discendenti.
+
+    Senza mappa dei padri si scende l'albero dai file children del processo
+    (costo proporzionale all'albero, non a tutti i processi del sistema);
+    la scansione completa di /proc resta il fallback.
+    """
+    if parents is None:
+        found, stack = [], [pid]
+        while stack:
+            current = stack.pop()
+            children = _children(current)
+            if children is None:
+                return descendants(pid, _parent_map())
+            found.append(current)
+            stack.extend(children)
+        return found
+    children = {}
+    for child, parent in parents.items():
+        children.setdefault(parent, []).append(child)
+    found, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        found.append(current)
+        stack.extend(children.get(current, []))
+    return found
+
+
+def rss_mb(pid):
+    """Resident set size di un processo in MB, 0 se il processo non esiste più"""
+    for line in _read(os.path.join(PROC, str(pid), "status")).splitlines():
+        if line.startswith(b"VmRSS:"):
+            return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def pss_mb(pid):
+    """
+    Proportional set size di un processo in MB (/proc/<pid>/smaps_rollup).
+
+    Le pagine condivise (binario e librerie di Chrome, memoria condivisa tra
+    browser e renderer) sono divise tra i processi che le mappano: la somma
+    sull'albero è la memoria effettiva del browser, mentre la somma degli RSS
+    conta le pagine condivise una volta per renderer. Senza smaps_rollup
+    (kernel < 4.14) si ripiega sull'RSS.
+    """
+    rollup = _read(os.path.join(PROC, str(pid), "smaps_rollup"))
+    if not rollup:
+        return rss_mb(pid)
+    for line in rollup.splitlines():
+        if line.startswith(b"Pss:"):
+            return int(line.split()[1]) / 1024.0
+    return rss_mb(pid)
+
+
+def tree_pss_mb(pid):
+    """
+    PSS di un processo e dei suoi discendenti (chromedriver -> chrome -> renderer, GPU, utility).
+
+    Returns:
+        float | None: MB, None se /proc non è disponibile
+    """
+    if not proc_available() or not pid:
+        return None
+    return sum(pss_mb(p) for p in descendants(pid))
+
+
+def driver_pid(driver):
+    """PID del processo chromedriver di un driver Selenium, None se non disponibile"""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def kill_process_tree(pid):
+    """Termina un processo e i suoi discendenti (chromedriver rimasto dopo un quit fallito)"""
+    if not proc_available() or not pid:
+        return 0
+    killed = 0
+    for target in reversed(descendants(pid)):
+        try:
+            os.kill(target, signal.SIGKILL)
+            killed += 1
+        except OSError:
+            pass
+    return killed
+
+
+def kill_orphan_browsers(workspace_root):
+    """
+    Termina chrome/chromedriver rimasti da crawl terminati (crash, quit fallito).
+
+    Un Chrome è orfano se il suo --user-data-dir è un workspace del janitor
+    (gr_ws_<pid>_...) il cui crawl proprietario non è più vivo. Insieme al
+    Chrome si terminano i suoi discendenti e il chromedriver che lo ha avviato.
+    Anche i chromedriver registrati nei workspace di crawl morti vengono
+    terminati, con i loro discendenti: sono quelli il cui Chrome è già uscito
+    o che sono stati riassegnati a init, e che nella riga di comando non hanno
+    nessun riferimento al workspace. Processi di crawl vivi e Chrome estranei
+    allo scraper non vengono toccati.
+
+    Returns:
+        int: Processi terminati
+    """
+    if not proc_available():
+        return 0
+    marker = os.path.join(os.path.abspath(workspace_root), WORKSPACE_PREFIX)
+    parents = _parent_map()
+    targets = set()
+    for pid in parents:
+        cmdline = _read(os.path.join(PROC, str(pid), "cmdline")).split(b"\0")
+        for arg in cmdline:
+            arg = arg.decode("utf-8", "replace")
+            if not arg.startswith("--user-data-dir=") or marker not in arg:
+                continue
+            workspace = arg[len("--user-data-dir="):][len(os.path.dirname(marker)) + 1:].split(os.sep, 1)[0]
+            owner = workspace_pid(workspace)
+            if owner is None or owner == os.getpid() or pid_alive(owner):
+                continue
+            targets.update(descendants(pid, parents))
+            parent = parents.get(pid)
+            comm = _read(os.path.join(PROC, str(parent), "comm")).decode("utf-8", "replace").strip()
+            if parent and comm.startswith("chromedriver"):
+                targets.add(parent)
+            break
+
+    # chromedriver registrati al lancio nei workspace di crawl terminati
+    root = os.path.dirname(marker)
+    try:
+        names = os.listdir(root)
+    except OSError:
+        names = []
+    for name in names:
+        owner = workspace_pid(name)
+        if owner is None or owner == os.getpid() or pid_alive(owner):
+            continue
+        pid = recorded_driver_pid(os.path.join(root, name))
+        if pid is None or pid not in parents:
+            continue
+        # Il PID può essere stato riutilizzato: solo se è ancora un chromedriver
+        comm = _read(os.path.join(PROC, str(pid), "comm")).decode("utf-8", "replace").strip()
+        if comm.startswith("chromedriver"):
+            targets.update(descendants(pid, parents))
+
+    killed = 0
+    for pid in targets:
+        comm = _read(os.path.join(PROC, str(pid), "comm")).decode("utf-8", "replace").strip().lower()
+        if not comm.startswith(BROWSER_NAMES):
+            continue
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except OSError:
+            pass
+    return killed
+
+
+class PssMonitor:
+    """
+    Memoria dei browser (chromedriver + Chrome + renderer) per il riciclo.
+
+    La memoria è la PSS dell'albero di processi (vedi pss_mb), confrontabile
+    con la soglia anche con molti renderer. Ogni browser viene misurato al più
+    una volta ogni `check_interval` secondi: ai rilasci intermedi sample()
+    non legge /proc e restituisce None.
+
+    sample() aggiorna le statistiche:
+        selenium/memory/pss_peak_mb     picco per singolo browser
+        selenium/memory/pss_samples     misure effettuate
+        selenium/memory/pss_total_mb    somma delle misure (per la media)
+        selenium/memory/pss_avg_mb      media, calcolata da finalize()
+        selenium/memory/pss_recycled    browser riciclati per memoria
+    """
+
+    def __init__(self, max_pss_mb=0, stats=None, check_interval=30.0):
+        self.max_pss_mb = float(max_pss_mb or 0)
+        self.stats = stats
+        self.check_interval = float(check_interval or 0)
+        self._lock = threading.Lock()
+        self._last_check = {}   # pid di chromedriver -> istante dell'ultima misura
+        self.enabled = proc_available()
+
+    def _due(self, pid):
+        """True se il browser va misurato ora (prima misura o intervallo trascorso)"""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_check.get(pid)
+            if last is not None and now - last < self.check_interval:
+                return False
+            self._last_check[pid] = now
+            return True
+
+    def sample(self, driver):
+        """
+        Returns:
+            float | None: Memoria del browser in MB, None se non misurabile o non ancora dovuta
+        """
+        if not self.enabled:
+            return None
+        pid = driver_pid(driver)
+        if not pid or not self._due(pid):
+            return None
+        used = tree_pss_mb(pid)
+        if used is None or used <= 0:
+            return None
+        if self.stats is not None:
+            with self._lock:
+                self.stats.inc_value('selenium/memory/pss_samples')
+                self.stats.inc_value('selenium/memory/pss_total_mb', round(used, 1))
+                self.stats.max_value('selenium/memory/pss_peak_mb', round(used, 1))
+        return used
+
+    def over_limit(self, driver):
+        """Misura il browser se dovuto; motivo del riciclo se supera la soglia, altrimenti None"""
+        used = self.sample(driver)
+        if self.max_pss_mb and used is not None and used > self.max_pss_mb:
+            if self.stats is not None:
+                with self._lock:
+                    self.stats.inc_value('selenium/memory/pss_recycled')
+            return f"PSS {used:.0f} MB > {self.max_pss_mb:.0f} MB"
+        return None
+
+    def forget(self, driver):
+        """Browser chiuso: la sua ultima misura non serve più"""
+        with self._lock:
+            self._last_check.pop(driver_pid(driver), None)
+
+    def finalize(self):
+        if self.stats is None:
+            return
+        samples = self.stats.get_value('selenium/memory/pss_samples', 0)
+        if samples:
+            total = self.stats.get_value('selenium/memory/pss_total_mb', 0)
+            self.stats.set_value('selenium/memory/pss_avg_mb', round(total / samples, 1))
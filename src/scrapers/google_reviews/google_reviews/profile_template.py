@@ -0,0 +1,163 @@
+# src/scrapers/google_reviews/google_reviews/profile_template.py
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+
+class ProfileTemplate:
+    """
+    Profilo Chrome "caldo" da clonare per ogni driver del pool.
+
+    Il template viene preparato una volta sola aprendo Google Maps con un
+    profilo vuoto, accettando il consenso cookie e caricando una ricerca di
+    esempio: così contiene i cookie di consenso e la cache HTTP con il bundle
+    JS/CSS di Maps. Ogni driver riceve poi una copia privata del template
+    come --user-data-dir, quindi:
+        - la pagina consent.google.com non compare più
+        - gli asset statici di Maps arrivano dalla cache su disco
+
+    Note:
+        - La copia è privata per driver: Chrome non supporta profili o cache
+          condivisi in scrittura tra processi, e il template resta intatto
+        - Il template scade dopo `max_age_days` giorni e viene ricostruito
+        - La costruzione avviene in una cartella temporanea e viene pubblicata
+          con os.replace: processi concorrenti non vedono mai un template a metà
+    """
+
+    MARKER = "template.json"
+    # File di lock di Chrome che non vanno copiati in un nuovo profilo
+    LOCK_FILES = ("SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile", "LOCK")
+
+    def __init__(self, path, max_age_days=7, stats=None):
+        self.path = os.path.abspath(path)
+        self.max_age = float(max_age_days) * 86400
+        self.stats = stats
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._failed = False
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        path = settings.get('GOOGLE_PROFILE_TEMPLATE_DIR')
+        if not settings.getbool('GOOGLE_PROFILE_TEMPLATE_ENABLED', True) or not path:
+            return None
+        return cls(path, settings.getfloat('GOOGLE_PROFILE_TEMPLATE_MAX_AGE_DAYS', 7), stats)
+
+    # === STATO ===
+
+    def info(self):
+        """Contenuto del marker del template, None se il template non esiste"""
+        try:
+            with open(os.path.join(self.path, self.MARKER), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_ready(self):
+        info = self.info()
+        if not info or not info.get("consent_accepted"):
+            return False
+        return (time.time() - float(info.get("created_at", 0))) < self.max_age
+
+    # === COSTRUZIONE E CLONAZIONE ===
+
+    def ensure(self, build):
+        """
+        Prepara il template se manca o è scaduto.
+
+        Args:
+            build (callable): build(user_data_dir) -> bool, apre Chrome sul profilo
+                              indicato, accetta il consenso e scalda la cache;
+                              True se il consenso risulta accettato
+
+        Returns:
+            bool: True se il template è disponibile
+        """
+        with self._lock:
+            if self.is_ready():
+                return True
+            if self._failed:
+                # Un tentativo fallito per crawl basta: si prosegue con profili vuoti
+                return False
+
+            parent = os.path.dirname(self.path)
+            os.makedirs(parent, exist_ok=True)
+            build_dir = tempfile.mkdtemp(prefix=".profile_build_", dir=parent)
+            started = time.time()
+            print(f"[DEBUG] Preparazione profilo template in: {self.path}")
+            try:
+                consent_accepted = bool(build(build_dir))
+            except Exception as e:
+                print(f"[DEBUG] Errore preparazione profilo template: {e}")
+                consent_accepted = False
+
+            if not consent_accepted:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                self._failed = True
+                self._inc_stat("google/profile/template_failed")
+                return False
+
+            self._remove_lock_files(build_dir)
+            with open(os.path.join(build_dir, self.MARKER), "w", encoding="utf-8") as f:
+                json.dump({
+                    "created_at": time.time(),
+                    "build_seconds": round(time.time() - started, 2),
+                    "consent_accepted": True,
+                }, f, indent=2)
+
+            self._publish(build_dir)
+            self._inc_stat("google/profile/template_built")
+            print(f"[DEBUG] Profilo template pronto in {time.time() - started:.1f}s")
+            return self.is_ready()
+
+    def clone(self, destination):
+        """Copia il template in `destination` (una cartella profilo vuota)"""
+        shutil.copytree(
+            self.path,
+            destination,
+            ignore=shutil.ignore_patterns(self.MARKER, *self.LOCK_FILES),
+            dirs_exist_ok=True,
+        )
+        self._inc_stat("google/profile/clones")
+
+    def invalidate(self):
+        """Forza la ricostruzione al prossimo ensure()"""
+        with self._lock:
+            marker = os.path.join(self.path, self.MARKER)
+            if os.path.exists(marker):
+                os.remove(marker)
+
+    # === INTERNI ===
+
+    def _publish(self, build_dir):
+        old_dir = None
+        if os.path.exists(self.path):
+            old_dir = f"{self.path}.old.{os.getpid()}.{int(time.time())}"
+            try:
+                os.replace(self.path, old_dir)
+            except OSError:
+                old_dir = None
+        try:
+            os.replace(build_dir, self.path)
+        except OSError:
+            # Un altro processo ha pubblicato nel frattempo: si usa il suo
+            shutil.rmtree(build_dir, ignore_errors=True)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    def _remove_lock_files(self, root):
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for name in filenames:
+                if name in self.LOCK_FILES:
+                    try:
+                        os.remove(os.path.join(dirpath, name))
+                    except OSError:
+                        pass
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value(key)
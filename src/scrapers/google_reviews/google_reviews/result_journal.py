@@ -0,0 +1,196 @@
+# src/scrapers/google_reviews/google_reviews/result_journal.py
+import os
+import glob
+import json
+import time
+import tempfile
+
+
+class ResultJournal:
+    """
+    Journal append-only dei risultati dello spider Google, con snapshot compatti.
+
+    Ogni risultato è una riga JSON aggiunta in fondo a `<raw>.jsonl`: scrivere
+    un item costa quanto l'item stesso, non quanto tutti i risultati raccolti.
+    Il file JSON letto dagli step successivi (`<raw>.json`, una lista) viene
+    rigenerato dal journal solo ogni `snapshot_every` item e a fine crawl.
+
+    Durabilità:
+        - flush + fsync a lotti: ogni `fsync_every` item o `fsync_interval` secondi
+        - uno snapshot è scritto su file temporaneo e pubblicato con os.replace;
+          lo snapshot precedente diventa un backup `<raw>_backup_<timestamp>.json`
+          e ne restano solo gli ultimi `keep_backups`
+        - una riga troncata da un crash (ultima riga senza newline) viene ignorata
+
+    Note:
+        - In ripresa il journal prosegue; le attività rielaborate compaiono
+          due volte e nello snapshot vince l'ultima (chiave `__index`)
+        - Senza ripresa il journal precedente viene azzerato
+    """
+
+    def __init__(self, snapshot_path, fsync_every=20, fsync_interval=5.0, snapshot_every=500, keep_backups=3):
+        base, _ext = os.path.splitext(snapshot_path)
+        self.snapshot_path = snapshot_path
+        self.journal_path = f"{base}.jsonl"
+        self.backup_pattern = f"{base}_backup_*.json"
+        self.fsync_every = max(1, int(fsync_every))
+        self.fsync_interval = float(fsync_interval)
+        self.snapshot_every = int(snapshot_every or 0)
+        self.keep_backups = max(0, int(keep_backups))
+        self._file = None
+        self._pending = 0
+        self._since_snapshot = 0
+        self._last_sync = time.monotonic()
+        self.appended = 0
+
+    @classmethod
+    def from_settings(cls, settings, snapshot_path):
+        return cls(
+            snapshot_path,
+            fsync_every=settings.getint('GOOGLE_JOURNAL_FSYNC_EVERY', 20),
+            fsync_interval=settings.getfloat('GOOGLE_JOURNAL_FSYNC_INTERVAL', 5.0),
+            snapshot_every=settings.getint('GOOGLE_JOURNAL_SNAPSHOT_EVERY', 500),
+            keep_backups=settings.getint('GOOGLE_JOURNAL_KEEP_BACKUPS', 3),
+        )
+
+    # === SCRITTURA ===
+
+    def open(self, resume=False):
+        """Apre il journal: in coda se si riprende un crawl, vuoto altrimenti"""
+        if self._file is not None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        if resume:
+            self._repair_tail()
+        self._file = open(self.journal_path, "a" if resume else "w", encoding="utf-8")
+
+    def append(self, item):
+        """Aggiunge un risultato (fsync a lotti, snapshot periodico)"""
+        if self._file is None:
+            self.open(resume=True)
+        self._file.write(json.dumps(item, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+        self.appended += 1
+        self._pending += 1
+        self._since_snapshot += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+        if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def sync(self):
+        """Porta su disco le righe in sospeso"""
+        if self._file is None or not self._pending:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def snapshot(self):
+        """
+        Rigenera il JSON compatto dal journal.
+
+        Returns:
+            int: Risultati nello snapshot
+        """
+        self.sync()
+        results = self.load()
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".snapshot_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, separators=(",", ":"), default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)  # mkstemp crea il file con 0600
+            self._rotate_backup()
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._since_snapshot = 0
+        return len(results)
+
+    def close(self):
+        """Snapshot finale e chiusura del journal"""
+        if self._file is None:
+            return
+        try:
+            self.snapshot()
+        finally:
+            self._file.close()
+            self._file = None
+
+    # === LETTURA ===
+
+    def load(self):
+        """
+        Risultati del journal, uno per attività (vince l'ultimo per `__index`).
+
+        Returns:
+            list[dict]: Nell'ordine di prima comparsa
+        """
+        results, positions = [], {}
+        try:
+            f = open(self.journal_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return results
+        with f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Riga troncata da un crash
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                key = item.get("__index") if isinstance(item, dict) else None
+                if key is not None and key in positions:
+                    results[positions[key]] = item
+                    continue
+                if key is not None:
+                    positions[key] = len(results)
+                results.append(item)
+        return results
+
+    # === INTERNI ===
+
+    def _repair_tail(self):
+        """Tronca un'eventuale ultima riga incompleta prima di riprendere ad aggiungere"""
+        try:
+            with open(self.journal_path, "rb+") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                if not size:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b"\n":
+                    return
+                # Cerca l'ultimo newline a blocchi dalla fine
+                end, block = size, 65536
+                while end > 0:
+                    start = max(0, end - block)
+                    f.seek(start)
+                    chunk = f.read(end - start)
+                    pos = chunk.rfind(b"\n")
+                    if pos >= 0:
+                        f.truncate(start + pos + 1)
+                        return
+                    end = start
+                f.truncate(0)
+        except FileNotFoundError:
+            pass
+
+    def _rotate_backup(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        if self.keep_backups:
+            base, _ext = os.path.splitext(self.snapshot_path)
+            backup = f"{base}_backup_{time.strftime('%Y%m%d_%H%M%S')}_{time.time_ns() % 1000000:06d}.json"
+            os.replace(self.snapshot_path, backup)
+        backups = sorted(glob.glob(self.backup_pattern), key=os.path.getmtime)
+        for old in backups[:max(0, len(backups) - self.keep_backups)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
@@ -1,5 +1,4 @@
 import os
-from webdriver_manager.chrome import ChromeDriverManager
 
 # CORREZIONE: Determina la root del progetto in modo più robusto
 def get_project_root():
@@ -7,9 +6,14 @@ def get_project_root():
     Determina la root del progetto con la stessa logica dello spider
     per garantire coerenza tra settings e spider.
     """
+    # PROJECT_ROOT già nell'ambiente (es. workspace isolato di un benchmark): lo spider lo usa per primo
+    env_root = os.environ.get('PROJECT_ROOT')
+    if env_root and _is_valid_project_root(env_root):
+        return env_root
+
     current_file = os.path.abspath(__file__)
     current_dir = os.path.dirname(current_file)
-    
+
     # Cerca partendo dalla directory del file settings
     search_dir = current_dir
     max_levels = 10
@@ -91,9 +95,77 @@ DOWNLOADER_MIDDLEWARES = {
     'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None,
 }
 
+# Statistiche finali del crawl in JSON (lette dal report della pipeline). None = disattivato
+EXTENSIONS = {
+    'google_reviews.extensions.StatsDump': 500,
+}
+STATS_DUMP_FILE = None
+
 SELENIUM_DRIVER_NAME = 'chrome'
 SELENIUM_DRIVER_EXECUTABLE_PATH = None  # webdriver_manager se lo scarica da sé
 
+# Percorso e versione di ChromeDriver risolti, riusati finché la major di Chrome non cambia
+CHROMEDRIVER_CACHE_FILE = os.path.join(PROJECT_ROOT, 'temp', 'chromedriver_cache.json')
+
+# Pool di driver riutilizzati tra le richieste (vedi google_reviews/driver_pool.py)
+SELENIUM_DRIVER_POOL_SIZE = None  # None = CONCURRENT_REQUESTS
+SELENIUM_DRIVER_MAX_PAGES = 50  # Riavvia il driver dopo N pagine (0 = mai)
+SELENIUM_DRIVER_MAX_MEMORY_MB = 512  # Riavvia il driver se l'heap JS supera N MB (0 = mai)
+# Memoria dell'intero browser (chromedriver + Chrome + renderer, PSS letta da /proc su Linux:
+# le pagine condivise tra i renderer contano una volta sola): oltre la soglia il browser
+# viene riciclato (0 = solo misura, per il report)
+SELENIUM_DRIVER_MAX_PSS_MB = 1500
+SELENIUM_DRIVER_PSS_CHECK_INTERVAL = 30  # Secondi minimi tra due misure dello stesso browser
+SELENIUM_KILL_ORPHANS = True  # All'avvio termina i Chrome rimasti da crawl terminati in crash
+SELENIUM_DRIVER_POOL_WAIT = 30  # Secondi di attesa di un driver libero prima di crearne uno extra
+# Modalità schede: ogni Chrome serve fino a N attività in parallelo in schede separate
+# (1 = un Chrome per richiesta concorrente). Con CONCURRENT_REQUESTS = 8 e 4 schede
+# bastano 2 browser. Le schede bloccate oltre SELENIUM_TAB_SCRIPT_TIMEOUT secondi vengono riciclate
+SELENIUM_TABS_PER_BROWSER = 1
+SELENIUM_TAB_SCRIPT_TIMEOUT = 10
+
+# Profilo template con consenso cookie già accettato e cache di Maps calda,
+# copiato per ogni driver del pool (vedi google_reviews/profile_template.py)
+GOOGLE_PROFILE_TEMPLATE_ENABLED = True
+GOOGLE_PROFILE_TEMPLATE_DIR = os.path.join(PROJECT_ROOT, 'temp', 'chrome_profile_template')
+GOOGLE_PROFILE_TEMPLATE_MAX_AGE_DAYS = 7
+GOOGLE_PROFILE_WARM_URLS = [
+    'https://www.google.com/maps/search/ristorante+milano',
+]
+
+# Attese basate su eventi (DOM pronto, URL, selettori) al posto delle sleep fisse:
+# questi sono solo i limiti massimi, di norma si prosegue appena la pagina è pronta
+GOOGLE_WAIT_PAGE_TIMEOUT = 10
+GOOGLE_WAIT_CONSENT_TIMEOUT = 5
+GOOGLE_WAIT_POLL = 0.1
+
+# Workspace dei driver (profilo + TMP) ed eliminazione in background a fine vita del driver
+SELENIUM_WORKSPACE_DIR = None  # None = cartella temporanea di sistema
+SELENIUM_JANITOR_INTERVAL = 2.0  # Secondi tra un lotto di eliminazioni e il successivo
+
+# Ricerche ancorate alle coordinate di Pagine Gialle (@lat,lng,zoom): più atterraggi
+# diretti sulla scheda del posto. 0 = solo ricerca testuale
+GOOGLE_COORD_ZOOM = 17
+
+# Rating e recensioni letti dalla scheda della lista risultati quando bastano
+# (e l'indirizzo è verificabile), senza aprire la pagina del posto
+GOOGLE_CARD_FAST_PATH = True
+
+# Origine dei dati dei posti: "network" legge rating, recensioni, indirizzo e stato
+# dalle risposte JSON di Maps (log di performance CDP), "dom" solo dai selettori CSS.
+# In modalità network il DOM resta il fallback quando il payload non basta
+GOOGLE_CAPTURE_MODE = "network"
+GOOGLE_CAPTURE_MAX_BODY_MB = 8  # Risposte più grandi non vengono lette
+
+# Risposte lazy: il DOM (driver.page_source) viene serializzato solo se una
+# callback legge response.text. False = body sempre popolato come prima
+SELENIUM_LAZY_BODY = True
+# Le pagine Maps non usano meta refresh e il middleware leggerebbe il DOM di ogni risposta
+METAREFRESH_ENABLED = False
+
+# Thread dedicati al lavoro del browser (None = uno per driver del pool)
+SELENIUM_WORKERS = None
+
 SELENIUM_DRIVER_ARGUMENTS = [
    '--headless=new',  # Usa la nuova versione headless (più veloce)
     '--disable-gpu',
@@ -118,6 +190,12 @@ SELENIUM_DRIVER_ARGUMENTS = [
     '--disable-features=VizDisplayCompositor'
 ]
 
+# Richieste bloccate via CDP (Network.setBlockedURLs) alla creazione di ogni driver:
+# tile della mappa, foto, font, analytics. None = elenco in url_blocking.DEFAULT_BLOCKED_URLS,
+# [] = nessun blocco. Benchmark: src/benchmarks/google_blocking_benchmark.py
+SELENIUM_BLOCKED_URLS = None
+SELENIUM_BLOCK_STYLESHEETS = False  # True blocca anche i CSS (il percorso DOM usa la visibilità degli elementi)
+
 # Aumenta timeout per consentire caricamento pagine
 DOWNLOAD_TIMEOUT = 15
 
@@ -128,31 +206,40 @@ RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
 
 REACTOR_THREADPOOL_MAXSIZE = 20
 ASYNCIO_EVENT_LOOP = 'asyncio.SelectorEventLoop'
-# CORREZIONE: Feeds con path validation
-def get_feeds_config():
-    """
-    Configura i feeds con validazione del percorso
-    """
-    feeds_dir = os.path.join(PROJECT_ROOT, 'data', 'raw', 'raw_post_google_reviews')
-    
-    # Crea la directory base se non esiste
-    os.makedirs(feeds_dir, exist_ok=True)
-    
-    feed_path = os.path.join(feeds_dir, '%(region)s', '%(category)s', '%(region)s_%(category)s_raw.json')
-    
-    print(f"[SETTINGS] Feed path configurato: {feed_path}")
-    
-    return {
-        feed_path: {
-            'format': 'json',
-            'encoding': 'utf-8',
-            'overwrite': True,
-            'batch_item_export_timeout': 1.0,  # flush su disco ogni secondo
-        }
-    }
-
-# Configura FEEDS
-FEEDS = get_feeds_config()
+# Output dei risultati: lo spider scrive un journal append-only
+# (<region>_<category>_raw.jsonl, fsync a lotti) e ne ricava lo snapshot JSON
+# <region>_<category>_raw.json letto dagli step successivi. Niente FEEDS: il feed
+# exporter riscriveva gli stessi dati una terza volta
+RAW_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'raw', 'raw_post_google_reviews')
+os.makedirs(RAW_OUTPUT_DIR, exist_ok=True)
+GOOGLE_JOURNAL_FSYNC_EVERY = 20       # fsync ogni N risultati...
+GOOGLE_JOURNAL_FSYNC_INTERVAL = 5.0   # ...o ogni N secondi
+GOOGLE_JOURNAL_SNAPSHOT_EVERY = 500   # Snapshot JSON ogni N risultati (e sempre a fine crawl)
+GOOGLE_JOURNAL_KEEP_BACKUPS = 3       # Snapshot precedenti conservati come _backup_
+# Stato di ripresa (temp/google_reviews_state_<region>_<category>.json): insieme degli
+# indici completati, salvato come intervalli ogni N attività o N secondi
+GOOGLE_CHECKPOINT_FLUSH_EVERY = 50
+GOOGLE_CHECKPOINT_FLUSH_INTERVAL = 10.0
+
+# Cache persistente (SQLite) dei risultati, chiave (nome, città) normalizzati + coordinate:
+# le attività già arricchite, anche in un'altra categoria, non aprono un browser
+GOOGLE_CACHE_ENABLED = True
+GOOGLE_CACHE_PATH = os.path.join(PROJECT_ROOT, 'temp', 'google_enrichment_cache.sqlite')
+GOOGLE_CACHE_TTL_DAYS = 14
+GOOGLE_CACHE_MIN_CONFIDENCE = 0.6  # Score nome/città minimo per salvare un risultato
+GOOGLE_CACHE_USE_COORDS = True     # Coordinate (arrotondate a ~100 m) nella chiave quando presenti
+
+# Corsia di retry: timeout e risultati ambigui ("No matching result") non finiscono subito
+# in output con `error`, ma vengono riprovati dopo il passaggio principale con ricerche
+# alternative (indirizzo, solo testo) e attese moltiplicate. 0 tentativi = disattivata
+GOOGLE_RETRY_LANE_ATTEMPTS = 2
+GOOGLE_RETRY_LANE_WAIT_FACTOR = 3.0
+
+# Tempi per fase di ogni ricerca (driver, navigazione, consenso, attese, matching,
+# estrazione, salvataggio): p50/p95/p99 in google/timing/* e nel report della pipeline.
+# Le ricerche più lente di N secondi finiscono, con URL e fasi, nel log JSON Lines
+GOOGLE_SLOW_ITEM_SECONDS = 30
+GOOGLE_SLOW_ITEM_LOG = os.path.join(PROJECT_ROOT, 'logs', 'google_slow_items.jsonl')  # None = solo log dello spider
 
 # AGGIUNTA: Esporta PROJECT_ROOT come setting per gli spider
 PROJECT_ROOT_SETTING = PROJECT_ROOT
@@ -174,4 +261,4 @@ print(f"[SETTINGS] Configurazione completata:")
 print(f"  - PROJECT_ROOT: {PROJECT_ROOT}")
 print(f"  - CONFIG_DIR: {CONFIG_DIR}")
 print(f"  - LOG_FILE: {LOG_FILE}")
-print(f"  - Feeds directory: {os.path.dirname(list(FEEDS.keys())[0])}")
\ No newline at end of file
+print(f"  - Output directory: {RAW_OUTPUT_DIR}")
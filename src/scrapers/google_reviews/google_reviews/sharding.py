@@ -0,0 +1,83 @@
+# src/scrapers/google_reviews/google_reviews/sharding.py
+import os
+import json
+import tempfile
+
+from google_reviews.result_journal import ResultJournal
+
+
+def shard_bounds(total, shard_index, shard_count):
+    """
+    Intervallo [start, end) di indici delle attività in input assegnato a uno shard.
+
+    Gli shard sono intervalli contigui di dimensione quasi uguale: lo stato
+    di ripresa di ciascuno resta un solo intervallo di indici completati.
+
+    Returns:
+        tuple[int, int]: (start, end)
+    """
+    if shard_count <= 1:
+        return 0, total
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"shard_index {shard_index} fuori da [0, {shard_count})")
+    return total * shard_index // shard_count, total * (shard_index + 1) // shard_count
+
+
+def shard_suffix(shard_index, shard_count):
+    """Suffisso dei file di uno shard ('' senza sharding)"""
+    if shard_count <= 1:
+        return ""
+    return f"_shard{shard_index}of{shard_count}"
+
+
+def shard_path(path, shard_index, shard_count):
+    """Percorso di un file (output, stato) per uno shard: <base>_shard<i>of<K><ext>"""
+    base, ext = os.path.splitext(path)
+    return f"{base}{shard_suffix(shard_index, shard_count)}{ext}"
+
+
+def merge_shards(raw_path, shard_count):
+    """
+    Unisce i risultati degli shard nel file raw unico letto dagli step successivi.
+
+    Ogni shard viene letto dal suo journal (più aggiornato dello snapshot se lo
+    shard è terminato in crash). L'unione è deterministica: un risultato per
+    `__index` (vince l'ultimo scritto), ordinati per `__index`, indipendentemente
+    dall'ordine in cui gli shard hanno finito.
+
+    Returns:
+        dict: {"items": totale, "per_shard": [risultati per shard], "missing": [shard senza output]}
+    """
+    by_index, unindexed, per_shard, missing = {}, [], [], []
+    for shard_index in range(shard_count):
+        journal = ResultJournal(shard_path(raw_path, shard_index, shard_count))
+        items = journal.load()
+        if not items and os.path.exists(journal.snapshot_path):
+            with open(journal.snapshot_path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        if not items:
+            missing.append(shard_index)
+        per_shard.append(len(items))
+        for item in items:
+            key = item.get("__index") if isinstance(item, dict) else None
+            if key is None:
+                unindexed.append(item)
+            else:
+                by_index[key] = item
+
+    merged = [by_index[key] for key in sorted(by_index)] + unindexed
+    directory = os.path.dirname(os.path.abspath(raw_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".merge_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(merged, f, ensure_ascii=False, separators=(",", ":"), default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, raw_path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"items": len(merged), "per_shard": per_shard, "missing": missing}
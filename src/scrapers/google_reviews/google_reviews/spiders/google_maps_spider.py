@@ -1,20 +1,42 @@
 import os
-import json
 import signal
 import random
 import re
 import urllib.parse
-import time
 from difflib import SequenceMatcher
 import traceback
+import threading
 
 import scrapy
-from scrapy.exceptions import CloseSpider
+from scrapy import signals
+from scrapy.exceptions import CloseSpider, DontCloseSpider
 from scrapy_selenium import SeleniumRequest
 from scrapy.utils.project import get_project_settings
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet import threads
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+from google_reviews.waits import EventWaits
+from google_reviews.place_snapshot import place_snapshot, click_result, visible_address
+from google_reviews.result_journal import ResultJournal
+from google_reviews.checkpoint import Checkpoint
+from google_reviews.enrichment_cache import EnrichmentCache, lookup_key
+from google_reviews.sharding import shard_bounds, shard_path
+from google_reviews.input_reader import InputReader
+from google_reviews.phase_timings import PhaseTimer, PhaseTimings
+
+
+# Lo StatsCollector viene aggiornato anche dai thread worker del parsing
+_STATS_LOCK = threading.Lock()
+
+# Campi del risultato copiati dal capofila alle attività con la stessa ricerca
+RESULT_FIELDS = ("rating", "review_count", "google_url", "match_confidence", "error")
+
+# Errori che mandano l'attività nella corsia di retry invece che nell'output
+RETRYABLE_ERRORS = ("No matching result", "Pagina non caricata in tempo")
 
 
 def similar(a: str, b: str) -> float:
@@ -52,11 +74,40 @@ class GoogleMapsSpider(scrapy.Spider):
     MIN_CITY     = 0.3
     MIN_ADDR     = 0.45
 
-    def __init__(self, region=None, category=None, *args, **kwargs):
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.waits = EventWaits.from_settings(crawler.settings, crawler.stats)
+        spider.card_fast_path = crawler.settings.getbool('GOOGLE_CARD_FAST_PATH', True)
+        spider.coord_zoom = crawler.settings.getint('GOOGLE_COORD_ZOOM', 17)
+        # Unico output dei risultati: journal append-only + snapshot JSON in raw_path
+        spider.journal = ResultJournal.from_settings(crawler.settings, spider.raw_path)
+        # Stato di ripresa: indici completati, scritto a lotti dopo il sync del journal
+        spider.checkpoint = Checkpoint.from_settings(
+            crawler.settings, spider.state_file, before_flush=spider.journal.sync,
+            region=spider.region, category=spider.category,
+        )
+        # Cache persistente dei risultati (None se GOOGLE_CACHE_ENABLED = False)
+        spider.cache = EnrichmentCache.from_settings(crawler.settings, crawler.stats)
+        crawler.signals.connect(spider._record_landing_rates, signal=signals.spider_closed)
+        # Corsia di retry: attività lente o ambigue rielaborate dopo il passaggio principale
+        spider.retry_attempts = crawler.settings.getint('GOOGLE_RETRY_LANE_ATTEMPTS', 2)
+        spider.retry_wait_factor = crawler.settings.getfloat('GOOGLE_RETRY_LANE_WAIT_FACTOR', 3.0)
+        crawler.signals.connect(spider._drain_retry_lane, signal=signals.spider_idle)
+        # Tempi per fase di ogni ricerca: percentili nelle statistiche, ricerche lente nel log
+        spider.timings = PhaseTimings.from_settings(
+            crawler.settings, region=spider.region, category=spider.category,
+            shard=spider.shard_index if spider.shard_count > 1 else None,
+        )
+        return spider
+
+    def __init__(self, region=None, category=None, shard_index=0, shard_count=1, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.region   = region
         self.category = category
-        self.results  = []  # Lista per mantenere i risultati
+        # Shard: questo processo elabora solo la sua parte dell'input, con stato e output propri
+        self.shard_index = int(shard_index)
+        self.shard_count = max(1, int(shard_count))
 
         # handler SIGINT
         signal.signal(signal.SIGINT, self._on_sigint)
@@ -71,6 +122,10 @@ class GoogleMapsSpider(scrapy.Spider):
             region, category,
             f"{category}_categorized_{region}.json"
         )
+        # In alternativa all'output dello step 2 si accetta la versione JSON Lines
+        jsonl_file = os.path.splitext(self.data_file)[0] + ".jsonl"
+        if not os.path.exists(self.data_file) and os.path.exists(jsonl_file):
+            self.data_file = jsonl_file
 
         # raw-output dir
         raw_dir = os.path.join(
@@ -79,13 +134,16 @@ class GoogleMapsSpider(scrapy.Spider):
         )
         os.makedirs(raw_dir, exist_ok=True)
         raw_file = f"{region}_{category}_raw.json"
-        self.raw_path = os.path.join(raw_dir, raw_file)
+        self.raw_path = shard_path(os.path.join(raw_dir, raw_file), self.shard_index, self.shard_count)
 
         # stato e debug
         temp_dir = os.path.join(self.root_dir, "temp")
         os.makedirs(temp_dir, exist_ok=True)
-        self.state_file = os.path.join(
-            temp_dir, f"google_reviews_state_{region}_{category}.json"
+        # Indice degli offset delle attività nell'input (condiviso dagli shard)
+        self.input_index = os.path.join(temp_dir, f"google_reviews_input_{region}_{category}.idx")
+        self.state_file = shard_path(
+            os.path.join(temp_dir, f"google_reviews_state_{region}_{category}.json"),
+            self.shard_index, self.shard_count,
         )
 
         # Verifica struttura directories
@@ -100,7 +158,10 @@ class GoogleMapsSpider(scrapy.Spider):
         else:
             self.logger.info(f"Il file verrà creato durante l'esecuzione")
 
-        self.last_index = 0
+        # Ricerche in volo: chiave -> attività in attesa dello stesso risultato
+        self._coalesced = {}
+        # Richieste rimandate a fine passaggio principale (vedi _drain_retry_lane)
+        self._retry_lane = []
 
     def _get_project_root(self):
         """
@@ -332,100 +393,406 @@ class GoogleMapsSpider(scrapy.Spider):
     def _on_sigint(self, signum, frame):
         self.logger.info("SIGINT ricevuto: CloseSpider")
         self._manual_save_results()  # Salva i risultati prima di chiudere
+        self._save_state()
         raise CloseSpider("shutdown")
 
     def start_requests(self):
-        # resume
-        if os.path.exists(self.state_file):
-            try:
-                state = json.load(open(self.state_file))
-                self.last_index = state.get("last_index", 0)
-                self.logger.info(f"Ripresa dall'indice {self.last_index}")
-                self.logger.info(f"Info state: {state}")
-            except Exception as e:
-                self.logger.error(f"Errore caricamento state: {e}")
+        # crawler.stats viene creato dopo from_crawler: si collega ora ai componenti
+        self.waits.stats = self.crawler.stats
+        if self.cache is not None:
+            self.cache.stats = self.crawler.stats
+        self.timings.stats = self.crawler.stats
+
+        # resume: si saltano esattamente le attività già completate
+        try:
+            if self.checkpoint.load():
+                self.logger.info(
+                    f"Ripresa: {len(self.checkpoint.completed)} attività completate "
+                    f"(intervalli: {self.checkpoint.completed.to_list()[:10]})"
+                )
+        except Exception as e:
+            self.logger.error(f"Errore caricamento state: {e}")
+
+        # In ripresa il journal prosegue, altrimenti riparte vuoto
+        self.journal.open(resume=len(self.checkpoint.completed) > 0)
 
         if not os.path.exists(self.data_file):
             self.logger.error(f"Input mancante: {self.data_file}")
             self.logger.error("Verifica la struttura del progetto e che lo step precedente sia completato")
             return
 
+        # Lettura incrementale: in memoria restano l'indice degli offset e le attività in volo
+        reader = InputReader(self.data_file, self.input_index)
         try:
-            data = json.load(open(self.data_file, encoding="utf-8"))
-            self.aziende = [s for item in data for s in item.get("strutture", [item])]
-            
-            # Debug primi elementi
-            if self.aziende:
-                self.logger.info(f"Primi 3 elementi: {self.aziende[:3]}")
-            else:
+            total = reader.open()
+            if not total:
                 self.logger.error("Nessun dato trovato nel file di input!")
                 return
+            self.logger.info(f"Input indicizzato: {total} attività in {self.data_file}")
                 
-            self.logger.info(f"{len(self.aziende)} businesses, resuming at {self.last_index}")
+            start, end = shard_bounds(total, self.shard_index, self.shard_count)
+            if self.shard_count > 1:
+                self.logger.info(f"Shard {self.shard_index + 1}/{self.shard_count}: indici [{start}, {end})")
+            self.checkpoint.start_index, self.checkpoint.total_items = start, end - start
+            self.logger.info(f"{end - start} businesses, {len(self.checkpoint.completed)} già completate")
             
-            for idx, struct in enumerate(self.aziende[self.last_index:], start=self.last_index):
+            for idx in range(start, end):
+                if self.checkpoint.is_done(idx):
+                    continue
+                struct = reader.record(idx)
                 struct["__index"] = idx
                 nome, citta = struct.get("nome"), struct.get("città")
                 if not nome or not citta:
                     self.logger.warning(f"Elemento {idx} mancante di nome o città, skip")
+                    self.checkpoint.mark_done(idx)
+                    continue
+
+                # Attività già arricchita (altra categoria o run precedente): niente browser
+                cached = self._cached_item(struct, nome, citta)
+                if cached is not None:
+                    self.logger.info(f"Cache [{idx}]: {nome} → rating={cached['rating']}, reviews={cached['review_count']}")
+                    self.journal.append(cached)
+                    self.checkpoint.mark_done(idx)
+                    yield cached
                     continue
+
+                # Stessa ricerca già in volo: l'attività attende il risultato del capofila
+                query_key = self._query_key(struct, nome, citta)
+                if query_key in self._coalesced:
+                    self._coalesced[query_key].append(struct)
+                    self._inc_stat("google/coalesce/followers")
+                    self.logger.info(f"Coalescenza [{idx}]: {nome} attende la ricerca già in corso")
+                    continue
+                self._coalesced[query_key] = []
                     
-                q   = urllib.parse.quote_plus(f"{nome} {citta}")
-                url = f"https://www.google.com/maps/search/{q}"
+                url, query_mode = self._search_url(struct, nome, citta)
                 self.logger.info(f"Scheduling [{idx}]: {nome} — {url}")
                 
                 yield SeleniumRequest(
                     url=url,
                     callback=self.parse,
-                    meta={"struct": struct},
+                    # Browser in crash, timeout del pool: il middleware fallisce nel download
+                    errback=self.render_failed,
+                    meta={"struct": struct, "query_mode": query_mode, "query_key": query_key},
                     wait_time=1,  # Ridotto per velocità
                     dont_filter=True,
                 )
         except Exception as e:
             self.logger.error(f"Errore inizializzazione: {traceback.format_exc()}")
+        finally:
+            reader.close()
+
+    def _search_url(self, struct, nome, citta):
+        """
+        URL di ricerca Maps per un'attività.
+
+        Con le coordinate di Pagine Gialle la ricerca viene ancorata a un viewport
+        stretto (@lat,lng,zoom): Maps apre più spesso direttamente la scheda del posto.
+        Senza coordinate valide si usa la classica ricerca testuale.
+
+        Returns:
+            tuple: (url, "coords" | "text")
+        """
+        q = urllib.parse.quote_plus(f"{nome} {citta}")
+        coords = self._coordinates(struct) if getattr(self, "coord_zoom", 0) else None
+        if coords:
+            lat, lng = coords
+            return f"https://www.google.com/maps/search/{q}/@{lat:.6f},{lng:.6f},{self.coord_zoom}z", "coords"
+        return f"https://www.google.com/maps/search/{q}", "text"
+
+    def _cache_key(self, struct):
+        return self.cache.key(struct.get("nome"), struct.get("città"), self._coordinates(struct))
+
+    def _cached_item(self, struct, nome, citta):
+        """
+        Risultato dalla cache persistente.
+
+        Returns:
+            dict | None: struct completato con i dati in cache, None se assente o scaduto
+        """
+        if self.cache is None:
+            return None
+        hit = self.cache.get(self._cache_key(struct))
+        if hit is None:
+            return None
+        # Il record è già una copia letta dall'input: si completa senza copiarlo
+        struct["rating"] = hit["rating"]
+        struct["review_count"] = hit["review_count"]
+        struct["google_url"] = hit["google_url"]
+        struct["match_confidence"] = hit["match_confidence"]
+        return struct
+
+    @staticmethod
+    def _coordinates(struct):
+        """Coordinate (lat, lng) del record, None se mancanti o non valide"""
+        for lat_key, lng_key in (("latitude_pg", "longitude_pg"), ("latitudine", "longitudine"), ("lat", "lng")):
+            lat, lng = struct.get(lat_key), struct.get(lng_key)
+            if lat in (None, "", "N/A") or lng in (None, "", "N/A"):
+                continue
+            try:
+                lat, lng = float(str(lat).replace(",", ".")), float(str(lng).replace(",", "."))
+            except ValueError:
+                continue
+            if -90 <= lat <= 90 and -180 <= lng <= 180 and (lat, lng) != (0.0, 0.0):
+                return lat, lng
+        return None
+
+    def _record_landing_rates(self, spider):
+        """Percentuale di ricerche atterrate direttamente sulla scheda del posto"""
+        stats = self.crawler.stats
+        for mode in ("coords", "text", "retry"):
+            searches = stats.get_value(f"google/landing/{mode}/searches", 0)
+            if searches:
+                hits = stats.get_value(f"google/landing/{mode}/place_hits", 0)
+                stats.set_value(f"google/landing/{mode}/hit_rate", round(hits * 100.0 / searches, 2))
+                self.logger.info(f"Atterraggi diretti sulla scheda ({mode}): {hits}/{searches}")
 
-    def parse(self, response):
+    def _record_sessions_saved(self):
+        """Sessioni browser evitate: attività servite dalla cache o da una ricerca coalescente"""
+        stats = self.crawler.stats
+        coalesced = stats.get_value("google/coalesce/followers", 0)
+        cached = stats.get_value("google/cache/hits", 0)
+        stats.set_value("google/sessions_saved", coalesced + cached)
+        if coalesced or cached:
+            self.logger.info(f"Sessioni browser risparmiate: {coalesced} per coalescenza, {cached} dalla cache")
+
+    def _record_timings(self, response, error=None, persisted=True):
+        """Tempi per fase della ricerca negli istogrammi; le ricerche lente finiscono nel log"""
+        timer = response.meta.get("phase_timer")
+        if timer is None:
+            return
+        if persisted:
+            timer.lap("persistence")
+        struct = response.meta["struct"]
+        # Dall'errback arriva la richiesta: nessuna risposta, URL finale = URL di ricerca
+        request = getattr(response, "request", None)
+        search_url = request.url if request is not None else response.url
+        slow = self.timings.record(
+            timer, search_url,
+            index=struct["__index"],
+            nome=struct.get("nome"),
+            final_url=response.url,
+            query_mode=response.meta.get("query_mode"),
+            retry_attempt=response.meta.get("retry_attempt", 0),
+            error=str(error) if error is not None else None,
+        )
+        if slow:
+            worst = sorted(timer.phases.items(), key=lambda kv: kv[1], reverse=True)[:3]
+            self.logger.warning(
+                f"Ricerca lenta [{struct['__index']}] {struct.get('nome')}: {timer.total:.1f}s "
+                f"({', '.join(f'{phase}={seconds:.1f}s' for phase, seconds in worst)}) — {search_url}"
+            )
+
+    async def parse(self, response):
         struct = response.meta["struct"]
-        driver = response.meta["driver"]
         url    = response.url
         idx    = struct['__index']
 
         self.logger.info(f"Parsing [{idx}]: {url}")
-        self.logger.info(f"URL corrente driver: {driver.current_url}")
         
         try:
-            output_item = self._try_parse(response)
+            # Il parsing usa WebDriverWait (bloccante): gira nel threadpool del
+            # reactor, così più attività vengono elaborate in parallelo
+            output_item = await maybe_deferred_to_future(
+                threads.deferToThread(self._parse_in_thread, response)
+            )
             # Debug output
             self.logger.info(f"Risultato [{idx}]: rating={output_item.get('rating')}, reviews={output_item.get('review_count')}")
-            output_item["google_url"] = driver.current_url
+            if response.meta.get("retry_attempt"):
+                self._inc_stat("google/retry_lane/recovered")
+            self.logger.info(f"Tempo risparmiato dalle attese [{idx}]: {response.meta.get('wait_saved', 0.0):.2f}s")
             
-            # Aggiungi il risultato alla lista per il backup
-            self.results.append(output_item)
-            
-            # Salva manualmente i risultati ogni 5 elementi (più frequente)
-            if idx % 5 == 0:
-                self._manual_save_results()
+            # Una riga nel journal (fsync a lotti, snapshot periodico)
+            self.journal.append(output_item)
+            if self.cache is not None:
+                self.cache.put(self._cache_key(struct), output_item)
                 
-            # Salva stato e aggiorna indice
-            self._save_state(idx + 1)  # Importante: incrementa indice  
+            # Attività completata: lo stato viene scritto a lotti
+            self.checkpoint.mark_done(idx)
+            self._record_timings(response)
             yield output_item
+            for item in self._fan_out(response.meta.get("query_key"), output_item):
+                yield item
         except CloseSpider:
             raise
         except Exception as e:
+            # Lento o ambiguo: riprovato dopo il passaggio principale, senza occupare ora un worker
+            retry = self._retry_request(response, e)
+            if retry is not None:
+                self._record_timings(response, e, persisted=False)
+                self._retry_lane.append(retry)
+                self._inc_stat("google/retry_lane/queued")
+                self.logger.info(f"Retry [{idx}] {struct.get('nome')}: {e} → corsia di retry ({retry.meta['retry_strategy']})")
+                return
             self.logger.error(f"ERROR [{idx}] {struct.get('nome')}: {e}")
             self.logger.error(traceback.format_exc())
-            output_item = dict(struct)
-            output_item["rating"] = None
-            output_item["review_count"] = None
-            output_item["error"] = str(e)
-
-            # Aggiungi anche risultati con errore
-            self.results.append(output_item)
-            
-            self._save_state(idx + 1)
+            output_item = self._error_item(response.meta, e)
+            self._record_timings(response, e)
             yield output_item
+            for item in self._fan_out(response.meta.get("query_key"), output_item):
+                yield item
+
+    def render_failed(self, failure):
+        """
+        Errback delle ricerche (capofila e corsia di retry): il render nel middleware
+        è fallito (driver in crash, WebDriverException, timeout del pool) e parse
+        non viene chiamato.
+
+        Yields:
+            dict: L'item di errore, come quello emesso da parse, e gli item delle
+                  attività coalescenti in attesa della stessa ricerca
+        """
+        request = failure.request
+        struct = request.meta["struct"]
+        idx = struct["__index"]
+        error = failure.value
+        timer = request.meta.get("phase_timer")
+        if timer is not None:
+            # Il tempo fino al fallimento va alla fase in corso
+            timer.lap("navigation" if "driver_acquire" in timer.phases else "driver_acquire")
+        self._inc_stat("google/render_failed")
+
+        # Timeout del caricamento: come in parse, l'attività passa alla corsia di retry
+        retry = self._retry_request(request, error)
+        if retry is not None:
+            self._record_timings(request, error, persisted=False)
+            self._retry_lane.append(retry)
+            self._inc_stat("google/retry_lane/queued")
+            self.logger.info(f"Retry [{idx}] {struct.get('nome')}: render fallito ({error!r}) → corsia di retry ({retry.meta['retry_strategy']})")
+            return
+
+        self.logger.error(f"ERROR [{idx}] {struct.get('nome')}: render fallito: {error!r}")
+        output_item = self._error_item(request.meta, error)
+        self._record_timings(request, error)
+        yield output_item
+        for item in self._fan_out(request.meta.get("query_key"), output_item):
+            yield item
+
+    def _error_item(self, meta, error):
+        """
+        Item di errore di un'attività, registrato nel journal e nello stato di ripresa.
+
+        Returns:
+            dict: struct con rating e recensioni a None ed `error`
+        """
+        struct = meta["struct"]
+        if meta.get("retry_attempt"):
+            self._inc_stat("google/retry_lane/failed")
+            struct["retry_attempts"] = meta["retry_attempt"]
+        output_item = struct
+        output_item["rating"] = None
+        output_item["review_count"] = None
+        output_item["error"] = str(error)
+
+        # Aggiungi anche risultati con errore
+        self.journal.append(output_item)
+
+        self.checkpoint.mark_done(struct["__index"])
+        return output_item
+
+    def _retry_strategies(self, struct, nome, citta):
+        """
+        Ricerche alternative per la corsia di retry, nell'ordine in cui provarle.
+
+        Returns:
+            list[tuple]: (nome strategia, query testuale); mai uguale alla ricerca originale
+        """
+        strategies = []
+        indirizzo = (struct.get("indirizzo") or "").strip()
+        if indirizzo and indirizzo != "N/A":
+            strategies.append(("address", f"{nome} {indirizzo} {citta}"))
+        if self._coordinates(struct) and getattr(self, "coord_zoom", 0):
+            # La ricerca originale era ancorata alle coordinate: si prova quella testuale
+            strategies.append(("text", f"{nome} {citta}"))
+        return strategies
+
+    def _retry_request(self, response, error):
+        """
+        Richiesta della corsia di retry per un'attività fallita, None se non va riprovata.
+
+        `response` è la risposta del tentativo fallito, o la sua richiesta se il
+        render è fallito nel middleware (errback).
+
+        Solo per timeout e risultati ambigui (RETRYABLE_ERRORS), al più
+        GOOGLE_RETRY_LANE_ATTEMPTS volte, una strategia di ricerca diversa per
+        tentativo e attese moltiplicate per GOOGLE_RETRY_LANE_WAIT_FACTOR.
+        """
+        if not isinstance(error, TimeoutException) and not any(m in str(error) for m in RETRYABLE_ERRORS):
+            return None
+        struct = response.meta["struct"]
+        attempt = response.meta.get("retry_attempt", 0)
+        strategies = self._retry_strategies(struct, struct.get("nome", ""), struct.get("città", ""))
+        if attempt >= min(self.retry_attempts, len(strategies)):
+            return None
+        strategy, query = strategies[attempt]
+        struct.pop("match_confidence", None)
+        factor = self.retry_wait_factor
+        return SeleniumRequest(
+            url=f"https://www.google.com/maps/search/{urllib.parse.quote_plus(query)}",
+            callback=self.parse,
+            errback=self.render_failed,
+            meta={
+                "struct": struct,
+                "query_mode": "retry",
+                "query_key": response.meta.get("query_key"),
+                "retry_attempt": attempt + 1,
+                "retry_strategy": strategy,
+                "wait_factor": factor,
+                "page_timeout": self.waits.page_timeout * factor,
+            },
+            wait_time=1,
+            priority=-10,
+            dont_filter=True,
+        )
+
+    def _drain_retry_lane(self, spider):
+        """spider_idle: passaggio principale esaurito, si accodano le richieste rimandate"""
+        if not self._retry_lane:
+            return
+        requests, self._retry_lane = self._retry_lane, []
+        self.logger.info(f"Corsia di retry: {len(requests)} attività")
+        for request in requests:
+            self._inc_stat("google/retry_lane/scheduled")
+            self.crawler.engine.crawl(request)
+        raise DontCloseSpider
+
+    def _query_key(self, struct, nome, citta):
+        """Chiave di coalescenza: uguale per attività che produrrebbero la stessa ricerca"""
+        coords = self._coordinates(struct) if getattr(self, "coord_zoom", 0) else None
+        return lookup_key(nome, citta, coords) or (nome, citta, "")
+
+    def _fan_out(self, query_key, output_item):
+        """
+        Risultato del capofila esteso alle attività in attesa della stessa ricerca.
+
+        Yields:
+            dict: Un item per ogni attività coalescente (journal e stato aggiornati)
+        """
+        followers = self._coalesced.pop(query_key, None) or []
+        for struct in followers:
+            for field in RESULT_FIELDS:
+                if field in output_item:
+                    struct[field] = output_item[field]
+            struct["coalesced_with"] = output_item.get("__index")
+            self.journal.append(struct)
+            self.checkpoint.mark_done(struct["__index"])
+            yield struct
+
+    def _parse_in_thread(self, response):
+        """Parte bloccante del parsing (eseguita in un thread worker)"""
+        driver = response.meta["driver"]
+        timer = response.meta.setdefault("phase_timer", PhaseTimer())
+        timer.lap("handoff")
+        self.logger.info(f"URL corrente driver: {driver.current_url}")
+        try:
+            output_item = self._try_parse(response)
+            # Il percorso veloce dalla scheda imposta già l'URL del posto
+            output_item["google_url"] = output_item.get("google_url") or driver.current_url
+            return output_item
         finally:
-            # Chiudi sempre il driver a fine elaborazione
+            # Ultimo tratto del parsing (rating e recensioni), prima del rilascio del driver
+            timer.lap("extraction")
+            # Restituisci sempre il driver a fine elaborazione
             close_driver = response.meta.get('close_driver_callback')
             if close_driver:
                 close_driver(response)
@@ -443,26 +810,28 @@ class GoogleMapsSpider(scrapy.Spider):
         nome   = struct.get("nome", "")
         citta  = struct.get("città", "")
         exp_adr= struct.get("indirizzo", "").lower().strip()
-        wait   = WebDriverWait(driver, 4)  # Ottimizzato per velocità
+        factor = response.meta.get("wait_factor", 1)  # Attese più lunghe nella corsia di retry
+        wait   = WebDriverWait(driver, 4 * factor)  # Ottimizzato per velocità
+        timer  = response.meta["phase_timer"]
 
         # Verifica consenso cookie (ottimizzato)
         if "consent.google.com" in driver.current_url:
             self.logger.info("Rilevata pagina consenso cookie")
-            if self._accept_cookies_fast(driver):
+            saved = self._accept_cookies_fast(driver)
+            if saved is not None:
                 driver.refresh()
-                time.sleep(1)  # Ridotto per velocità
+                saved += self.waits.page_loaded(driver, replaced=1, name='consent_refresh')
+                response.meta['wait_saved'] = response.meta.get('wait_saved', 0.0) + saved
+            timer.lap("consent")
         try:
         # Timeout più aggressivo
-            WebDriverWait(driver, 3).until(lambda d: 
+            WebDriverWait(driver, 3 * factor).until(lambda d: 
             "maps/place" in d.current_url or 
             d.find_elements(By.CSS_SELECTOR, "a.hfpxzc"))
         except Exception as e:
         # Se timeout, prova comunque a procedere
             self.logger.warning(f"Timeout attesa, procedo comunque: {e}")
             
-        self.logger.info(f"Page title: {driver.title}")
-        self.logger.info(f"Current URL: {driver.current_url}")
-
         # Attendi posto o risultati con gestione timeout ottimizzata
         try:
             wait.until(lambda d: "maps/place" in d.current_url or 
@@ -471,83 +840,227 @@ class GoogleMapsSpider(scrapy.Spider):
         except Exception as e:
             self.logger.error(f"Timeout attesa elementi: {e}")
             raise Exception(f"Pagina non caricata in tempo: {e}")
+        finally:
+            timer.lap("result_list_wait")
+
+        # Un solo round trip: rating, recensioni, indirizzo, chiusura e risultati
+        snap = place_snapshot(driver)
+        query_mode = response.meta.get("query_mode", "text")
+        self._inc_stat(f"google/landing/{query_mode}/searches")
+        if snap.get("is_place"):
+            self._inc_stat(f"google/landing/{query_mode}/place_hits")
+        self.logger.info(f"Page title: {snap.get('title')}")
+        self.logger.info(f"Current URL: {snap.get('url')}")
+        timer.lap("extraction")
+
+        # Modalità network: i dati arrivano dal JSON di Maps, il DOM resta il fallback
+        fast = self._parse_from_network(response, struct, exp_adr)
+        if fast is not None:
+            return fast
 
         # Se lista risultati, scegli best match
-        if "maps/place" not in driver.current_url:
+        if not snap.get("is_place"):
             self.logger.info("Pagina di risultati - cercando il miglior match")
-            els = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a.hfpxzc")))
-            self.logger.info(f"Trovati {len(els)} risultati possibili")
+            results = snap.get("results") or []
+            self.logger.info(f"Trovati {len(results)} risultati possibili")
             
             best, best_score = None, (0,0,0)
-            for i, el in enumerate(els):
-                lbl = el.get_attribute("aria-label") or ""
-                self.logger.info(f"Risultato {i}: {lbl}")
+            for result in results:
+                lbl = result.get("label") or ""
+                self.logger.info(f"Risultato {result['index']}: {lbl}")
                 score = check_location_similarity(nome, citta, lbl)
                 self.logger.info(f"Score: {score}")
                 if score[0] > best_score[0]:
-                    best_score, best = score, el
+                    best_score, best = score, result
+            timer.lap("matching")
                     
             if not best or best_score[0] < self.MIN_COMBINED:
                 self.logger.error(f"Nessun risultato con score sufficiente. Miglior score: {best_score}")
                 raise Exception("No matching result")
                 
             self.logger.info(f"Miglior match trovato con score {best_score}")
-            driver.execute_script("arguments[0].click()", best)
+            struct["match_confidence"] = round(best_score[0], 3)
+            if getattr(self, "card_fast_path", False):
+                # Rating e recensioni sono già nella scheda: niente navigazione se bastano
+                fast = self._parse_from_card(struct, best, exp_adr)
+                if fast is not None:
+                    self.logger.info(f"[{idx}] Risultato dalla scheda → rating={fast['rating']}, reviews={fast['review_count']}")
+                    return fast
+            if not click_result(driver, best["index"]):
+                raise Exception("Risultato non più presente nella pagina")
             wait.until(lambda d: "maps/place" in d.current_url)
-            self.logger.info(f"Nuova URL: {driver.current_url}")
+            timer.lap("place_page_wait")
+            # Il click carica l'anteprima del posto (preview/place): nuovo tentativo via rete
+            fast = self._parse_from_network(response, struct, exp_adr)
+            if fast is not None:
+                return fast
+            snap = place_snapshot(driver)
+            self.logger.info(f"Nuova URL: {snap.get('url')}")
+            timer.lap("extraction")
+
+        # Atterraggio diretto sulla scheda: confidenza dal nome del posto nel titolo
+        if "match_confidence" not in struct:
+            place_name = (snap.get("title") or "").rsplit(" - Google Maps", 1)[0]
+            struct["match_confidence"] = round(check_location_similarity(nome, citta, place_name)[0], 3)
 
         # Verifica chiusura
-        if "chiuso definitivamente" in driver.page_source.lower():
+        if snap.get("closed"):
             self.logger.info("Locale chiuso definitivamente")
             struct["rating"] = None
             struct["review_count"] = None
             return struct
 
-        # Verifica indirizzo (con timeout ridotto)
-        try:
-            adr_el = WebDriverWait(driver, 2).until(EC.visibility_of_element_located(
-                (By.CSS_SELECTOR, "button[data-item-id='address']")))
-            found = adr_el.text.lower().strip()
+        # Verifica indirizzo (con timeout ridotto): se il pannello non è ancora
+        # pronto si interroga solo l'indirizzo, non l'intero snapshot
+        if not snap.get("address"):
+            address = {}
+
+            def address_visible(d):
+                address["text"] = visible_address(d)
+                return bool(address["text"])
+
+            self.waits.wait('place_address', driver, address_visible, 2 * factor)
+            if address.get("text"):
+                snap["address"] = address["text"]
+            else:
+                # Continua anche se l'indirizzo non è verificabile
+                self.logger.warning("Indirizzo non visibile entro il timeout")
+            timer.lap("place_page_wait")
+
+        found = (snap.get("address") or "").lower().strip()
+        if found:
             self.logger.info(f"Indirizzo trovato: {found}")
-            
-            if exp_adr and found:
+            if exp_adr:
                 addr_sim = similar(normalize_address(exp_adr), normalize_address(found))
                 self.logger.info(f"Similarità indirizzo: {addr_sim}")
                 if addr_sim < self.MIN_ADDR:
                     self.logger.warning(f"Indirizzo non corrisponde: atteso '{exp_adr}', trovato '{found}'")
-                    raise Exception("Address mismatch")
-        except Exception as e:
-            self.logger.warning(f"Errore verifica indirizzo: {e}")
-            # Continua anche se l'indirizzo non è verificabile
-
-        # rating & reviews con selettori ottimizzati (meno tentativi)
-        rating = review_count = None
-        for r_sel, rv_sel in [
-            ("div.F7nice span[aria-hidden='true']", "div.F7nice span[aria-label*='recensioni']"),
-            ("span.fontDisplayLarge", "button[aria-label*='recensioni']"),
-            ("span.ceHGZc", "button.HHrUdb"),
-            ("div.fontBodyMedium.dmRWX span.ceHGZc", "div.fontBodyMedium.dmRWX span[aria-label]"),
-        ]:
-            try:
-                self.logger.debug(f"Tentativo selettore: {r_sel}")
-                r = driver.find_element(By.CSS_SELECTOR, r_sel).text.strip()
-                rv = driver.find_element(By.CSS_SELECTOR, rv_sel).text
-                rv = "".join(filter(str.isdigit, rv))
-                if r or rv:
-                    rating, review_count = r or None, rv or None
-                    self.logger.info(f"Rating trovato: {rating}, reviews: {review_count}")
-                    break
-            except Exception as e:
-                self.logger.debug(f"Selettore fallito ({r_sel}): {e}")
-                continue
+
+        # rating & reviews dallo stesso snapshot
+        rating, review_count = snap.get("rating"), snap.get("review_count")
+        if snap.get("rating_selector"):
+            self.logger.info(f"Rating trovato: {rating}, reviews: {review_count}")
 
         struct["rating"] = rating
         struct["review_count"] = review_count
         self.logger.info(f"[{idx}] Risultato → rating={rating}, reviews={review_count}")
         return struct
     
+    def _parse_from_card(self, struct, result, exp_adr):
+        """
+        Percorso veloce: rating e recensioni dalla scheda della lista risultati.
+
+        Returns:
+            dict | None: struct completato, None se serve aprire la pagina del posto
+                         (dati della scheda mancanti o indirizzo non verificabile)
+        """
+        card = result.get("card") or {}
+        if card.get("closed"):
+            self._inc_stat("google/card_fast_path/hit")
+            self.logger.info("Locale chiuso definitivamente (dalla scheda)")
+            struct["rating"] = None
+            struct["review_count"] = None
+            struct["google_url"] = result.get("href")
+            return struct
+
+        if not card.get("rating") or not card.get("review_count"):
+            self._inc_stat("google/card_fast_path/miss_no_data")
+            return None
+
+        if exp_adr:
+            # La scheda mostra l'indirizzo tra i segmenti separati da "·"
+            segments = [
+                seg.strip()
+                for line in (card.get("text") or "").split("\n")
+                for seg in line.split("·")
+                if seg.strip()
+            ]
+            expected = normalize_address(exp_adr)
+            addr_sim = max((similar(expected, normalize_address(seg)) for seg in segments), default=0)
+            if addr_sim < self.MIN_ADDR:
+                self.logger.info(f"Indirizzo non verificabile dalla scheda (similarità {addr_sim:.2f}), apro la pagina")
+                self._inc_stat("google/card_fast_path/miss_address")
+                return None
+
+        self._inc_stat("google/card_fast_path/hit")
+        struct["rating"] = card["rating"]
+        struct["review_count"] = card["review_count"]
+        struct["google_url"] = result.get("href")
+        return struct
+
+    def _parse_from_network(self, response, struct, exp_adr):
+        """
+        Rating, recensioni, indirizzo e stato dalle risposte di rete di Maps.
+
+        Usa i posti catturati dal middleware (GOOGLE_CAPTURE_MODE = "network")
+        e sceglie quello col nome più simile; l'indirizzo, se noto, deve
+        corrispondere come nel percorso DOM.
+
+        Returns:
+            dict | None: struct completato, None se serve il percorso DOM
+        """
+        capture = response.meta.get("network_capture")
+        if capture is None:
+            return None
+        timer = response.meta["phase_timer"]
+        places = capture.collect(response.meta["driver"])
+        timer.lap("extraction")
+        if not places:
+            self._inc_stat("google/network_capture/miss_no_payload")
+            return None
+
+        nome, citta = struct.get("nome", ""), struct.get("città", "")
+        best, best_score = None, (0, 0, 0)
+        for place in places:
+            score = check_location_similarity(nome, citta, place["name"])
+            if score[0] > best_score[0]:
+                best_score, best = score, place
+        timer.lap("matching")
+        if not best or best_score[0] < self.MIN_COMBINED:
+            self.logger.info(f"Nessun posto corrispondente nei payload di rete ({len(places)} posti)")
+            self._inc_stat("google/network_capture/miss_no_match")
+            return None
+        confidence = round(best_score[0], 3)
+
+        if exp_adr:
+            found = best.get("address") or ""
+            addr_sim = similar(normalize_address(exp_adr), normalize_address(found)) if found else 0
+            if addr_sim < self.MIN_ADDR:
+                self.logger.info(f"Indirizzo non verificabile dal payload (similarità {addr_sim:.2f}), uso il DOM")
+                self._inc_stat("google/network_capture/miss_address")
+                return None
+
+        if best["closed"]:
+            self._inc_stat("google/network_capture/hit")
+            self.logger.info("Locale chiuso definitivamente (dal payload di rete)")
+            struct["rating"] = None
+            struct["review_count"] = None
+            struct["match_confidence"] = confidence
+            return struct
+
+        if not best.get("rating") or not best.get("review_count"):
+            self._inc_stat("google/network_capture/miss_no_data")
+            return None
+
+        self._inc_stat("google/network_capture/hit")
+        struct["rating"] = best["rating"]
+        struct["review_count"] = best["review_count"]
+        struct["match_confidence"] = confidence
+        self.logger.info(f"[{struct['__index']}] Risultato dalla rete → rating={best['rating']}, reviews={best['review_count']}")
+        return struct
+
+    def _inc_stat(self, key, count=1):
+        """Incrementa una statistica (thread-safe: il parsing gira nei thread worker)"""
+        with _STATS_LOCK:
+            self.crawler.stats.inc_value(key, count)
+
     def _accept_cookies_fast(self, driver):
-        """Versione velocizzata accettazione cookie"""
+        """
+        Versione velocizzata accettazione cookie
+
+        Returns:
+            float | None: Secondi risparmiati dall'attesa, None se nessun pulsante cliccato
+        """
         try:
             # Prova solo i selettori più comuni, timeout più breve
             for xpath in [
@@ -559,56 +1072,47 @@ class GoogleMapsSpider(scrapy.Spider):
                         EC.element_to_be_clickable((By.XPATH, xpath))
                     )
                     driver.execute_script("arguments[0].click()", btn)
-                    time.sleep(0.5)  # ERA 2, ora 0.5
-                    return True
+                    return self.waits.consent_closed(driver, replaced=0.5)
                 except:
                     continue
         except:
             pass
-        return False
+        return None
     
-    def _save_state(self, idx):
+    def _save_state(self):
+        """Scrive subito lo stato di ripresa (di norma avviene a lotti in mark_done)"""
+        checkpoint = getattr(self, "checkpoint", None)
+        if checkpoint is None:
+            return
         try:
-            state = {
-                "last_index": idx,
-                "region": self.region,
-                "category": self.category,
-                "timestamp": time.time(),
-                "items_processed": idx,
-                "total_items": len(self.aziende) if hasattr(self, 'aziende') else 0,
-                "progress_percentage": round((idx / len(self.aziende) * 100), 2) if hasattr(self, 'aziende') and len(self.aziende) > 0 else 0
-            }
-            with open(self.state_file, "w", encoding="utf-8") as f:
-                json.dump(state, f, indent=2)
-            self.logger.info(f"State saved at index {idx}")
+            state = checkpoint.flush()
+            self.logger.info(
+                f"State saved: {state['items_processed']}/{state['total_items']} completate, "
+                f"{len(state['completed'])} intervalli"
+            )
         except Exception as e:
             self.logger.error(f"Errore salvataggio state: {e}")
 
-    def _manual_save_results(self):
-        """Salva manualmente i risultati come backup"""
-        if not self.results:
+    def _manual_save_results(self, final=False):
+        """
+        Rigenera lo snapshot JSON dei risultati dal journal.
+
+        Args:
+            final (bool): True a fine crawl: chiude anche il journal
+        """
+        journal = getattr(self, "journal", None)
+        if journal is None or not journal.appended:
             self.logger.info("Nessun risultato da salvare")
+            if journal is not None and final:
+                journal.close()
             return
-            
+
         try:
-            # Assicurati che la directory esista
-            os.makedirs(os.path.dirname(self.raw_path), exist_ok=True)
-            
-            # Salva nel percorso principale
-            with open(self.raw_path, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"Salvataggio manuale completato: {self.raw_path}")
-            
-            # Crea un backup per sicurezza
-            backup_file = os.path.join(
-                os.path.dirname(self.raw_path), 
-                f"{self.region}_{self.category}_backup_{int(time.time())}.json"
-            )
-            
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"Backup salvato in: {backup_file}")
-            
+            if final:
+                journal.close()
+            else:
+                journal.snapshot()
+            self.logger.info(f"Snapshot dei risultati salvato in: {self.raw_path} (journal: {journal.journal_path})")
         except Exception as e:
             self.logger.error(f"Errore salvataggio manuale: {e}")
             self.logger.error(f"Traceback: {traceback.format_exc()}")
@@ -628,7 +1132,7 @@ class GoogleMapsSpider(scrapy.Spider):
                     )
                     self.logger.info(f"Pulsante cookie trovato: {xpath}")
                     driver.execute_script("arguments[0].click()", btn)
-                    time.sleep(2)  # Breve pausa dopo il click
+                    self.waits.consent_closed(driver, replaced=2)
                     return True
                 except Exception as e:
                     self.logger.debug(f"Pulsante non trovato ({xpath}): {e}")
@@ -639,12 +1143,18 @@ class GoogleMapsSpider(scrapy.Spider):
 
     def close(self, reason):
         """Override del metodo close per salvare i risultati"""
-        self._manual_save_results()
-        self._save_state(self.last_index)
+        self._manual_save_results(final=True)
+        self._save_state()
+        if getattr(self, "cache", None) is not None:
+            self.cache.close()
+        if getattr(self, "timings", None) is not None:
+            self.timings.close()
+        self._record_sessions_saved()
         self.logger.info("Spider closed: " + reason)
-        super().close(reason)
+        # Spider.close è statico: close(spider, reason)
+        super().close(self, reason)
 
     def spider_closed(self, spider):
-        self._save_state(self.last_index)
+        self._save_state()
         self._manual_save_results()
         self.logger.info("Spider closed cleanly")
\ No newline at end of file
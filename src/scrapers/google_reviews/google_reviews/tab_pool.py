@@ -0,0 +1,500 @@
+# src/scrapers/google_reviews/google_reviews/tab_pool.py
+import json
+import math
+import time
+import threading
+
+from selenium.webdriver.remote.webelement import WebElement
+
+from google_reviews.waits import wait_until
+
+
+class BrowserHost:
+    """
+    Un Chrome condiviso da più schede.
+
+    Una sessione WebDriver esegue un comando alla volta e sempre sulla
+    finestra corrente: ogni comando di una scheda prende il lock del browser,
+    porta la sessione sulla propria scheda e poi esegue. I comandi durano
+    millisecondi; il caricamento delle pagine non blocca il lock perché il
+    driver è avviato con pageLoadStrategy "none".
+    """
+
+    def __init__(self, driver, user_data_dir, script_timeout=10):
+        self.driver = driver
+        self.user_data_dir = user_data_dir
+        self.lock = threading.RLock()
+        self.current = driver.current_window_handle
+        # Schede aperte ma non assegnate (all'avvio: la finestra iniziale)
+        self.spare = [self.current]
+        self.open_tabs = 1
+        self.pages = 0
+        self.draining = False
+        self.broken = False
+        self._log_buffers = {}
+        try:
+            # Una scheda bloccata non deve tenere fermo il browser oltre questo limite
+            driver.set_script_timeout(script_timeout)
+        except Exception:
+            pass
+
+    def command(self, handle, fn):
+        """Esegue fn(driver) sulla scheda `handle`"""
+        with self.lock:
+            if self.current != handle:
+                self.driver.switch_to.window(handle)
+                self.current = handle
+            return fn(self.driver)
+
+    def open_tab(self):
+        """Nuova scheda (o quella di riserva): restituisce il suo handle"""
+        with self.lock:
+            if self.spare:
+                return self.spare.pop()
+            self.driver.switch_to.new_window("tab")
+            self.current = self.driver.current_window_handle
+            self.open_tabs += 1
+            return self.current
+
+    def close_tab(self, handle):
+        """
+        Chiude una scheda. L'ultima scheda non si chiude (chiuderebbe il
+        browser): torna vuota come riserva.
+        """
+        with self.lock:
+            self._log_buffers.pop(_target_id(handle), None)
+            if self.open_tabs <= 1:
+                self.command(handle, lambda d: d.get("about:blank"))
+                self.spare.append(handle)
+                return
+            try:
+                self.command(handle, lambda d: d.close())
+            finally:
+                self.current = None
+                self.open_tabs -= 1
+
+    def performance_log(self, handle):
+        """
+        Eventi del log di performance di una sola scheda.
+
+        ChromeDriver raccoglie in un unico buffer gli eventi di tutte le
+        schede: si legge tutto una volta e si smista per target ("webview").
+        """
+        with self.lock:
+            for entry in self.driver.get_log("performance"):
+                try:
+                    webview = json.loads(entry["message"]).get("webview")
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._log_buffers.setdefault(webview, []).append(entry)
+            return self._log_buffers.pop(_target_id(handle), [])
+
+
+def _target_id(handle):
+    # Le versioni più vecchie di ChromeDriver prefissano l'handle con "CDwindow-"
+    return (handle or "").replace("CDwindow-", "")
+
+
+class TabDriver:
+    """
+    Driver legato a una scheda di un BrowserHost.
+
+    Espone la stessa interfaccia del WebDriver (metodi e proprietà come
+    current_url), eseguendo ogni comando sulla propria scheda. Gli elementi
+    restituiti vengono legati alla scheda: anche i loro comandi (click,
+    is_displayed, ...) passano di qui.
+    """
+
+    STALE_MARKER = "window.__grStale = true;"
+    STALE_CHECK = "return !window.__grStale;"
+
+    def __init__(self, host, handle, nav_timeout=10):
+        self._host = host
+        self._handle = handle
+        self._nav_timeout = nav_timeout
+
+    @property
+    def window_handle(self):
+        return self._handle
+
+    def get(self, url):
+        """Naviga e attende che il nuovo documento sostituisca il precedente"""
+        self._navigate(lambda d: d.get(url))
+
+    def refresh(self):
+        self._navigate(lambda d: d.refresh())
+
+    def get_log(self, log_type):
+        if log_type == "performance":
+            return self._host.performance_log(self._handle)
+        return self._command(lambda d: d.get_log(log_type))
+
+    def quit(self):
+        # La scheda si restituisce al pool, il browser lo chiude il pool
+        pass
+
+    def _navigate(self, go):
+        try:
+            self._command(lambda d: d.execute_script(self.STALE_MARKER))
+        except Exception:
+            pass
+        self._command(go)
+        # Con pageLoadStrategy "none" get() ritorna subito: senza questa attesa
+        # readyState potrebbe essere ancora quello della pagina precedente
+        wait_until(self, lambda d: d.execute_script(self.STALE_CHECK), self._nav_timeout, poll=0.05)
+
+    def _command(self, fn):
+        return self._host.command(self._handle, fn)
+
+    def _adopt(self, value):
+        if isinstance(value, WebElement):
+            value._parent = self
+        elif isinstance(value, list):
+            for item in value:
+                self._adopt(item)
+        return value
+
+    def __getattr__(self, name):
+        attribute = getattr(type(self._host.driver), name, None)
+        if isinstance(attribute, property):
+            return self._adopt(self._command(lambda d: getattr(d, name)))
+        value = getattr(self._host.driver, name)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            return self._adopt(self._command(lambda d: getattr(d, name)(*args, **kwargs)))
+        return call
+
+
+class PooledTab:
+    """Una scheda del pool: stessa forma di PooledDriver per il middleware"""
+
+    def __init__(self, host, handle, overflow=False, nav_timeout=10):
+        self.host = host
+        self.handle = handle
+        self.driver = TabDriver(host, handle, nav_timeout)
+        self.user_data_dir = host.user_data_dir
+        self.overflow = overflow
+        self.pages = 0
+        self.created_at = time.time()
+        self.broken = False
+
+
+class TabPool:
+    """
+    Pool di schede distribuite su pochi Chrome: stessa interfaccia di DriverPool.
+
+    Con `size` richieste concorrenti e `tabs_per_browser` schede per Chrome
+    servono ceil(size / tabs_per_browser) browser invece di `size`: la
+    memoria del processo browser e del GPU/network service è condivisa.
+
+    Riciclo:
+        - una scheda rotta, bloccata (non risponde entro lo script timeout),
+          arrivata a `max_pages` pagine o con heap JS oltre `max_memory_mb`
+          viene chiusa e sostituita da una nuova scheda nello stesso browser
+        - un browser che ha servito `max_pages * tabs_per_browser` pagine, che
+          supera la soglia PSS del `pss_monitor` o in cui una scheda non si
+          chiude, non riceve più schede e viene chiuso quando l'ultima sua
+          scheda torna al pool
+
+    Note:
+        - Se tutte le schede sono in uso, acquire() attende fino a `timeout`
+          secondi e poi apre una scheda extra nel browser meno carico
+        - Tutti i metodi sono thread-safe
+    """
+
+    MEMORY_SCRIPT = (
+        "return (window.performance && performance.memory) "
+        "? performance.memory.usedJSHeapSize : 0;"
+    )
+
+    def __init__(self, create_driver, destroy_driver, size=1, tabs_per_browser=4, max_pages=0,
+                 max_memory_mb=0, script_timeout=10, nav_timeout=10, prepare_tab=None, pss_monitor=None, stats=None):
+        """
+        Args:
+            create_driver (callable): Restituisce (driver, user_data_dir) di un nuovo Chrome
+            destroy_driver (callable): Chiude (driver, user_data_dir) e pulisce il profilo
+            size (int): Schede concorrenti (richieste in parallelo)
+            tabs_per_browser (int): Schede massime per Chrome
+            max_pages (int): Pagine dopo cui una scheda viene riciclata (0 = nessun limite)
+            max_memory_mb (int): Heap JS oltre cui una scheda viene riciclata (0 = nessun limite)
+            script_timeout (float): Secondi oltre cui un comando su una scheda la rende "bloccata"
+            nav_timeout (float): Attesa massima del cambio documento dopo get()/refresh()
+            prepare_tab (callable): prepare_tab(tab_driver), chiamato su ogni scheda nuova
+            pss_monitor (PssMonitor): Memoria (PSS) dell'intero browser (opzionale)
+            stats: StatsCollector di Scrapy (opzionale)
+        """
+        self.create_driver = create_driver
+        self.destroy_driver = destroy_driver
+        self.size = max(1, int(size))
+        self.tabs_per_browser = max(1, int(tabs_per_browser))
+        self.max_browsers = math.ceil(self.size / self.tabs_per_browser)
+        self.max_pages = int(max_pages or 0)
+        self.max_memory_mb = int(max_memory_mb or 0)
+        self.script_timeout = script_timeout
+        self.nav_timeout = nav_timeout
+        self.prepare_tab = prepare_tab
+        self.pss_monitor = pss_monitor
+        self.stats = stats
+
+        self._hosts = []
+        self._idle = []
+        self._leased = set()
+        self._reserved = {}  # host -> schede in apertura
+        self._creating = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._closed = False
+        self._stats_lock = threading.Lock()
+
+    # === PRESTITO ===
+
+    def acquire(self, timeout=0):
+        """
+        Presta una scheda pronta all'uso.
+
+        Returns:
+            PooledTab: La scheda in prestito (da restituire con release)
+        """
+        deadline = time.monotonic() + max(0.0, float(timeout or 0))
+        while True:
+            host, lease, new_browser, overflow = None, None, False, False
+            with self._available:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("TabPool già chiuso")
+                    lease = self._idle_tab()
+                    if lease is not None:
+                        self._idle.remove(lease)
+                        break
+                    host = self._host_with_capacity()
+                    if host is not None:
+                        break
+                    if len(self._hosts) + self._creating < self.max_browsers:
+                        new_browser = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        host = self._least_loaded_host()
+                        if host is None:
+                            new_browser = True
+                        overflow = True
+                        break
+                    self._available.wait(remaining)
+
+                if lease is not None:
+                    self._leased.add(lease)
+                elif new_browser:
+                    self._creating += 1
+                else:
+                    self._reserved[host] = self._reserved.get(host, 0) + 1
+
+            if lease is not None:
+                if self._is_healthy(lease):
+                    self._inc_stat("selenium/tabs/reused")
+                    return lease
+                print("[DEBUG] Scheda del pool bloccata, la sostituisco")
+                self._inc_stat("selenium/tabs/stuck")
+                self._recycle(lease)
+                continue
+
+            if new_browser:
+                host = self._new_host()
+                with self._available:
+                    self._reserved[host] = self._reserved.get(host, 0) + 1
+            return self._open_lease(host, overflow)
+
+    def release(self, lease, broken=False):
+        """
+        Restituisce una scheda al pool dopo il parsing.
+
+        Args:
+            lease (PooledTab): Scheda ottenuta da acquire()
+            broken (bool): True se la richiesta ha lasciato la scheda in stato non affidabile
+        """
+        with self._lock:
+            if lease not in self._leased:
+                return  # Già restituita
+        lease.pages += 1
+        lease.host.pages += 1
+        lease.broken = lease.broken or broken
+        if self.max_pages and lease.host.pages >= self.max_pages * self.tabs_per_browser:
+            lease.host.draining = True
+        if self.pss_monitor is not None and not lease.host.draining:
+            # La memoria si misura sull'intero browser, condiviso dalle schede
+            reason = self.pss_monitor.over_limit(lease.host.driver)
+            if reason:
+                print(f"[DEBUG] Browser da ritirare: {reason}")
+                lease.host.draining = True
+
+        reason = self._recycle_reason(lease)
+        if reason is None:
+            with self._lock:
+                if not self._closed:
+                    self._leased.discard(lease)
+                    self._idle.append(lease)
+                    self._available.notify()
+                    return
+            reason = "pool chiuso"
+
+        print(f"[DEBUG] Riciclo scheda dopo {lease.pages} pagine ({reason})")
+        if not lease.overflow:
+            self._inc_stat("selenium/tabs/recycled")
+        self._recycle(lease)
+
+    def shutdown(self):
+        """Chiude tutti i browser"""
+        with self._lock:
+            self._closed = True
+            hosts = list(self._hosts)
+            self._hosts, self._idle, self._leased = [], [], set()
+            self._available.notify_all()
+        for host in hosts:
+            self._destroy(host)
+        print(f"[DEBUG] TabPool chiuso ({len(hosts)} browser)")
+
+    # === INTERNI ===
+
+    def _tabs_in_use(self, host):
+        """Schede del browser prestate, libere o in apertura"""
+        leased = sum(1 for lease in self._leased if lease.host is host)
+        idle = sum(1 for lease in self._idle if lease.host is host)
+        return leased + idle + self._reserved.get(host, 0)
+
+    def _idle_tab(self):
+        # Le schede libere di un browser in uscita non vengono più prestate
+        for lease in reversed(self._idle):
+            if not lease.host.draining and not lease.host.broken:
+                return lease
+        return None
+
+    def _host_with_capacity(self):
+        for host in self._hosts:
+            if not host.draining and not host.broken and self._tabs_in_use(host) < self.tabs_per_browser:
+                return host
+        return None
+
+    def _least_loaded_host(self):
+        hosts = [h for h in self._hosts if not h.draining and not h.broken]
+        return min(hosts, key=self._tabs_in_use) if hosts else None
+
+    def _new_host(self):
+        try:
+            driver, user_data_dir = self.create_driver()
+        except Exception:
+            with self._available:
+                self._creating -= 1
+                self._available.notify()
+            raise
+        host = BrowserHost(driver, user_data_dir, self.script_timeout)
+        with self._available:
+            self._creating -= 1
+            self._hosts.append(host)
+        self._inc_stat("selenium/tabs/browsers_created")
+        print(f"[DEBUG] Nuovo browser per le schede ({len(self._hosts)}/{self.max_browsers})")
+        return host
+
+    def _open_lease(self, host, overflow):
+        try:
+            handle = host.open_tab()
+            lease = PooledTab(host, handle, overflow=overflow, nav_timeout=self.nav_timeout)
+            if self.prepare_tab is not None:
+                self.prepare_tab(lease.driver)
+        except Exception:
+            with self._available:
+                self._release_reservation(host)
+                host.broken = True
+                self._available.notify()
+            self._destroy_if_empty(host)
+            raise
+        with self._available:
+            self._release_reservation(host)
+            self._leased.add(lease)
+        self._inc_stat("selenium/tabs/opened")
+        if overflow:
+            print(f"[DEBUG] Tutte le {self.size} schede in uso, aperta una scheda extra")
+            self._inc_stat("selenium/tabs/overflow")
+        return lease
+
+    def _release_reservation(self, host):
+        self._reserved[host] = self._reserved.get(host, 1) - 1
+        if self._reserved[host] <= 0:
+            self._reserved.pop(host, None)
+
+    def _recycle_reason(self, lease):
+        if lease.broken:
+            return "scheda rotta"
+        if lease.overflow:
+            return "scheda extra"
+        if lease.host.broken or lease.host.draining:
+            return "browser da riciclare"
+        if self.max_pages and lease.pages >= self.max_pages:
+            return f"limite di {self.max_pages} pagine"
+        if self.max_memory_mb:
+            used_mb = self._js_heap_mb(lease)
+            if used_mb is None:
+                return "memoria non leggibile"
+            if used_mb > self.max_memory_mb:
+                return f"heap JS {used_mb:.0f} MB > {self.max_memory_mb} MB"
+        return None
+
+    def _recycle(self, lease):
+        """Chiude la scheda; un browser che non la chiude viene ritirato"""
+        host = lease.host
+        if not host.broken:
+            try:
+                host.close_tab(lease.handle)
+            except Exception as e:
+                print(f"[DEBUG] Scheda non chiudibile, ritiro il browser: {e}")
+                host.broken = True
+        with self._available:
+            self._leased.discard(lease)
+            if lease in self._idle:
+                self._idle.remove(lease)
+            self._available.notify()
+        self._destroy_if_empty(host)
+
+    def _destroy_if_empty(self, host):
+        with self._available:
+            if not (host.broken or host.draining) or host not in self._hosts:
+                return
+            if self._tabs_in_use(host) > 0:
+                # Le schede libere del browser in uscita non vanno più prestate
+                idle = [lease for lease in self._idle if lease.host is host]
+                if len(idle) < self._tabs_in_use(host):
+                    return
+                for lease in idle:
+                    self._idle.remove(lease)
+            self._hosts.remove(host)
+            self._available.notify_all()
+        self._inc_stat("selenium/tabs/browsers_recycled")
+        self._destroy(host)
+
+    def _js_heap_mb(self, lease):
+        try:
+            used = lease.driver.execute_script(self.MEMORY_SCRIPT) or 0
+            return float(used) / (1024 * 1024)
+        except Exception:
+            return None
+
+    def _is_healthy(self, lease):
+        """La scheda risponde entro lo script timeout"""
+        if lease.host.broken:
+            return False
+        try:
+            lease.driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    def _destroy(self, host):
+        try:
+            self.destroy_driver(host.driver, host.user_data_dir)
+        except Exception as e:
+            print(f"[DEBUG] Errore chiusura browser del pool: {e}")
+
+    def _inc_stat(self, key):
+        if self.stats is not None:
+            with self._stats_lock:
+                self.stats.inc_value(key)
@@ -0,0 +1,69 @@
+# src/scrapers/google_reviews/google_reviews/url_blocking.py
+
+# Risorse di Maps che non servono al parsing (pattern di Network.setBlockedURLs,
+# "*" è il carattere jolly). Il bundle JS e le XHR dei dati restano permessi.
+DEFAULT_BLOCKED_URLS = [
+    # Tile della mappa, Street View e foto dei posti
+    "*/maps/vt*",
+    "*/kh/v=*",
+    "*streetviewpixels-pa.googleapis.com*",
+    "*.googleusercontent.com/*",
+    "*.ggpht.com/*",
+    # Immagini e font (le immagini sono già disattivate dalle prefs, qui non partono nemmeno)
+    # (il "*" finale copre anche la query string)
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.svg*", "*.ico*",
+    "*.woff*", "*.ttf*", "*.otf*",
+    "*fonts.gstatic.com*",
+    "*fonts.googleapis.com*",
+    # Analytics, telemetria e pubblicità
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*/gtag/js*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*/gen_204*",
+    "*play.google.com/log*",
+    "*/csi?*",
+]
+
+# Fogli di stile di Maps: bloccarli riduce ancora byte e layout, ma cambia
+# la visibilità degli elementi (offsetParent) su cui si basa il percorso DOM
+STYLESHEET_PATTERNS = [
+    "*.css*",
+    "*/maps/_/ss/*",
+    "*/_/ss/k=*",
+]
+
+
+def blocked_url_patterns(settings):
+    """
+    Lista dei pattern da bloccare letta dai settings.
+
+    SELENIUM_BLOCKED_URLS = None usa DEFAULT_BLOCKED_URLS, [] disattiva il blocco;
+    SELENIUM_BLOCK_STYLESHEETS aggiunge STYLESHEET_PATTERNS.
+    """
+    if settings.get('SELENIUM_BLOCKED_URLS') is None:
+        patterns = list(DEFAULT_BLOCKED_URLS)
+    else:
+        patterns = settings.getlist('SELENIUM_BLOCKED_URLS')
+    if settings.getbool('SELENIUM_BLOCK_STYLESHEETS', False):
+        patterns.extend(STYLESHEET_PATTERNS)
+    return patterns
+
+
+def apply_url_blocking(driver, patterns):
+    """
+    Blocca via CDP le richieste che corrispondono ai pattern, per tutta la vita del driver.
+
+    Returns:
+        bool: True se il blocco è attivo
+    """
+    if not patterns:
+        return False
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        return True
+    except Exception as e:
+        print(f"[DEBUG] Blocco URL via CDP non applicato: {e}")
+        return False
@@ -0,0 +1,121 @@
+# src/scrapers/google_reviews/google_reviews/waits.py
+import time
+import threading
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+
+# Le attese girano nei thread worker di middleware e spider: un solo lock
+# protegge i contatori condivisi nello StatsCollector
+_STATS_LOCK = threading.Lock()
+
+
+# === CONDIZIONI ===
+
+def document_ready(driver):
+    """Il documento ha finito di caricarsi"""
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def consent_dismissed(driver):
+    """Non siamo (più) sulla pagina di consenso cookie di Google"""
+    return "consent.google.com" not in driver.current_url
+
+
+def maps_content_ready(driver):
+    """
+    La pagina Maps ha qualcosa da elaborare: una scheda attività, la lista
+    dei risultati oppure la pagina di consenso (gestita dal chiamante).
+    """
+    url = driver.current_url
+    if "maps/place" in url or "consent.google.com" in url:
+        return True
+    return bool(driver.find_elements(By.CSS_SELECTOR, "a.hfpxzc"))
+
+
+def page_ready(driver):
+    """DOM caricato e contenuto Maps presente"""
+    return document_ready(driver) and maps_content_ready(driver)
+
+
+def url_changed(old_url):
+    """Condizione: l'URL corrente è diverso da `old_url`"""
+    return lambda driver: driver.current_url != old_url
+
+
+def wait_until(driver, condition, timeout, poll=0.1):
+    """
+    Attende che `condition(driver)` sia vera, al massimo `timeout` secondi.
+
+    Returns:
+        tuple: (condizione soddisfatta, secondi effettivamente attesi)
+    """
+    started = time.monotonic()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=poll,
+                      ignored_exceptions=(WebDriverException,)).until(condition)
+        return True, time.monotonic() - started
+    except TimeoutException:
+        return False, time.monotonic() - started
+
+
+class EventWaits:
+    """
+    Attese basate su eventi al posto dei time.sleep fissi del percorso Google.
+
+    Ogni attesa ha un nome e, se sostituisce una sleep fissa, la durata di
+    quella sleep (`replaced`): la differenza con il tempo effettivamente
+    atteso finisce nelle statistiche come tempo risparmiato.
+
+    Statistiche:
+        google/waits/<nome>/count      attese eseguite
+        google/waits/<nome>/time       secondi attesi in totale
+        google/waits/<nome>/timeout    attese arrivate al limite massimo
+        google/waits/saved_time        secondi risparmiati rispetto alle sleep fisse
+    """
+
+    def __init__(self, page_timeout=10, consent_timeout=5, poll=0.1, stats=None):
+        self.page_timeout = float(page_timeout)
+        self.consent_timeout = float(consent_timeout)
+        self.poll = float(poll)
+        self.stats = stats
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        return cls(
+            page_timeout=settings.getfloat('GOOGLE_WAIT_PAGE_TIMEOUT', 10),
+            consent_timeout=settings.getfloat('GOOGLE_WAIT_CONSENT_TIMEOUT', 5),
+            poll=settings.getfloat('GOOGLE_WAIT_POLL', 0.1),
+            stats=stats,
+        )
+
+    def wait(self, name, driver, condition, timeout, replaced=0.0):
+        """
+        Attende una condizione e registra il tempo.
+
+        Returns:
+            float: Secondi risparmiati rispetto alla sleep sostituita
+        """
+        ok, elapsed = wait_until(driver, condition, timeout, self.poll)
+        saved = max(0.0, float(replaced) - elapsed) if replaced else 0.0
+        if self.stats is not None:
+            with _STATS_LOCK:
+                self.stats.inc_value(f'google/waits/{name}/count')
+                self.stats.inc_value(f'google/waits/{name}/time', elapsed)
+                if not ok:
+                    self.stats.inc_value(f'google/waits/{name}/timeout')
+                if saved:
+                    self.stats.inc_value('google/waits/saved_time', saved)
+        return saved
+
+    # === ATTESE DEL PERCORSO GOOGLE ===
+
+    def page_loaded(self, driver, replaced=0.0, name='page_load', timeout=None):
+        """Dopo driver.get/refresh: DOM pronto e contenuto Maps presente (timeout: limite diverso da page_timeout)"""
+        return self.wait(name, driver, page_ready, self.page_timeout if timeout is None else timeout, replaced)
+
+    def consent_closed(self, driver, replaced=0.0):
+        """Dopo il click su 'Accetta tutto': la pagina di consenso se ne va"""
+        return self.wait('consent', driver, consent_dismissed, self.consent_timeout, replaced)
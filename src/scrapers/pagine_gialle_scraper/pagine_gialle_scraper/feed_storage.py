@@ -0,0 +1,21 @@
+# src/scrapers/pagine_gialle_scraper/feed_storage.py
+from pathlib import Path
+
+from scrapy.extensions.feedexport import FileFeedStorage
+
+
+class UnbufferedFileFeedStorage(FileFeedStorage):
+    """
+    Storage dei feed su file locale senza buffer in scrittura.
+
+    Ogni record esportato viene scritto subito sul file (una write per item con
+    JSON Lines): quando il segnale item_scraped arriva allo spider, il record è
+    già su disco. Il ledger di ripresa può quindi avanzare dopo l'export anche
+    se il PipelineExecutor termina il crawl con kill allo scadere del timeout.
+    """
+
+    def open(self, spider):
+        dirname = Path(self.path).parent
+        if dirname and not dirname.exists():
+            dirname.mkdir(parents=True)
+        return open(self.path, self.write_mode, buffering=0)
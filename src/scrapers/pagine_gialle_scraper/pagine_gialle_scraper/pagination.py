@@ -0,0 +1,122 @@
+# src/scrapers/pagine_gialle_scraper/pagination.py
+
+
+class PageWindow:
+    """
+    Tiene traccia delle pagine di un paese quando più pagine sono in volo insieme.
+
+    Con window_size = 1 riproduce la paginazione sequenziale classica: una pagina
+    alla volta, stop dopo `max_empty` pagine vuote consecutive. Con window_size > 1
+    (modalità HTTP/2) mantiene fino a N richieste aperte sulla stessa connessione.
+
+    Lo stato esportato verso il ledger è sempre la "watermark" contigua: l'ultima
+    pagina tale che tutte le precedenti sono state scaricate e i cui record sono
+    già stati esportati nel feed. Così una ripresa non salta mai pagine arrivate
+    fuori ordine né pagine i cui record non sono arrivati su disco.
+    """
+
+    def __init__(self, first_page=1, window_size=1, empty_pages=0, max_empty=2):
+        self.first_page = int(first_page)
+        self.window_size = max(1, int(window_size))
+        self.initial_empty = int(empty_pages)
+        self.max_empty = int(max_empty)
+        self.fetched = {}       # pagina -> True se conteneva risultati
+        self.next_page = self.first_page
+        self.in_flight = set()
+        self.pending = {}       # pagina -> record emessi ma non ancora esportati
+        self.failed = set()     # pagine fallite o malformate in questo run
+
+    def initial_pages(self):
+        """Pagine da richiedere all'avvio"""
+        return self._fill()
+
+    def on_page(self, page, has_results):
+        """
+        Registra l'esito di una pagina.
+
+        Returns:
+            list: Nuove pagine da richiedere per mantenere piena la finestra
+        """
+        self.in_flight.discard(page)
+        self.fetched[page] = bool(has_results)
+        return self._fill()
+
+    def expect_items(self, page, count):
+        """Registra quanti record della pagina devono essere esportati prima della watermark"""
+        if count:
+            self.pending[page] = self.pending.get(page, 0) + int(count)
+
+    def on_item_persisted(self, page):
+        """
+        Registra l'export di un record della pagina.
+
+        Returns:
+            bool: True se con questo record tutti quelli della pagina sono esportati
+        """
+        if page not in self.pending:
+            return False
+        self.pending[page] -= 1
+        if self.pending[page] > 0:
+            return False
+        del self.pending[page]
+        return True
+
+    def on_failure(self, page):
+        """
+        Una pagina fallita libera il suo posto ma blocca la watermark.
+
+        Per decidere quando smettere di richiedere pagine conta come una pagina
+        vuota: oltre la fine dei risultati le pagine malformate non tengono
+        aperta la finestra all'infinito.
+
+        Returns:
+            list: Nuove pagine da richiedere per mantenere piena la finestra
+        """
+        self.in_flight.discard(page)
+        self.pending.pop(page, None)
+        self.failed.add(page)
+        return self._fill()
+
+    def watermark(self):
+        """
+        Returns:
+            tuple: (ultima pagina contigua scaricata ed esportata, pagine vuote
+                   consecutive in coda) con pagina = first_page - 1 se nulla è
+                   stato ancora scaricato
+        """
+        page = self.first_page - 1
+        streak = self.initial_empty
+        while (page + 1) in self.fetched and (page + 1) not in self.pending:
+            page += 1
+            streak = 0 if self.fetched[page] else streak + 1
+        return page, streak
+
+    def finished(self):
+        """True quando la fine dei risultati è confermata senza buchi prima"""
+        return self.watermark()[1] >= self.max_empty
+
+    def end_seen(self):
+        """True se tra le pagine scaricate (o fallite) c'è già una sequenza di fine risultati"""
+        if self.finished():
+            return True
+        streak = 0
+        last_page = max(list(self.fetched) + list(self.failed), default=self.first_page - 1)
+        for page in range(self.first_page, last_page + 1):
+            if self.fetched.get(page) is False or page in self.failed:
+                streak += 1
+                if streak >= self.max_empty:
+                    return True
+            else:
+                streak = 0
+        return False
+
+    def _fill(self):
+        pages = []
+        if self.end_seen():
+            return pages
+        while len(self.in_flight) < self.window_size:
+            page = self.next_page
+            self.next_page += 1
+            self.in_flight.add(page)
+            pages.append(page)
+        return pages
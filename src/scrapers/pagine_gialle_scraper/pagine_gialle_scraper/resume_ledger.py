@@ -0,0 +1,183 @@
+# src/scrapers/pagine_gialle_scraper/resume_ledger.py
+import os
+import json
+import time
+import tempfile
+from contextlib import contextmanager
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+try:  # Windows
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+LEDGER_FILENAME = "pagine_gialle_resume_ledger.json"
+
+
+def default_ledger_path(project_root):
+    """
+    Percorso standard del ledger di ripresa, condiviso da spider ed executor.
+
+    Args:
+        project_root (str): Root del progetto (la cartella che contiene 'src' e 'data')
+
+    Returns:
+        str: Percorso assoluto del file ledger
+    """
+    return os.path.join(project_root, "temp", LEDGER_FILENAME)
+
+
+def _normalize(value):
+    """Normalizza una componente della chiave (case e spazi non contano)"""
+    return " ".join(str(value or "").strip().lower().split())
+
+
+class ResumeLedger:
+    """
+    Ledger di ripresa per lo scraping di Pagine Gialle.
+
+    Registra per ogni terna (region, category, town) l'ultima pagina scaricata
+    e se il paese è stato completato. È l'unica fonte di verità usata sia da
+    `PagineGialleSpider` (per ripartire dalla prima pagina non ancora scaricata)
+    sia da `PipelineExecutor` (per saltare i paesi già completati).
+
+    Struttura del file:
+        {
+            "<region>": {
+                "<category>": {
+                    "<town>": {"last_page": 4, "empty_pages": 0,
+                               "completed": false, "updated_at": 1700000000.0}
+                }
+            }
+        }
+
+    Note:
+        - Ogni aggiornamento è read-modify-write sotto lock esclusivo
+        - La scrittura avviene su file temporaneo + os.replace (atomica)
+        - Un file corrotto viene trattato come ledger vuoto
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # === LETTURA ===
+
+    def get(self, region, category, town):
+        """
+        Restituisce lo stato registrato per un paese.
+
+        Returns:
+            dict: {"last_page", "empty_pages", "completed", "updated_at"};
+                  last_page = 0 se il paese non è mai stato toccato
+        """
+        data = self._read()
+        entry = data.get(_normalize(region), {}).get(_normalize(category), {}).get(_normalize(town))
+        result = {"last_page": 0, "empty_pages": 0, "completed": False, "updated_at": None}
+        if isinstance(entry, dict):
+            result.update(entry)
+        return result
+
+    def next_page(self, region, category, town):
+        """Prima pagina non ancora scaricata per il paese"""
+        return int(self.get(region, category, town)["last_page"]) + 1
+
+    def is_completed(self, region, category, town):
+        """True se lo scraping del paese è terminato normalmente"""
+        return bool(self.get(region, category, town)["completed"])
+
+    def towns(self, region, category):
+        """Stato di tutti i paesi registrati per una combinazione regione/categoria"""
+        return dict(self._read().get(_normalize(region), {}).get(_normalize(category), {}))
+
+    # === SCRITTURA ===
+
+    def record_page(self, region, category, town, page, empty_pages=0):
+        """
+        Registra che la pagina `page` è stata scaricata ed elaborata.
+
+        L'ultima pagina non torna mai indietro: una scrittura ritardata
+        di una pagina precedente non cancella progressi già registrati.
+        """
+        def update(entry):
+            if int(page) >= int(entry.get("last_page", 0)):
+                entry["last_page"] = int(page)
+                entry["empty_pages"] = int(empty_pages)
+            entry["completed"] = False
+        self._update(region, category, town, update)
+
+    def mark_completed(self, region, category, town, last_page=None):
+        """Segna il paese come completato (fine risultati raggiunta)"""
+        def update(entry):
+            if last_page is not None and int(last_page) > int(entry.get("last_page", 0)):
+                entry["last_page"] = int(last_page)
+            entry["completed"] = True
+        self._update(region, category, town, update)
+
+    def reset(self, region, category, town):
+        """Dimentica lo stato di un paese (il prossimo run riparte da pagina 1)"""
+        with self._locked():
+            data = self._read()
+            towns = data.get(_normalize(region), {}).get(_normalize(category), {})
+            if towns.pop(_normalize(town), None) is not None:
+                self._write(data)
+
+    # === INTERNI ===
+
+    def _update(self, region, category, town, update):
+        with self._locked():
+            data = self._read()
+            towns = data.setdefault(_normalize(region), {}).setdefault(_normalize(category), {})
+            entry = towns.setdefault(_normalize(town), {"last_page": 0, "empty_pages": 0, "completed": False})
+            update(entry)
+            entry["updated_at"] = time.time()
+            self._write(data)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            data = json.loads(content) if content else {}
+            return data if isinstance(data, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".ledger_", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @contextmanager
+    def _locked(self):
+        """Lock esclusivo tra processi sul file .lock accanto al ledger"""
+        with open(self.lock_path, "a+") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
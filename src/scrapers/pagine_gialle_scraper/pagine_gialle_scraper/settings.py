@@ -2,6 +2,8 @@ import os
 import random
 from fake_useragent import UserAgent
 
+from pagine_gialle_scraper.resume_ledger import default_ledger_path
+
 # Percorso alla root del progetto (due livelli sopra questo file)
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
 CONFIG_DIR = os.path.join(PROJECT_ROOT, 'config')
@@ -38,6 +40,19 @@ AUTOTHROTTLE_DEBUG = True
 
 ROBOTSTXT_OBEY = False
 
+# Pagine richieste in parallelo per paese (1 = paginazione sequenziale classica)
+PAGINE_GIALLE_PAGE_WINDOW = 1
+
+# Modalità HTTP/2 opzionale (richiede Twisted[http2]), es. scrapy crawl ... -s PAGINE_GIALLE_HTTP2=True
+# Le pagine vengono multiplexate su una connessione per host; i proxy rotanti non sono usati
+# perché Scrapy non supporta HTTP/2 tramite proxy CONNECT
+PAGINE_GIALLE_HTTP2 = False
+PAGINE_GIALLE_H2_PAGE_WINDOW = 8        # pagine in volo contemporaneamente per paese
+PAGINE_GIALLE_H2_DOWNLOAD_DELAY = 0.5   # sostituisce DOWNLOAD_DELAY in modalità HTTP/2
+
+# URL delle pagine JSON; sovrascrivibile per puntare a un server locale (benchmark)
+PAGINE_GIALLE_BASE_URL = None
+
 # Middlewares
 SPIDER_MIDDLEWARES = {
     'pagine_gialle_scraper.middlewares.PagineGialleMiddleware': 543,
@@ -52,6 +67,9 @@ DOWNLOADER_MIDDLEWARES = {
 ROTATING_PROXY_LIST_PATH = os.path.join(CONFIG_DIR, 'proxies.txt')
 ROTATING_PROXY_CLOSE_SPIDER = False
 
+# Ledger di ripresa condiviso con PipelineExecutor: (region, category, town) -> ultima pagina / completato
+RESUME_LEDGER_PATH = default_ledger_path(PROJECT_ROOT)
+
 # Pipelines
 ITEM_PIPELINES = {
     'pagine_gialle_scraper.pipelines.PagineGiallePipeline': 300,
@@ -59,4 +77,11 @@ ITEM_PIPELINES = {
 
 # Impostazioni future-proof
 TWISTED_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
-FEED_EXPORT_ENCODING = 'utf-8'
\ No newline at end of file
+FEED_EXPORT_ENCODING = 'utf-8'
+
+# Feed su file locale senza buffer: un record esportato è già su disco quando
+# lo spider lo conta nel ledger (il crawl può essere terminato con kill)
+FEED_STORAGES = {
+    '': 'pagine_gialle_scraper.feed_storage.UnbufferedFileFeedStorage',
+    'file': 'pagine_gialle_scraper.feed_storage.UnbufferedFileFeedStorage',
+}
\ No newline at end of file
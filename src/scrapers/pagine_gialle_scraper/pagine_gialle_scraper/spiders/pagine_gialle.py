@@ -2,10 +2,14 @@ import scrapy
 import json
 import os
 import subprocess
+from urllib.parse import urlparse
 from scrapy import signals
 from scrapy.signalmanager import dispatcher
 from scrapy.signals import spider_closed
 
+from pagine_gialle_scraper.pagination import PageWindow
+from pagine_gialle_scraper.resume_ledger import ResumeLedger, default_ledger_path
+
 class PagineGialleSpider(scrapy.Spider):
     """
     Spider per estrarre dati dalle Pagine Gialle (paginegialle.it).
@@ -14,6 +18,7 @@ class PagineGialleSpider(scrapy.Spider):
     - Supporta ripresa automatica dello scraping in caso di interruzione
     - Gestisce la paginazione automatica
     - Salva lo stato di avanzamento su file JSON
+    - Modalità HTTP/2 opzionale (PAGINE_GIALLE_HTTP2) con più pagine in volo sulla stessa connessione
     - Estrae informazioni complete delle aziende (contatti, posizione, recensioni)
     """
     
@@ -21,10 +26,7 @@ class PagineGialleSpider(scrapy.Spider):
     allowed_domains = ["paginegialle.it"]
     base_url = "https://www.paginegialle.it/{url_pattern}/p-{page}.html?output=json"
     
-    # Percorso del file di stato per il salvataggio automatico dell'avanzamento
-    state_file = os.path.join(os.path.dirname(__file__), "..", "config", "scraping_state.json")
-
-    def __init__(self, url_pattern=None, region=None, category=None, *args, **kwargs):
+    def __init__(self, url_pattern=None, region=None, category=None, town=None, *args, **kwargs):
         """
         Inizializza lo spider con parametri dinamici.
         
@@ -32,10 +34,12 @@ class PagineGialleSpider(scrapy.Spider):
             url_pattern (str): Pattern URL specifico per la ricerca (es. "roma/ristoranti")
             region (str): Regione geografica di interesse
             category (str): Categoria di business da cercare
+            town (str, optional): Nome del paese usato come chiave nel ledger di ripresa.
+                                  Se assente viene ricavato dal pattern URL
             
         Note:
             - Collega automaticamente il segnale 'spider_closed' per logging
-            - Crea la directory di configurazione se non esiste
+            - Il ledger di ripresa viene aperto in start_requests (servono i settings)
         """
         super().__init__(*args, **kwargs)
 
@@ -43,16 +47,79 @@ class PagineGialleSpider(scrapy.Spider):
         self.url_pattern = url_pattern
         self.region = region
         self.category = category
+        self.town = town
+        self.ledger = None
+        self.window = None
+        self.recorded_watermark = None
 
         # Collegamento del segnale per gestire la chiusura dello spider
         # Questo permette di eseguire operazioni di cleanup quando lo spider termina
         dispatcher.connect(self.spider_closed, signals.spider_closed)
 
-        self.logger.info(f"Inizializzazione spider con parametri: url_pattern={url_pattern}, region={region}, category={category}")
+        self.logger.info(f"Inizializzazione spider con parametri: url_pattern={url_pattern}, region={region}, category={category}, town={town}")
+
+    @classmethod
+    def update_settings(cls, settings):
+        """
+        Applica la modalità HTTP/2 se richiesta con PAGINE_GIALLE_HTTP2.
+        
+        Args:
+            settings: Settings del crawler, già comprensivi delle opzioni -s da riga di comando
+            
+        Note:
+            - Usa H2DownloadHandler per https: le richieste vengono multiplexate su
+              una sola connessione per host invece di una richiesta HTTP/1.1 alla volta
+            - Scrapy non supporta HTTP/2 via proxy CONNECT, quindi in questa modalità
+              i middleware di rotazione proxy vengono disattivati
+            - La concorrenza per host sale alla dimensione della finestra di pagine;
+              le opzioni passate esplicitamente con -s hanno comunque la precedenza
+        """
+        super().update_settings(settings)
+        if not settings.getbool("PAGINE_GIALLE_HTTP2"):
+            return
+
+        window = settings.getint("PAGINE_GIALLE_H2_PAGE_WINDOW", 8)
+        handlers = settings.getdict("DOWNLOAD_HANDLERS")
+        handlers["https"] = "scrapy.core.downloader.handlers.http2.H2DownloadHandler"
+        settings.set("DOWNLOAD_HANDLERS", handlers, priority="spider")
+
+        middlewares = settings.getdict("DOWNLOADER_MIDDLEWARES")
+        middlewares["rotating_proxies.middlewares.RotatingProxyMiddleware"] = None
+        middlewares["rotating_proxies.middlewares.BanDetectionMiddleware"] = None
+        settings.set("DOWNLOADER_MIDDLEWARES", middlewares, priority="spider")
+
+        settings.set("CONCURRENT_REQUESTS", max(settings.getint("CONCURRENT_REQUESTS"), window), priority="spider")
+        settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", window, priority="spider")
+        settings.set("CONCURRENT_REQUESTS_PER_IP", window, priority="spider")
+        settings.set("DOWNLOAD_DELAY", settings.getfloat("PAGINE_GIALLE_H2_DOWNLOAD_DELAY"), priority="spider")
+        settings.set("AUTOTHROTTLE_TARGET_CONCURRENCY", float(window), priority="spider")
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        """
+        Crea lo spider e applica le impostazioni che dipendono dai settings.
         
-        # Assicura che la directory per il file di stato esista
-        # Importante per evitare errori quando si tenta di salvare lo stato
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        Note:
+            - PAGINE_GIALLE_BASE_URL permette di puntare a un server locale (es. benchmark);
+              il suo host viene aggiunto agli allowed_domains
+            - La finestra di pagine è PAGINE_GIALLE_PAGE_WINDOW (1 = paginazione sequenziale),
+              PAGINE_GIALLE_H2_PAGE_WINDOW in modalità HTTP/2
+        """
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        settings = crawler.settings
+
+        base_url = settings.get("PAGINE_GIALLE_BASE_URL")
+        if base_url:
+            spider.base_url = base_url
+            host = urlparse(base_url).hostname
+            if host and host not in spider.allowed_domains:
+                spider.allowed_domains = list(spider.allowed_domains) + [host]
+
+        if settings.getbool("PAGINE_GIALLE_HTTP2"):
+            spider.page_window = settings.getint("PAGINE_GIALLE_H2_PAGE_WINDOW", 8)
+        else:
+            spider.page_window = settings.getint("PAGINE_GIALLE_PAGE_WINDOW", 1)
+        return spider
 
     def spider_closed(self, spider, reason):
         """
@@ -66,72 +133,24 @@ class PagineGialleSpider(scrapy.Spider):
             Utile per operazioni di cleanup, statistiche finali, o notifiche
         """
         self.logger.info(f"Spider terminato con motivo: {reason}.")
-        
-    def load_scraping_state(self):
+
+    def _open_ledger(self):
         """
-        Carica lo stato dello scraping da file JSON per consentire la ripresa.
+        Apre il ledger di ripresa condiviso con il PipelineExecutor.
         
         Returns:
-            dict: Dizionario con lo stato salvato per la configurazione corrente,
-                  o dizionario vuoto se non esiste stato precedente
-                  
-        Note:
-            - Utilizza una chiave composta da region_category_url_pattern per l'identificazione univoca
-            - Gestisce gracefully file corrotti o mancanti
-            - Permette di riprendere lo scraping esattamente dal punto di interruzione
-        """
-        # Crea una chiave univoca basata sui parametri dello spider
-        state_key = f"{self.region}_{self.category}_{self.url_pattern}"
-        
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    # Gestisce file vuoti o con solo whitespace
-                    state_data = json.loads(content) if content else {}
-                    return state_data.get(state_key, {})
-            except json.JSONDecodeError:
-                # Se il file JSON è corrotto, log dell'errore e reset
-                self.logger.error(f"Errore nel caricare {self.state_file}. Reset stato scraping.")
-                return {}
-        return {}
-
-    def save_scraping_state(self, paese, page):
-        """
-        Salva lo stato corrente dello scraping per consentire una ripresa successiva.
-        
-        Args:
-            paese (str): Nome del paese/città corrente
-            page (int): Numero della pagina corrente
+            ResumeLedger: Ledger sul percorso indicato da RESUME_LEDGER_PATH
             
         Note:
-            - Mantiene gli stati di più configurazioni contemporaneamente
-            - Aggiorna atomicamente il file per evitare corruzioni
-            - Fondamentale per la funzionalità di ripresa automatica
+            - Lo stato è indicizzato per (region, category, town), la stessa chiave
+              usata dall'executor per decidere quali paesi saltare
         """
-        # Crea la stessa chiave univoca usata nel caricamento
-        state_key = f"{self.region}_{self.category}_{self.url_pattern}"
-
-        # Legge lo stato esistente per non sovrascrivere altre configurazioni
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, "r", encoding="utf-8") as f:
-                    content = f.read().strip()
-                    state_data = json.loads(content) if content else {}
-            except json.JSONDecodeError:
-                # Se il file è corrotto, ricomincia con un dizionario vuoto
-                state_data = {}
-        else:
-            state_data = {}
-        
-        # Aggiorna o crea la sezione per questa configurazione
-        if state_key not in state_data:
-            state_data[state_key] = {}
-        state_data[state_key][paese] = page
-        
-        # Salva atomicamente il nuovo stato
-        with open(self.state_file, "w", encoding="utf-8") as f:
-            json.dump(state_data, f, indent=4)
+        ledger_path = self.settings.get("RESUME_LEDGER_PATH")
+        if not ledger_path:
+            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", ".."))
+            ledger_path = default_ledger_path(project_root)
+        self.logger.info(f"Ledger di ripresa: {ledger_path}")
+        return ResumeLedger(ledger_path)
 
     def start_requests(self):
         """
@@ -144,8 +163,8 @@ class PagineGialleSpider(scrapy.Spider):
         Note:
             - Valida che tutti i parametri obbligatori siano presenti
             - Estrae automaticamente il nome del paese dal pattern URL
-            - Riprende automaticamente dall'ultima pagina salvata
-            - Imposta i metadati necessari per la gestione della paginazione
+            - Riprende dalla prima pagina non ancora scaricata secondo il ledger
+            - Non invia richieste se il paese risulta già completato
         """
         # Validazione parametri obbligatori
         if not self.url_pattern or not self.region or not self.category:
@@ -155,7 +174,7 @@ class PagineGialleSpider(scrapy.Spider):
         # Estrazione del nome del paese dal pattern URL
         # Assume che il pattern sia nel formato "paese/categoria" o simile
         url_parts = self.url_pattern.strip("/").split("/")
-        paese_nome = url_parts[0] if url_parts else "unknown"
+        paese_nome = self.town or (url_parts[0] if url_parts else "unknown")
 
         # Controllo di coerenza per identificare possibili errori di configurazione
         if paese_nome == self.category:
@@ -164,24 +183,106 @@ class PagineGialleSpider(scrapy.Spider):
         self.logger.info(f"Avvio scraping per paese: {paese_nome}")
 
         # Carica lo stato salvato per riprendere dal punto di interruzione
-        scraping_state = self.load_scraping_state()
-        last_page = scraping_state.get(paese_nome, 1)  # Default alla pagina 1 se non trovato
+        self.ledger = self._open_ledger()
+        town_state = self.ledger.get(self.region, self.category, paese_nome)
+        if town_state["completed"]:
+            self.logger.info(f"Paese {paese_nome} già completato (ultima pagina {town_state['last_page']}), nessuna richiesta")
+            return
 
-        # Preparazione metadati per il tracking dello stato durante lo scraping
+        first_page = int(town_state["last_page"]) + 1
+        if first_page > 1:
+            self.logger.info(f"Ripresa di {paese_nome} dalla pagina {first_page}")
+
+        # Finestra di pagine: 1 pagina alla volta, N in volo in modalità HTTP/2
+        self.paese = paese_nome
+        self.window = PageWindow(
+            first_page=first_page,
+            window_size=getattr(self, "page_window", 1),
+            empty_pages=int(town_state["empty_pages"]),
+        )
+        if self.window.window_size > 1:
+            self.logger.info(f"Modalità HTTP/2: fino a {self.window.window_size} pagine in volo")
+        self.recorded_watermark = self.window.watermark()[0]
+
+        # Il ledger avanza solo dopo l'export dei record nel feed: i segnali vengono
+        # collegati qui, dopo il FeedExporter, così il record è già scritto quando arriva
+        for signal in (signals.item_scraped, signals.item_dropped, signals.item_error):
+            self.crawler.signals.connect(self._item_done, signal=signal)
+
+        # Invio delle prime richieste con callback per il parsing JSON
+        for page in self.window.initial_pages():
+            yield self._page_request(page)
+
+    def _page_request(self, page):
+        """
+        Costruisce la richiesta per una pagina del paese corrente.
+        
+        Args:
+            page (int): Numero di pagina
+            
+        Returns:
+            scrapy.Request: Richiesta con i metadati necessari per il tracking dello stato
+        """
         meta = {
             "region": self.region,
             "category": self.category,
-            "paese": paese_nome,
-            "page": last_page,
-            "empty_pages": 0  # Contatore per gestire la fine dello scraping
+            "paese": self.paese,
+            "page": page,
         }
+        url = self.base_url.format(url_pattern=self.url_pattern, page=page)
+        self.logger.info(f"Richiesta pagina {page}: {url}")
+        return scrapy.Request(url, callback=self.parse_json, meta=meta, errback=self.errback_httpbin)
+
+    def _after_page(self, page, has_results):
+        """
+        Aggiorna la finestra dopo una pagina e restituisce le prossime richieste.
+        
+        Args:
+            page (int): Pagina appena elaborata
+            has_results (bool): Se la pagina conteneva risultati
+            
+        Yields:
+            scrapy.Request: Richieste per le pagine successive
+            
+        Note:
+            - Il ledger avanza in _record_progress quando anche i record sono esportati
+        """
+        next_pages = self.window.on_page(page, has_results)
+        self._record_progress()
 
-        # Costruzione URL per la prima richiesta
-        url = self.base_url.format(url_pattern=self.url_pattern, page=last_page)
-        self.logger.info(f"Avvio scraping da URL: {url}")
+        for next_page in next_pages:
+            yield self._page_request(next_page)
+
+    def _item_done(self, item, spider, **kwargs):
+        """
+        Segnali item_scraped / item_dropped / item_error: un record di una pagina è
+        stato esportato nel feed (o scartato) e non va più atteso dal ledger.
+        """
+        if spider is not self or self.window is None:
+            return
+        if self.window.on_item_persisted(item.get("page")):
+            self._record_progress()
+
+    def _record_progress(self):
+        """
+        Registra nel ledger la watermark della finestra se è avanzata.
         
-        # Invio della prima richiesta con callback per il parsing JSON
-        yield scrapy.Request(url, callback=self.parse_json, meta=meta, errback=self.errback_httpbin)
+        Note:
+            - Il ledger riceve solo la watermark contigua, mai pagine arrivate fuori ordine
+              o pagine con record non ancora esportati nel feed: se l'executor termina il
+              crawl, il run successivo riparte dalla prima pagina non salvata
+            - Il paese è completato dopo 2 pagine vuote consecutive senza buchi prima
+        """
+        watermark, empty_streak = self.window.watermark()
+
+        if self.window.finished():
+            self.logger.info(f"Interrompo scraping dopo {empty_streak} pagine vuote.")
+            self.ledger.mark_completed(self.region, self.category, self.paese, watermark)
+            self.recorded_watermark = watermark
+        elif watermark > self.recorded_watermark:
+            # Registra la pagina nel ledger: un nuovo run ripartirà dalla successiva
+            self.ledger.record_page(self.region, self.category, self.paese, watermark, empty_pages=empty_streak)
+            self.recorded_watermark = watermark
 
     def errback_httpbin(self, failure):
         """
@@ -190,6 +291,9 @@ class PagineGialleSpider(scrapy.Spider):
         Args:
             failure: Oggetto Failure di Scrapy contenente dettagli dell'errore
             
+        Yields:
+            scrapy.Request: Richieste che riempiono il posto liberato nella finestra
+            
         Note:
             - Fornisce logging dettagliato per il debugging
             - Distingue tra diversi tipi di errore
@@ -204,6 +308,28 @@ class PagineGialleSpider(scrapy.Spider):
             # Log per altri tipi di errore (timeout, DNS, etc.)
             self.logger.error(f"Errore di altro tipo: {failure.value}")
 
+        yield from self._page_failed(failure.request.meta.get("page"))
+
+    def _page_failed(self, page):
+        """
+        Libera nella finestra il posto di una pagina fallita o malformata.
+        
+        Args:
+            page (int): Pagina non elaborata
+            
+        Yields:
+            scrapy.Request: Richieste per le pagine che riempiono la finestra
+            
+        Note:
+            - La watermark resta ferma prima della pagina: il ledger non la segna mai
+              come scaricata e il run successivo riparte da lì
+        """
+        if page is None or self.window is None:
+            return
+        self.logger.warning(f"Pagina {page} non elaborata: resta da riscaricare alla prossima ripresa")
+        for next_page in self.window.on_failure(page):
+            yield self._page_request(next_page)
+
     def parse_json(self, response):
         """
         Cuore dello spider: effettua il parsing della risposta JSON e gestisce la paginazione.
@@ -237,6 +363,7 @@ class PagineGialleSpider(scrapy.Spider):
                 # Identifica se la risposta è HTML invece di JSON (problema comune)
                 if '<html' in response.text.lower():
                     self.logger.error("La risposta sembra essere HTML, non JSON")
+                yield from self._page_failed(response.meta.get("page"))
                 return
 
             # Navigazione nella struttura JSON gerarchica delle Pagine Gialle
@@ -244,26 +371,30 @@ class PagineGialleSpider(scrapy.Spider):
             list_data = data.get("list", {})
             if not list_data:
                 self.logger.warning("Chiave 'list' non trovata nella risposta JSON")
+                yield from self._page_failed(response.meta.get("page"))
                 return
 
             out_data = list_data.get("out", {})
             if not out_data:
                 self.logger.warning("Chiave 'out' non trovata nei dati 'list'")
+                yield from self._page_failed(response.meta.get("page"))
                 return
 
             base_data = out_data.get("base", {})
             if not base_data:
                 self.logger.warning("Chiave 'base' non trovata nei dati 'out'")
+                yield from self._page_failed(response.meta.get("page"))
                 return
 
             # Array principale con i risultati delle aziende
             results = base_data.get("results", [])
 
             if results:
-                # Reset contatore pagine vuote quando si trovano risultati
-                response.meta["empty_pages"] = 0
                 self.logger.info(f"Pagina {response.meta['page']} - Trovati {len(results)} risultati")
 
+                # Il ledger attende l'export di tutti i record della pagina
+                self.window.expect_items(response.meta["page"], len(results))
+
                 # Elaborazione di ogni singola azienda trovata
                 for entry in results:
                     # === ESTRAZIONE DATI PRINCIPALI ===
@@ -299,9 +430,6 @@ class PagineGialleSpider(scrapy.Spider):
                     info_preventivi = entry.get("info_preventivi", {})
                     quote_email = info_preventivi.get("email") if isinstance(info_preventivi, dict) else None
 
-                    # Aggiorna il paese nei metadati per il salvataggio dello stato
-                    response.meta["paese"] = citta
-
                     # === YIELD DEL RECORD COMPLETO ===
                     # Ogni yield rappresenta un'azienda con tutti i dati estratti
                     yield {
@@ -331,47 +459,25 @@ class PagineGialleSpider(scrapy.Spider):
                     }
 
                 # === SALVATAGGIO STATO E PAGINAZIONE ===
-                
-                # Salva lo stato corrente per la ripresa automatica
-                self.save_scraping_state(response.meta["paese"], response.meta["page"])
-
-                # Preparazione richiesta per la pagina successiva
-                next_page = response.meta["page"] + 1
-                meta = response.meta.copy()  # Copia metadati esistenti
-                meta["page"] = next_page
-                next_url = self.base_url.format(url_pattern=self.url_pattern, page=next_page)
-                self.logger.info(f"Richiesta prossima pagina: {next_url}")
-                
-                # Yield della richiesta per la pagina successiva
-                yield scrapy.Request(next_url, callback=self.parse_json, meta=meta, errback=self.errback_httpbin)
+                yield from self._after_page(response.meta["page"], has_results=True)
 
             else:
                 # === GESTIONE PAGINE VUOTE ===
+                # Anche le pagine vuote contano: dopo 2 consecutive lo scraping termina,
+                # altrimenti si prova comunque la successiva (potrebbero esserci gap nei dati)
                 self.logger.info(f"Nessun risultato trovato nella pagina {response.meta['page']}")
-                response.meta["empty_pages"] += 1
-
-                # Termina lo scraping dopo un numero configurabile di pagine vuote consecutive
-                # Questo evita loop infiniti quando si raggiunge la fine dei risultati
-                if response.meta["empty_pages"] >= 2:
-                    self.logger.info(f"Interrompo scraping dopo {response.meta['empty_pages']} pagine vuote.")
-                    return
-
-                # Prova comunque la pagina successiva (potrebbero esserci gap nei dati)
-                next_page = response.meta["page"] + 1
-                meta = response.meta.copy()
-                meta["page"] = next_page
-                next_url = self.base_url.format(url_pattern=self.url_pattern, page=next_page)
-                self.logger.info(f"Richiesta prossima pagina (dopo pagina vuota): {next_url}")
-                yield scrapy.Request(next_url, callback=self.parse_json, meta=meta, errback=self.errback_httpbin)
+                yield from self._after_page(response.meta["page"], has_results=False)
 
         except json.JSONDecodeError as e:
             # Gestione specifica per errori di parsing JSON
             self.logger.error(f"Errore nel parsing JSON. URL: {response.url}")
+            yield from self._page_failed(response.meta.get("page"))
         except Exception as e:
             # Gestione generica per tutti gli altri errori
             self.logger.error(f"Errore durante il parsing: {type(e).__name__}: {e}")
             import traceback
             self.logger.error(f"Traceback: {traceback.format_exc()}")
+            yield from self._page_failed(response.meta.get("page"))
 
 def clean_value(value, default="N/A"):
     """